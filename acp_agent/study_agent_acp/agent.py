@@ -1,5 +1,13 @@
+import contextvars
+import copy
+import itertools
+import json
+import math
 import os
-from typing import Any, Dict, List, Optional, Protocol
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Set, Tuple
 
 from study_agent_core.models import (
     CohortLintInput,
@@ -15,17 +23,22 @@ from study_agent_core.tools import (
     phenotype_improvements,
     phenotype_recommendation_advice,
     phenotype_recommendations,
+    phenotype_validation_review,
     propose_concept_set_diff,
+    split_validation_reviews,
 )
 from .llm_client import (
-    build_intent_split_prompt,
-    build_advice_prompt,
-    build_improvements_prompt,
+    LLMClient,
     build_keeper_prompt,
-    build_lint_prompt,
-    build_prompt,
     call_llm,
+    phi_guarded,
 )
+from .flow_engine import FlowEngine
+from .flows import FLOWS
+from .progress import partial_sink, report_stage
+
+# keeper_sanitize_rows returns at most this many rows per call.
+MAX_KEEPER_CHUNK_ROWS = 1000
 
 
 class MCPClient(Protocol):
@@ -42,10 +55,29 @@ class StudyAgent:
         mcp_client: Optional[MCPClient] = None,
         allow_core_fallback: bool = True,
         confirmation_required_tools: Optional[List[str]] = None,
+        prompt_cache_ttl: Optional[float] = None,
+        llm_client: Optional[LLMClient] = None,
+        step_workers: Optional[int] = None,
     ) -> None:
         self._mcp_client = mcp_client
+        self._llm_client = llm_client
         self._allow_core_fallback = allow_core_fallback
         self._confirmation_required = set(confirmation_required_tools or [])
+        if prompt_cache_ttl is None:
+            prompt_cache_ttl = float(os.getenv("ACP_PROMPT_CACHE_TTL", "60"))
+        self._prompt_cache_ttl = prompt_cache_ttl
+        self._prompt_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._prompt_cache_lock = threading.Lock()
+        # Flows in FLOWS run as step DAGs; ACP_STEP_* settings apply unless overridden.
+        engine_settings = FlowEngine.env_settings()
+        if step_workers is not None:
+            engine_settings["workers"] = step_workers
+        self._flow_engine = FlowEngine(
+            call_tool=self.call_tool,
+            prompt_bundle=self._prompt_bundle,
+            call_llm=self._call_llm,
+            **engine_settings,
+        )
 
         self._core_tools = {
             "propose_concept_set_diff": propose_concept_set_diff,
@@ -79,6 +111,12 @@ class StudyAgent:
         ]
 
     def call_tool(self, name: str, arguments: Dict[str, Any], confirm: bool = False) -> Dict[str, Any]:
+        started = time.monotonic()
+        result = self._dispatch_tool(name, arguments, confirm)
+        report_stage("tool_done", tool=name, status=result.get("status"), seconds=round(time.monotonic() - started, 3))
+        return result
+
+    def _dispatch_tool(self, name: str, arguments: Dict[str, Any], confirm: bool) -> Dict[str, Any]:
         if name in self._confirmation_required and not confirm:
             return {
                 "status": "needs_confirmation",
@@ -123,6 +161,17 @@ class StudyAgent:
                 "warnings": [f"Core tool call failed: {exc}"],
             }
 
+    def run_flow(self, name: str, **params: Any) -> Dict[str, Any]:
+        spec = FLOWS.get(name)
+        if spec is None:
+            return {"status": "error", "error": f"unknown_flow: {name}"}
+        missing = [param for param in spec.required if not params.get(param)]
+        if missing:
+            return {"status": "error", "error": f"missing {missing[0]}"}
+        if spec.requires_mcp and self._mcp_client is None:
+            return {"status": "error", "error": "MCP client unavailable"}
+        return self._flow_engine.run(spec, params)
+
     def run_phenotype_recommendation_flow(
         self,
         study_intent: str,
@@ -131,188 +180,45 @@ class StudyAgent:
         candidate_limit: Optional[int] = None,
         candidate_offset: Optional[int] = None,
     ) -> Dict[str, Any]:
-        if not study_intent:
-            return {"status": "error", "error": "missing study_intent"}
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-
-        search_args = {"query": study_intent, "top_k": top_k}
-        if candidate_offset is not None:
-            search_args["offset"] = int(candidate_offset)
-
-        search_result = self.call_tool(
-            name="phenotype_search",
-            arguments=search_args,
-        )
-        if search_result.get("status") != "ok":
-            return {
-                "status": "error",
-                "error": "phenotype_search_failed",
-                "details": search_result,
-            }
-
-        full = search_result.get("full_result") or {}
-        if full.get("error"):
-            payload = {
-                "status": "error",
-                "error": full.get("error"),
-                "details": full,
-            }
-            if full.get("error") == "phenotype_index_unavailable":
-                payload["hint"] = (
-                    "Set PHENOTYPE_INDEX_DIR to the phenotype_index directory "
-                    "(prefer an absolute path) and verify catalog.jsonl exists."
-                )
-            return payload
-        if "results" not in full and full.get("content"):
-            return {
-                "status": "error",
-                "error": "phenotype_search_failed",
-                "details": full,
-            }
-        candidates = full.get("results") or []
-        if candidate_limit is None:
-            candidate_limit = int(os.getenv("LLM_CANDIDATE_LIMIT", "10"))
-        if candidate_limit > 0:
-            candidates = candidates[:candidate_limit]
-
-        prompt_bundle = self.call_tool(
-            name="phenotype_prompt_bundle",
-            arguments={"task": "phenotype_recommendations"},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phenotype_prompt_bundle_failed",
-                "details": prompt_bundle,
-            }
-
-        prompt = build_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
+        return self.run_flow(
+            "phenotype_recommendation",
             study_intent=study_intent,
-            candidates=candidates,
+            top_k=top_k,
             max_results=max_results,
+            candidate_limit=candidate_limit,
+            candidate_offset=candidate_offset,
         )
-        llm_result = call_llm(prompt)
-        catalog_rows = []
-        for row in candidates:
-            if not isinstance(row, dict):
-                continue
-            catalog_rows.append(
-                {
-                    "cohortId": row.get("cohortId"),
-                    "cohortName": row.get("name") or "",
-                    "short_description": row.get("short_description"),
-                }
-            )
 
-        core_result = phenotype_recommendations(
-            protocol_text=study_intent,
-            catalog_rows=catalog_rows,
+    def run_phenotype_intent_recommendation_flow(
+        self,
+        study_intent: str,
+        top_k: int = 20,
+        max_results: int = 10,
+        candidate_limit: Optional[int] = None,
+        candidate_offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        # Intent split, then target and outcome recommendations in parallel: what a
+        # client otherwise does with three requests, in one.
+        return self.run_flow(
+            "phenotype_intent_recommendation",
+            study_intent=study_intent,
+            top_k=top_k,
             max_results=max_results,
-            llm_result=llm_result,
+            candidate_limit=candidate_limit,
+            candidate_offset=candidate_offset,
         )
 
-        return {
-            "status": "ok",
-            "search": full,
-            "llm_used": llm_result is not None,
-            "candidate_limit": candidate_limit,
-            "candidate_offset": candidate_offset or 0,
-            "candidate_count": len(candidates),
-            "recommendations": core_result,
-        }
-
     def run_phenotype_recommendation_advice_flow(
         self,
         study_intent: str,
     ) -> Dict[str, Any]:
-        if not study_intent:
-            return {"status": "error", "error": "missing study_intent"}
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-
-        prompt_bundle = self.call_tool(
-            name="phenotype_recommendation_advice",
-            arguments={},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phenotype_recommendation_advice_prompt_failed",
-                "details": prompt_bundle,
-            }
-
-        prompt = build_advice_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            study_intent=study_intent,
-        )
-        llm_result = call_llm(prompt)
-        core_result = phenotype_recommendation_advice(
-            study_intent=study_intent,
-            llm_result=llm_result,
-        )
-
-        return {
-            "status": "ok",
-            "llm_used": llm_result is not None,
-            "advice": core_result,
-        }
+        return self.run_flow("phenotype_recommendation_advice", study_intent=study_intent)
 
     def run_phenotype_intent_split_flow(
         self,
         study_intent: str,
     ) -> Dict[str, Any]:
-        if not study_intent:
-            return {"status": "error", "error": "missing study_intent"}
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-        debug = os.getenv("STUDY_AGENT_DEBUG", "0") == "1"
-
-        prompt_bundle = self.call_tool(
-            name="phenotype_intent_split",
-            arguments={},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phenotype_intent_split_prompt_failed",
-                "details": prompt_bundle,
-            }
-
-        prompt = build_intent_split_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            study_intent=study_intent,
-        )
-        if debug:
-            print("ACP DEBUG > phenotype_intent_split: calling LLM")
-        llm_result = call_llm(prompt)
-        if debug:
-            print("ACP DEBUG > phenotype_intent_split: LLM returned")
-        if llm_result is None:
-            return {
-                "status": "error",
-                "error": "llm_unavailable",
-            }
-        core_result = phenotype_intent_split(
-            study_intent=study_intent,
-            llm_result=llm_result,
-        )
-
-        return {
-            "status": "ok",
-            "llm_used": llm_result is not None,
-            "intent_split": core_result,
-        }
+        return self.run_flow("phenotype_intent_split", study_intent=study_intent)
 
     def run_phenotype_improvements_flow(
         self,
@@ -320,186 +226,267 @@ class StudyAgent:
         cohorts: List[Dict[str, Any]],
         characterization_previews: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, Any]:
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-        prompt_bundle = self.call_tool(
-            name="phenotype_prompt_bundle",
-            arguments={"task": "phenotype_improvements"},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phenotype_prompt_bundle_failed",
-                "details": prompt_bundle,
-            }
-
-        if len(cohorts) > 1:
-            cohorts = [cohorts[0]]
-        prompt = build_improvements_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            study_intent=protocol_text,
+        return self.run_flow(
+            "phenotype_improvements",
+            protocol_text=protocol_text,
             cohorts=cohorts,
+            characterization_previews=characterization_previews,
         )
-        llm_result = call_llm(prompt)
-
-        result = self.call_tool(
-            name="phenotype_improvements",
-            arguments={
-                "protocol_text": protocol_text,
-                "cohorts": cohorts,
-                "characterization_previews": characterization_previews or [],
-                "llm_result": llm_result,
-            },
-        )
-        if isinstance(result, dict):
-            result.setdefault("llm_used", llm_result is not None)
-            result.setdefault("cohort_count", len(cohorts))
-        return result
 
     def run_concept_sets_review_flow(
         self,
         concept_set: Any,
         study_intent: str,
     ) -> Dict[str, Any]:
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-        prompt_bundle = self.call_tool(
-            name="lint_prompt_bundle",
-            arguments={"task": "concept_sets_review"},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "lint_prompt_bundle_failed",
-                "details": prompt_bundle,
-            }
-        prompt = build_lint_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            task="concept-sets-review",
-            payload={"concept_set": concept_set, "study_intent": study_intent},
-            max_kb=15,
-        )
-        llm_result = call_llm(prompt)
-        result = self.call_tool(
-            name="propose_concept_set_diff",
-            arguments={
-                "concept_set": concept_set,
-                "study_intent": study_intent,
-                "llm_result": llm_result,
-            },
-        )
-        if isinstance(result, dict):
-            result.setdefault("llm_used", llm_result is not None)
-        return result
+        return self.run_flow("concept_sets_review", concept_set=concept_set, study_intent=study_intent)
 
     def run_cohort_critique_general_design_flow(
         self,
         cohort: Dict[str, Any],
     ) -> Dict[str, Any]:
-        if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
-        prompt_bundle = self.call_tool(
-            name="phenotype_prompt_bundle",
-            arguments={"task": "cohort_critique_general_design"},
-        )
-        prompt_full = prompt_bundle.get("full_result") or {}
-        if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phenotype_prompt_bundle_failed",
-                "details": prompt_bundle,
-            }
-        prompt = build_lint_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            task="cohort-critique-general-design",
-            payload={"cohort": cohort},
-            max_kb=15,
-        )
-        llm_result = call_llm(prompt)
-        result = self.call_tool(
-            name="cohort_lint",
-            arguments={
-                "cohort": cohort,
-                "llm_result": llm_result,
-            },
-        )
-        if isinstance(result, dict):
-            result.setdefault("llm_used", llm_result is not None)
-        return result
+        return self.run_flow("cohort_critique_general_design", cohort=cohort)
 
     def run_phenotype_validation_review_flow(
         self,
         keeper_row: Dict[str, Any],
         disease_name: str,
     ) -> Dict[str, Any]:
+        return self.run_flow("phenotype_validation_review", keeper_row=keeper_row, disease_name=disease_name)
+
+    def run_phenotype_validation_review_batch_flow(
+        self,
+        keeper_rows: Iterable[Any],
+        disease_name: str,
+        max_workers: int = 4,
+        chunk_size: int = 50,
+        pack_size: int = 1,
+    ) -> Iterator[Dict[str, Any]]:
+        # Yields one {"type": "row"} event per Keeper case as its review completes,
+        # then a {"type": "summary"} event. Rows are pulled from keeper_rows one chunk
+        # at a time, so a large extract is never held in memory.
         if self._mcp_client is None:
-            return {"status": "error", "error": "MCP client unavailable"}
+            yield {"type": "error", "status": "error", "error": "MCP client unavailable"}
+            return
         if not disease_name:
-            return {"status": "error", "error": "missing disease_name"}
+            yield {"type": "error", "status": "error", "error": "missing disease_name"}
+            return
+        max_workers = max(1, int(max_workers))
+        chunk_size = max(1, min(int(chunk_size), MAX_KEEPER_CHUNK_ROWS))
+        pack_size = max(1, int(pack_size))
 
-        sanitize = self.call_tool(
-            name="keeper_sanitize_row",
-            arguments={"row": keeper_row},
-        )
-        sanitize_full = sanitize.get("full_result") or {}
-        if sanitize.get("status") != "ok" or sanitize_full.get("error"):
-            return {
-                "status": "error",
-                "error": "phi_detected",
-                "details": sanitize,
-            }
-        sanitized_row = sanitize_full.get("sanitized_row") or {}
-
-        prompt_bundle = self.call_tool(
+        prompt_bundle = self._prompt_bundle(
             name="keeper_prompt_bundle",
             arguments={"disease_name": disease_name},
         )
         prompt_full = prompt_bundle.get("full_result") or {}
         if prompt_bundle.get("status") != "ok" or prompt_full.get("error"):
-            return {
+            yield {
+                "type": "error",
                 "status": "error",
                 "error": "keeper_prompt_bundle_failed",
                 "details": prompt_bundle,
             }
+            return
+
+        started = time.time()
+        counts = {"yes": 0, "no": 0, "unknown": 0, "error": 0}
+        rows_iter = iter(keeper_rows)
+        base = 0
+        pending: Set[Future] = set()
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="keeper-review")
+
+        def _drain(limit: int) -> Iterator[Dict[str, Any]]:
+            nonlocal pending
+            while len(pending) > limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for event in future.result():
+                        counts[event.get("label") if event["status"] == "ok" else "error"] += 1
+                        yield event
 
-        build_prompt = self.call_tool(
-            name="keeper_build_prompt",
-            arguments={"disease_name": disease_name, "sanitized_row": sanitized_row},
-        )
-        build_full = build_prompt.get("full_result") or {}
-        if build_prompt.get("status") != "ok" or build_full.get("error"):
-            return {
-                "status": "error",
-                "error": "keeper_build_prompt_failed",
-                "details": build_prompt,
-            }
+        try:
+            while True:
+                chunk = list(itertools.islice(rows_iter, chunk_size))
+                if not chunk:
+                    break
+                sanitize = self.call_tool(
+                    name="keeper_sanitize_rows",
+                    arguments={"rows": chunk, "limit": len(chunk), "disease_name": disease_name},
+                )
+                sanitize_full = sanitize.get("full_result") or {}
+                results = sanitize_full.get("results")
+                if sanitize.get("status") != "ok" or sanitize_full.get("error") or not isinstance(results, list):
+                    error = sanitize_full.get("error") or "keeper_sanitize_rows_failed"
+                    results = [{"index": idx, "status": "error", "error": error} for idx in range(len(chunk))]
+                # Rows the tool did not return are reported as errors, never dropped.
+                returned = {int(result.get("index", 0)) for result in results}
+                results = results + [
+                    {"index": idx, "status": "error", "error": "keeper_row_not_returned"}
+                    for idx in range(len(chunk))
+                    if idx not in returned
+                ]
+                cases: List[Tuple[int, str]] = []
+                for result in results:
+                    index = base + int(result.get("index", 0))
+                    if result.get("status") != "ok" or not result.get("prompt"):
+                        counts["error"] += 1
+                        yield {
+                            "type": "row",
+                            "index": index,
+                            "status": result.get("status") or "error",
+                            "error": result.get("error") or "keeper_build_prompt_failed",
+                        }
+                        continue
+                    cases.append((index, result["prompt"]))
+                for start in range(0, len(cases), pack_size):
+                    # Run in a copy of the request context so per-request settings
+                    # (such as an LLM cache bypass) reach the worker threads.
+                    pack = cases[start : start + pack_size]
+                    context = contextvars.copy_context()
+                    pending.add(pool.submit(context.run, self._review_keeper_pack, disease_name, prompt_full, pack))
+                base += len(chunk)
+                # Keep at most two rounds of work queued so reading, sanitizing and
+                # LLM calls overlap without buffering the whole extract.
+                yield from _drain(max_workers * 2)
+            yield from _drain(0)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        yield {
+            "type": "summary",
+            "status": "ok",
+            "disease_name": disease_name,
+            "rows": sum(counts.values()),
+            "counts": counts,
+            "ppv": _ppv_estimates(counts),
+            "elapsed_seconds": round(time.time() - started, 2),
+        }
 
-        system_prompt = prompt_full.get("system_prompt") or ""
-        main_prompt = build_full.get("prompt") or ""
-        prompt = build_keeper_prompt(
-            overview=prompt_full.get("overview", ""),
-            spec=prompt_full.get("spec", ""),
-            output_schema=prompt_full.get("output_schema", {}),
-            system_prompt=system_prompt,
-            main_prompt=main_prompt,
-        )
-        llm_result = call_llm(prompt)
+    def _review_keeper_pack(
+        self,
+        disease_name: str,
+        prompt_full: Dict[str, Any],
+        cases: List[Tuple[int, str]],
+    ) -> List[Dict[str, Any]]:
+        if len(cases) == 1:
+            return [self._review_keeper_case(cases[0][0], disease_name, prompt_full, cases[0][1])]
+        # One LLM call for the whole pack; any case whose review is missing, duplicated
+        # or invalid is retried on its own.
+        try:
+            prompt = build_keeper_prompt(
+                overview=prompt_full.get("overview", ""),
+                spec=prompt_full.get("spec", ""),
+                output_schema=prompt_full.get("output_schema", {}),
+                system_prompt=prompt_full.get("system_prompt") or "",
+                cases=[{"case_id": str(index), "prompt": main_prompt} for index, main_prompt in cases],
+            )
+            with phi_guarded():
+                llm_result = self._call_llm(prompt)
+            accepted, failed = split_validation_reviews(disease_name, llm_result, [str(index) for index, _ in cases])
+        except Exception as exc:
+            print(f"ACP KEEPER PACK > falling back to single-case reviews: {exc}")
+            accepted, failed = {}, [str(index) for index, _ in cases]
+        events: List[Dict[str, Any]] = []
+        for index, main_prompt in cases:
+            review = accepted.get(str(index))
+            if review is None:
+                events.append(self._review_keeper_case(index, disease_name, prompt_full, main_prompt))
+                continue
+            events.append(
+                {
+                    "type": "row",
+                    "index": index,
+                    "status": "ok",
+                    "label": review.get("label"),
+                    "rationale": review.get("rationale"),
+                    "packed": True,
+                }
+            )
+        return events
 
-        parsed = self.call_tool(
-            name="keeper_parse_response",
-            arguments={"llm_output": llm_result},
-        )
-        if isinstance(parsed, dict):
-            parsed.setdefault("llm_used", llm_result is not None)
-        return parsed
+    def _review_keeper_case(
+        self,
+        index: int,
+        disease_name: str,
+        prompt_full: Dict[str, Any],
+        main_prompt: str,
+    ) -> Dict[str, Any]:
+        try:
+            prompt = build_keeper_prompt(
+                overview=prompt_full.get("overview", ""),
+                spec=prompt_full.get("spec", ""),
+                output_schema=prompt_full.get("output_schema", {}),
+                system_prompt=prompt_full.get("system_prompt") or "",
+                main_prompt=main_prompt,
+            )
+            with phi_guarded():
+                llm_result = self._call_llm(prompt)
+            if llm_result is None:
+                return {"type": "row", "index": index, "status": "error", "error": "llm_unavailable"}
+            review = phenotype_validation_review(disease_name=disease_name, llm_result=llm_result)
+        except Exception as exc:
+            return {"type": "row", "index": index, "status": "error", "error": f"review_failed: {exc}"}
+        return {
+            "type": "row",
+            "index": index,
+            "status": "ok",
+            "label": review.get("label"),
+            "rationale": review.get("rationale"),
+        }
+
+    def _call_llm(
+        self,
+        prompt: str,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        # An injected client keeps its own pool and config; otherwise use the shared
+        # process-wide client behind call_llm. on_event streams partial JSON fields; a
+        # client following progress gets them as "partial" events by default.
+        if on_event is None:
+            on_event = partial_sink()
+        report_stage("llm_started", prompt_chars=len(prompt))
+        started = time.monotonic()
+        if self._llm_client is not None:
+            result = self._llm_client.call(prompt, on_event=on_event)
+        elif on_event is not None:
+            result = call_llm(prompt, on_event=on_event)
+        else:
+            result = call_llm(prompt)
+        report_stage("llm_done", ok=result is not None, seconds=round(time.monotonic() - started, 3))
+        return result
+
+    def _prompt_bundle(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        # Prompt bundles are static between deploys: serve them from memory while fresh,
+        # then revalidate with the bundle's content_hash so an unchanged bundle comes back
+        # as a small not_modified payload instead of the full overview/spec/schema.
+        key = name + ":" + json.dumps(arguments, sort_keys=True, default=str)
+        with self._prompt_cache_lock:
+            cached = self._prompt_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._prompt_cache_ttl:
+            report_stage("prompt_bundle_fetched", tool=name, source="memory")
+            return self._wrap_result(name, copy.deepcopy(cached[1]), warnings=[])
+
+        request = dict(arguments)
+        if cached is not None:
+            request["if_none_match"] = cached[1]["content_hash"]
+        result = self.call_tool(name=name, arguments=request)
+        full = result.get("full_result") or {}
+        if result.get("status") != "ok" or full.get("error"):
+            return result
+        if full.get("not_modified") and cached is not None:
+            with self._prompt_cache_lock:
+                self._prompt_cache[key] = (time.monotonic(), cached[1])
+            report_stage("prompt_bundle_fetched", tool=name, source="revalidated")
+            return self._wrap_result(name, copy.deepcopy(cached[1]), warnings=[])
+        if full.get("content_hash") and self._prompt_cache_ttl >= 0:
+            with self._prompt_cache_lock:
+                self._prompt_cache[key] = (time.monotonic(), copy.deepcopy(full))
+        report_stage("prompt_bundle_fetched", tool=name, source="mcp")
+        return result
+
+    def clear_prompt_cache(self) -> None:
+        with self._prompt_cache_lock:
+            self._prompt_cache.clear()
 
     def _wrap_result(self, name: str, result: Dict[str, Any], warnings: List[str]) -> Dict[str, Any]:
         safe_summary = self._safe_summary(result)
@@ -532,3 +519,29 @@ class StudyAgent:
             if isinstance(result.get(key), list):
                 summary[f"{key}_count"] = len(result.get(key) or [])
         return summary
+
+
+def _wilson_interval(successes: int, total: int, z: float = 1.96) -> Optional[List[float]]:
+    if total <= 0:
+        return None
+    p = successes / total
+    denom = 1.0 + z * z / total
+    centre = (p + z * z / (2 * total)) / denom
+    margin = z * math.sqrt(p * (1.0 - p) / total + z * z / (4 * total * total)) / denom
+    return [round(max(0.0, centre - margin), 4), round(min(1.0, centre + margin), 4)]
+
+
+def _ppv_estimates(counts: Dict[str, int]) -> Dict[str, Any]:
+    # Keeper cases come from the phenotype, so PPV = confirmed / adjudicated.
+    # "unknown" is excluded from the point estimate and bounded both ways.
+    yes, no, unknown = counts.get("yes", 0), counts.get("no", 0), counts.get("unknown", 0)
+    decided = yes + no
+    reviewed = decided + unknown
+    return {
+        "estimate": round(yes / decided, 4) if decided else None,
+        "ci95": _wilson_interval(yes, decided),
+        "lower_bound": round(yes / reviewed, 4) if reviewed else None,
+        "upper_bound": round((yes + unknown) / reviewed, 4) if reviewed else None,
+        "adjudicated": decided,
+        "reviewed": reviewed,
+    }
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import io
+import json
+import os
+import socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple, Type
+
+from .server import ACPRequestHandler
+
+_MAX_HEADER_BYTES = 64 * 1024
+
+
+def _parse_flow_limits(spec: str) -> Dict[str, int]:
+    # "phenotype_validation_review_batch=1,phenotype_recommendation=8"
+    limits: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class FlowLimiter:
+    # Admission control for flow requests: at most max_inflight run at once and at most
+    # the flow's own limit run per flow; up to max_queue more wait for a slot, and
+    # anything beyond that is turned away. Waiters are admitted in arrival order: a freed
+    # slot goes to the oldest waiter that can use it, and a new arrival only takes a slot
+    # directly when no waiter could. Used from the event loop thread only.
+    def __init__(
+        self,
+        max_inflight: int = 16,
+        per_flow: int = 4,
+        flow_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 64,
+    ) -> None:
+        self.max_inflight = max(1, int(max_inflight))
+        self.per_flow = max(1, int(per_flow))
+        self.flow_limits = dict(flow_limits or {})
+        self.max_queue = max(0, int(max_queue))
+        self.running = 0
+        self.rejected = 0
+        self._running_by_flow: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[str, "asyncio.Future[None]"]] = deque()
+
+    @classmethod
+    def from_env(cls) -> "FlowLimiter":
+        return cls(
+            max_inflight=int(os.getenv("ACP_MAX_INFLIGHT", "16")),
+            per_flow=int(os.getenv("ACP_FLOW_CONCURRENCY", "4")),
+            flow_limits=_parse_flow_limits(os.getenv("ACP_FLOW_LIMITS", "")),
+            max_queue=int(os.getenv("ACP_MAX_QUEUE", "64")),
+        )
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def limit(self, flow: str) -> int:
+        return max(1, int(self.flow_limits.get(flow, self.per_flow)))
+
+    async def acquire(self, flow: str) -> bool:
+        # Every waiter that fits was admitted when the last slot freed up, so a slot that
+        # is free now is one no waiter can use.
+        if self._has_slot(flow):
+            self._take(flow)
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+        admitted = asyncio.get_running_loop().create_future()
+        entry = (flow, admitted)
+        self._waiters.append(entry)
+        try:
+            await admitted
+        except asyncio.CancelledError:
+            if admitted.done() and not admitted.cancelled():
+                # Admitted just as the request went away: hand the slot on.
+                await self.release(flow)
+            else:
+                self._waiters.remove(entry)
+            raise
+        return True
+
+    async def release(self, flow: str) -> None:
+        self.running -= 1
+        self._running_by_flow[flow] -= 1
+        self._admit_waiters()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "running_by_flow": {name: count for name, count in self._running_by_flow.items() if count},
+        }
+
+    def _admit_waiters(self) -> None:
+        # Oldest first; a waiter whose flow is at its own limit does not hold up waiters
+        # of other flows behind it.
+        for entry in list(self._waiters):
+            if self.running >= self.max_inflight:
+                return
+            flow, admitted = entry
+            if self._has_slot(flow):
+                self._waiters.remove(entry)
+                self._take(flow)
+                admitted.set_result(None)
+
+    def _take(self, flow: str) -> None:
+        self.running += 1
+        self._running_by_flow[flow] = self._running_by_flow.get(flow, 0) + 1
+
+    def _has_slot(self, flow: str) -> bool:
+        return self.running < self.max_inflight and self._running_by_flow.get(flow, 0) < self.limit(flow)
+
+
+class _LoopWriter:
+    # The handler's wfile: hands each write to the event loop and waits for it to drain,
+    # so a slow client slows its own worker instead of growing an unbounded buffer.
+    def __init__(self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter) -> None:
+        self._loop = loop
+        self._writer = writer
+
+    def write(self, data: bytes) -> int:
+        asyncio.run_coroutine_threadsafe(self._send(bytes(data)), self._loop).result()
+        return len(data)
+
+    def flush(self) -> None:
+        return None
+
+    async def _send(self, data: bytes) -> None:
+        if self._writer.is_closing():
+            raise ConnectionResetError("client disconnected")
+        self._writer.write(data)
+        await self._writer.drain()
+
+
+class AsyncACPServer:
+    # asyncio front end for ACPRequestHandler. Connections, keep-alive and request
+    # parsing live on the event loop, so idle and queued clients hold no thread. Each
+    # admitted flow request is replayed through the same handler routes on a worker pool
+    # sized to the in-flight limit. Other routes (health, services, job polling) run on
+    # a pool of their own, so they still answer while every flow slot is busy.
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        handler_class: Type[ACPRequestHandler],
+        limiter: Optional[FlowLimiter] = None,
+        retry_after: int = 5,
+        control_workers: int = 4,
+    ) -> None:
+        self.handler_class = handler_class
+        self.limiter = limiter or FlowLimiter()
+        self.retry_after = int(retry_after)
+        self.socket = socket.create_server(address)
+        self.server_address = self.socket.getsockname()[:2]
+        self._executor = ThreadPoolExecutor(max_workers=self.limiter.max_inflight, thread_name_prefix="acp-async")
+        self._control_executor = ThreadPoolExecutor(
+            max_workers=max(1, control_workers), thread_name_prefix="acp-async-control"
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._connections: Dict["asyncio.Task[None]", asyncio.StreamWriter] = {}
+
+    def serve_forever(self) -> None:
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, sock=self.socket, limit=_MAX_HEADER_BYTES)
+        async with server:
+            await self._stopped.wait()
+            # Kept-alive connections would otherwise hold the server open.
+            for writer in list(self._connections.values()):
+                writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections), timeout=5)
+
+    def shutdown(self) -> None:
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def server_close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._control_executor.shutdown(wait=False, cancel_futures=True)
+        self.socket.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername") or ("", 0)
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader, writer), self.handler_class.timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if request is None:
+                    break
+                raw, flow = request
+                if flow is not None and not await self.limiter.acquire(flow):
+                    await self._reject(writer)
+                    continue
+                executor = self._executor if flow is not None else self._control_executor
+                try:
+                    close = await self._loop.run_in_executor(executor, self._run_handler, raw, writer, peer)
+                finally:
+                    if flow is not None:
+                        await self.limiter.release(flow)
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> Optional[Tuple[bytes, Optional[str]]]:
+        # Reads one whole request (head and body) so it can be replayed to the handler,
+        # and names the flow it belongs to (None for requests that are not limited).
+        head = await reader.readuntil(b"\r\n\r\n")
+        if not head.strip():
+            return None
+        request_line, _, header_block = head.partition(b"\r\n")
+        parts = request_line.decode("latin-1").split()
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+        if "100-continue" in (headers.get("Expect") or "").lower():
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        body = b""
+        if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+            chunks = []
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                chunks.append(line)
+                size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    while True:
+                        trailer = await reader.readuntil(b"\r\n")
+                        chunks.append(trailer)
+                        if trailer == b"\r\n":
+                            break
+                    break
+                chunks.append(await reader.readexactly(size + 2))
+            body = b"".join(chunks)
+        elif int(headers.get("Content-Length") or "0") > 0:
+            body = await reader.readexactly(int(headers["Content-Length"]))
+        flow = None
+        if len(parts) == 3 and parts[0] == "POST" and parts[1] != "/jobs":
+            flow = parts[1][len("/flows/") :] if parts[1].startswith("/flows/") else parts[1].strip("/")
+        return head + body, flow
+
+    def _run_handler(self, raw: bytes, writer: asyncio.StreamWriter, peer: Tuple[str, int]) -> bool:
+        # Runs one request through the ordinary ACPRequestHandler code on a worker thread.
+        handler = self.handler_class.__new__(self.handler_class)
+        handler.rfile = io.BytesIO(raw)
+        handler.wfile = _LoopWriter(self._loop, writer)
+        handler.client_address = peer[:2]
+        handler.server = self
+        handler.request = None
+        handler.close_connection = True
+        # 100 Continue was already sent while reading the body.
+        handler.handle_expect_100 = lambda: True
+        try:
+            handler.handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            return True
+        except Exception as exc:
+            print(f"ACP ASYNC > request failed: {exc}")
+            return True
+        return handler.close_connection
+
+    async def _reject(self, writer: asyncio.StreamWriter) -> None:
+        body = json.dumps({"error": "server_busy", "retry_after": self.retry_after, **self.limiter.stats()}).encode("utf-8")
+        writer.write(
+            b"HTTP/1.1 429 Too Many Requests\r\n"
+            b"Content-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nRetry-After: {self.retry_after}\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
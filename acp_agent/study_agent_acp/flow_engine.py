@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import contextvars
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .jobs import step_cancel_scope
+from .llm_cache import cache_bypassed
+from .llm_client import phi_guarded
+from .progress import step_scope
+
+Values = Dict[str, Any]
+
+STEP_KINDS = ("tool", "bundle", "prompt", "llm", "core")
+
+
+class FlowAbort(Exception):
+    # Raised by a step to end its flow with payload as the response.
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        super().__init__(payload.get("error"))
+        self.payload = payload
+
+
+@dataclass
+class Step:
+    # One node of a flow DAG; its output is stored under its name. inputs are flow
+    # parameters or earlier steps. "tool" calls an MCP tool and "bundle" fetches a
+    # prompt bundle (both with arguments(values)); "llm" sends its single input as the
+    # prompt, or outputs None without a call when that input is None; "prompt" and
+    # "core" call run(values).
+    name: str
+    kind: str
+    inputs: Tuple[str, ...] = ()
+    tool: Optional[str] = None
+    arguments: Optional[Callable[[Values], Dict[str, Any]]] = None
+    run: Optional[Callable[[Values], Any]] = None
+    # For tool and bundle steps: the flow fails with this error code (and the tool
+    # result as details) unless the call succeeded.
+    error: Optional[str] = None
+    timeout: Optional[float] = None
+    # Steps whose output depends only on their arguments may be cached under this key.
+    cache_key: Optional[Callable[[Values], str]] = None
+    # For llm steps whose prompt carries patient data: send it under phi_guarded().
+    phi_guard: bool = False
+
+
+@dataclass
+class FlowSpec:
+    name: str
+    params: Tuple[str, ...]
+    steps: List[Step]
+    output: Callable[[Values], Dict[str, Any]]
+    required: Tuple[str, ...] = ()
+    requires_mcp: bool = True
+    # Named groups of steps reported together as "branch_timings".
+    branches: Optional[Dict[str, Tuple[str, ...]]] = None
+
+    def __post_init__(self) -> None:
+        # Steps are declared in dependency order, so sequential mode can run them as listed.
+        known = set(self.params)
+        for step in self.steps:
+            if step.kind not in STEP_KINDS:
+                raise ValueError(f"{self.name}.{step.name}: unknown step kind {step.kind}")
+            if step.name in known:
+                raise ValueError(f"{self.name}.{step.name}: duplicate name")
+            missing = [name for name in step.inputs if name not in known]
+            if missing:
+                raise ValueError(f"{self.name}.{step.name}: undeclared inputs {missing}")
+            if step.kind == "llm" and len(step.inputs) != 1:
+                raise ValueError(f"{self.name}.{step.name}: llm steps take one prompt input")
+            known.add(step.name)
+        for branch, names in (self.branches or {}).items():
+            unknown = [name for name in names if name not in known or name in self.params]
+            if unknown:
+                raise ValueError(f"{self.name}: branch {branch} names unknown steps {unknown}")
+
+    def tools(self) -> List[str]:
+        return [step.tool for step in self.steps if step.kind in ("tool", "bundle") and step.tool]
+
+
+def _parse_step_timeouts(spec: str) -> Dict[str, float]:
+    # "tool=30,llm=200": default timeout per step kind.
+    timeouts: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip() and float(value) > 0:
+            timeouts[name.strip()] = float(value)
+    return timeouts
+
+
+def _tool_failed(result: Dict[str, Any]) -> bool:
+    return result.get("status") != "ok" or bool((result.get("full_result") or {}).get("error"))
+
+
+class FlowEngine:
+    # Runs a FlowSpec: every step whose inputs are ready starts at once on a shared
+    # worker pool, so a flow takes as long as its critical path. The first failing step
+    # ends the flow. Each step's wall time is returned as the flow's "timings".
+    #
+    # A step that overruns its timeout fails the flow with "<step>_timeout". Python
+    # threads cannot be killed, so a step that times out or belongs to a failed flow is
+    # cancelled cooperatively. Its MCP calls see job_cancelled() and are abandoned within
+    # a quarter second (and MCP is told to stop them). An LLM request or core function
+    # in progress runs to completion, bounded by LLM_TIMEOUT, and its result is dropped.
+    # The same holds for a step run inline on the caller's thread: its timeout cancels
+    # its MCP calls, and it fails the flow once it returns.
+    def __init__(
+        self,
+        call_tool: Callable[..., Dict[str, Any]],
+        prompt_bundle: Callable[..., Dict[str, Any]],
+        call_llm: Callable[[str], Optional[Dict[str, Any]]],
+        workers: int = 8,
+        timeouts: Optional[Dict[str, float]] = None,
+        cache_ttl: float = 0.0,
+        cache_size: int = 256,
+    ) -> None:
+        self._call_tool = call_tool
+        self._prompt_bundle = prompt_bundle
+        self._call_llm = call_llm
+        self._workers = max(0, int(workers))
+        self._timeouts = dict(timeouts or {})
+        self._cache_ttl = cache_ttl
+        self._cache_size = max(1, cache_size)
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Steps submitted to the pool and not yet finished, across all flows.
+        self._outstanding = 0
+
+    @staticmethod
+    def env_settings() -> Dict[str, Any]:
+        return {
+            "workers": int(os.getenv("ACP_STEP_WORKERS", "8")),
+            "timeouts": _parse_step_timeouts(os.getenv("ACP_STEP_TIMEOUTS", "")),
+            "cache_ttl": float(os.getenv("ACP_STEP_CACHE_TTL", "0")),
+        }
+
+    def run(self, spec: FlowSpec, params: Values) -> Dict[str, Any]:
+        values: Values = {name: params.get(name) for name in spec.params}
+        timings: Dict[str, float] = {}
+        spans: Dict[str, Tuple[float, float]] = {}
+        flow_started = time.monotonic()
+        debug = os.getenv("STUDY_AGENT_DEBUG", "0") == "1"
+        pool = self._get_pool()
+        pending = list(spec.steps)
+        running: Dict[Future, Tuple[Step, float, threading.Event]] = {}
+        branch_of = {name: branch for branch, names in (spec.branches or {}).items() for name in names}
+
+        def _finish(step: Step, started: float, outcome: Callable[[], Any]) -> None:
+            try:
+                values[step.name] = outcome()
+            finally:
+                finished = time.monotonic()
+                timings[step.name] = round(finished - started, 3)
+                spans[step.name] = (started - flow_started, finished - flow_started)
+                if debug:
+                    print(f"ACP DEBUG > {spec.name}: {step.name} done in {timings[step.name]}s")
+
+        def _run_inline(step: Step, started: float, cancel: threading.Event) -> None:
+            # No engine loop watches this step, so a timer stands in for its deadline.
+            timeout = self._timeout(step)
+            timer = threading.Timer(max(0.0, started + timeout - time.monotonic()), cancel.set) if timeout else None
+            if timer is not None:
+                timer.daemon = True
+                timer.start()
+            try:
+                branch = branch_of.get(step.name)
+                _finish(step, started, lambda view=dict(values): self._run_cancellable(cancel, step, view, branch))
+            except FlowAbort:
+                raise
+            except Exception:
+                if cancel.is_set():
+                    raise FlowAbort(_timeout_payload(step, timeout)) from None
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            if cancel.is_set():
+                raise FlowAbort(_timeout_payload(step, timeout))
+
+        try:
+            while pending or running:
+                ready = [step for step in pending if all(name in values for name in step.inputs)]
+                for step in ready:
+                    pending.remove(step)
+                    if debug:
+                        print(f"ACP DEBUG > {spec.name}: {step.name} started")
+                    started = time.monotonic()
+                    cancel = threading.Event()
+                    if pool is None:
+                        _run_inline(step, started, cancel)
+                        continue
+                    future = self._submit(pool, cancel, step, dict(values), branch_of.get(step.name))
+                    running[future] = (step, started, cancel)
+                if not running:
+                    if pending and not ready:
+                        raise RuntimeError(f"{spec.name}: steps {[step.name for step in pending]} can never run")
+                    continue
+                # When every worker is taken and none of this flow's steps has started, one
+                # of them runs here instead, so a busy pool (or a flow nested in a step)
+                # cannot stall this flow. Otherwise the queued steps wait for a worker and
+                # this loop keeps starting the dependents of whichever step ends first.
+                stolen = None
+                if self._pool_saturated() and not any(future.running() for future in running):
+                    stolen = next((future for future in running if future.cancel()), None)
+                if stolen is not None:
+                    step, started, cancel = running.pop(stolen)
+                    _run_inline(step, started, cancel)
+                    continue
+                now = time.monotonic()
+                deadlines = [
+                    started + self._timeout(step) - now for step, started, _ in running.values() if self._timeout(step)
+                ]
+                done, _ = wait(
+                    list(running), timeout=max(0.0, min(deadlines)) if deadlines else None, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    step, started, _ = running.pop(future)
+                    _finish(step, started, future.result)
+                now = time.monotonic()
+                for future, (step, started, _) in list(running.items()):
+                    if self._timeout(step) and now - started >= self._timeout(step):
+                        timings[step.name] = round(now - started, 3)
+                        raise FlowAbort(_timeout_payload(step, self._timeout(step)))
+        except FlowAbort as abort:
+            return {**abort.payload, "timings": timings}
+        finally:
+            # Steps of a failed flow that have not started are dropped; running ones are
+            # cancelled (see above) and their results are discarded.
+            for future, (_, _, cancel) in running.items():
+                future.cancel()
+                cancel.set()
+
+        result = spec.output(values)
+        if isinstance(result, dict):
+            result.setdefault("timings", timings)
+            if spec.branches:
+                result.setdefault("branch_timings", _branch_timings(spec.branches, spans))
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _timeout(self, step: Step) -> Optional[float]:
+        return step.timeout or self._timeouts.get(step.kind)
+
+    def _get_pool(self) -> Optional[ThreadPoolExecutor]:
+        if self._workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="acp-step")
+            return self._pool
+
+    def _submit(
+        self, pool: ThreadPoolExecutor, cancel: threading.Event, step: Step, values: Values, branch: Optional[str]
+    ) -> Future:
+        with self._lock:
+            self._outstanding += 1
+        future = pool.submit(contextvars.copy_context().run, self._run_cancellable, cancel, step, values, branch)
+        future.add_done_callback(self._step_done)
+        return future
+
+    def _step_done(self, _future: Future) -> None:
+        with self._lock:
+            self._outstanding -= 1
+
+    def _pool_saturated(self) -> bool:
+        with self._lock:
+            return self._outstanding > self._workers
+
+    def _run_cancellable(self, cancel: threading.Event, step: Step, values: Values, branch: Optional[str]) -> Any:
+        # Progress events the step emits carry its name and branch.
+        with step_cancel_scope(cancel), step_scope(step.name, branch):
+            return self._run_step(step, values)
+
+    def _run_step(self, step: Step, values: Values) -> Any:
+        key = None
+        if step.cache_key is not None and self._cache_ttl > 0 and not cache_bypassed():
+            key = f"{step.tool or step.name}:{step.cache_key(values)}"
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+                return copy.deepcopy(cached[1])
+        if step.kind in ("tool", "bundle"):
+            arguments = step.arguments(values) if step.arguments is not None else {}
+            call = self._call_tool if step.kind == "tool" else self._prompt_bundle
+            output = call(name=step.tool, arguments=arguments)
+            if step.error and _tool_failed(output):
+                raise FlowAbort({"status": "error", "error": step.error, "details": output})
+        elif step.kind == "llm":
+            prompt = values[step.inputs[0]]
+            if prompt is None:
+                output = None
+            elif step.phi_guard:
+                with phi_guarded():
+                    output = self._call_llm(prompt)
+            else:
+                output = self._call_llm(prompt)
+        else:
+            output = step.run(values)
+        if key is not None:
+            with self._lock:
+                if len(self._cache) >= self._cache_size:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[key] = (time.monotonic(), copy.deepcopy(output))
+        return output
+
+
+def _timeout_payload(step: Step, timeout: Optional[float]) -> Dict[str, Any]:
+    return {"status": "error", "error": f"{step.name}_timeout", "timeout_seconds": timeout}
+
+
+def _branch_timings(branches: Dict[str, Tuple[str, ...]], spans: Dict[str, Tuple[float, float]]) -> Dict[str, Any]:
+    # started/finished are seconds from the start of the flow, so overlapping branches
+    # show up as overlapping intervals; seconds is the time spent in the branch's steps.
+    timings: Dict[str, Any] = {}
+    for branch, names in branches.items():
+        ran = [spans[name] for name in names if name in spans]
+        if ran:
+            timings[branch] = {
+                "started": round(min(start for start, _ in ran), 3),
+                "finished": round(max(end for _, end in ran), 3),
+                "seconds": round(sum(end - start for start, end in ran), 3),
+            }
+    return timings
+
+
+def cache_key_json(*names: str) -> Callable[[Values], str]:
+    return lambda values: json.dumps({name: values.get(name) for name in names}, sort_keys=True, default=str)
@@ -0,0 +1,593 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from study_agent_core.tools import (
+    phenotype_intent_split,
+    phenotype_recommendation_advice,
+    phenotype_recommendations,
+)
+
+from .flow_engine import FlowAbort, FlowSpec, Step, Values, cache_key_json
+from .llm_client import (
+    build_advice_prompt,
+    build_improvements_prompt,
+    build_intent_split_prompt,
+    build_keeper_prompt,
+    build_lint_prompt,
+    build_prompt,
+)
+from .progress import report_stage
+
+
+def _full(values: Values, step: str = "prompt_bundle") -> Dict[str, Any]:
+    return values[step].get("full_result") or {}
+
+
+def _bundle_kwargs(values: Values, step: str = "prompt_bundle") -> Dict[str, Any]:
+    full = _full(values, step)
+    return {
+        "overview": full.get("overview", ""),
+        "spec": full.get("spec", ""),
+        "output_schema": full.get("output_schema", {}),
+    }
+
+
+def _with_llm_used(result: Dict[str, Any], values: Values) -> Dict[str, Any]:
+    report_stage("validation_done", status=result.get("status"))
+    if isinstance(result, dict):
+        result.setdefault("llm_used", values["llm"] is not None)
+    return result
+
+
+# phenotype_recommendation
+
+
+def _search_arguments(values: Values) -> Dict[str, Any]:
+    arguments = {"query": values["study_intent"], "top_k": values["top_k"]}
+    if values["candidate_offset"] is not None:
+        arguments["offset"] = int(values["candidate_offset"])
+    return arguments
+
+
+def _select_candidates_from(full: Dict[str, Any], candidate_limit: Optional[int], **stage: Any) -> Dict[str, Any]:
+    if full.get("error"):
+        payload = {
+            "status": "error",
+            "error": full.get("error"),
+            "details": full,
+        }
+        if full.get("error") == "phenotype_index_unavailable":
+            payload["hint"] = (
+                "Set PHENOTYPE_INDEX_DIR to the phenotype_index directory "
+                "(prefer an absolute path) and verify catalog.jsonl exists."
+            )
+        raise FlowAbort(payload)
+    if "results" not in full and full.get("content"):
+        raise FlowAbort({"status": "error", "error": "phenotype_search_failed", "details": full})
+    candidates = full.get("results") or []
+    if candidate_limit is None:
+        candidate_limit = int(os.getenv("LLM_CANDIDATE_LIMIT", "10"))
+    if candidate_limit > 0:
+        candidates = candidates[:candidate_limit]
+    report_stage("search_done", candidates=len(candidates), total=len(full.get("results") or []), **stage)
+    return {"search": full, "candidates": candidates, "candidate_limit": candidate_limit}
+
+
+def _recommend(study_intent: str, selected: Dict[str, Any], values: Values, llm_result: Any, **stage: Any) -> Dict[str, Any]:
+    catalog_rows = []
+    for row in selected["candidates"]:
+        if not isinstance(row, dict):
+            continue
+        catalog_rows.append(
+            {
+                "cohortId": row.get("cohortId"),
+                "cohortName": row.get("name") or "",
+                "short_description": row.get("short_description"),
+            }
+        )
+    core_result = phenotype_recommendations(
+        protocol_text=study_intent,
+        catalog_rows=catalog_rows,
+        max_results=values["max_results"],
+        llm_result=llm_result,
+    )
+    report_stage("validation_done", recommendations=len(core_result.get("phenotype_recommendations") or []), **stage)
+    return core_result
+
+
+def _recommendation_result(selected: Dict[str, Any], values: Values, llm_result: Any, recommendations: Any) -> Dict[str, Any]:
+    return {
+        "status": "ok",
+        "search": selected["search"],
+        "llm_used": llm_result is not None,
+        "candidate_limit": selected["candidate_limit"],
+        "candidate_offset": values["candidate_offset"] or 0,
+        "candidate_count": len(selected["candidates"]),
+        "recommendations": recommendations,
+    }
+
+
+def _recommendation_prompt(values: Values) -> str:
+    return build_prompt(
+        **_bundle_kwargs(values),
+        study_intent=values["study_intent"],
+        candidates=values["candidates"]["candidates"],
+        max_results=values["max_results"],
+    )
+
+
+PHENOTYPE_RECOMMENDATION = FlowSpec(
+    name="phenotype_recommendation",
+    params=("study_intent", "top_k", "max_results", "candidate_limit", "candidate_offset"),
+    required=("study_intent",),
+    steps=[
+        Step(
+            "search",
+            "tool",
+            inputs=("study_intent", "top_k", "candidate_offset"),
+            tool="phenotype_search",
+            arguments=_search_arguments,
+            error="phenotype_search_failed",
+            cache_key=cache_key_json("study_intent", "top_k", "candidate_offset"),
+        ),
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_prompt_bundle",
+            arguments=lambda values: {"task": "phenotype_recommendations"},
+            error="phenotype_prompt_bundle_failed",
+        ),
+        Step(
+            "candidates",
+            "core",
+            inputs=("search", "candidate_limit"),
+            run=lambda values: _select_candidates_from(
+                values["search"].get("full_result") or {}, values["candidate_limit"]
+            ),
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "candidates", "study_intent", "max_results"),
+            run=_recommendation_prompt,
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step(
+            "validate",
+            "core",
+            inputs=("candidates", "llm", "study_intent", "max_results"),
+            run=lambda values: _recommend(values["study_intent"], values["candidates"], values, values["llm"]),
+        ),
+    ],
+    output=lambda values: _recommendation_result(values["candidates"], values, values["llm"], values["validate"]),
+)
+
+
+# phenotype_recommendation_advice
+
+
+def _validate_advice(values: Values) -> Dict[str, Any]:
+    core_result = phenotype_recommendation_advice(study_intent=values["study_intent"], llm_result=values["llm"])
+    report_stage("validation_done", mode=core_result.get("mode"))
+    return core_result
+
+
+PHENOTYPE_RECOMMENDATION_ADVICE = FlowSpec(
+    name="phenotype_recommendation_advice",
+    params=("study_intent",),
+    required=("study_intent",),
+    steps=[
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_recommendation_advice",
+            error="phenotype_recommendation_advice_prompt_failed",
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "study_intent"),
+            run=lambda values: build_advice_prompt(**_bundle_kwargs(values), study_intent=values["study_intent"]),
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step("validate", "core", inputs=("llm", "study_intent"), run=_validate_advice),
+    ],
+    output=lambda values: {"status": "ok", "llm_used": values["llm"] is not None, "advice": values["validate"]},
+)
+
+
+# phenotype_intent_split
+
+
+def _split_intent(study_intent: str, llm_result: Any) -> Dict[str, Any]:
+    if llm_result is None:
+        raise FlowAbort({"status": "error", "error": "llm_unavailable"})
+    core_result = phenotype_intent_split(study_intent=study_intent, llm_result=llm_result)
+    report_stage("validation_done", mode=core_result.get("mode"))
+    return core_result
+
+
+PHENOTYPE_INTENT_SPLIT = FlowSpec(
+    name="phenotype_intent_split",
+    params=("study_intent",),
+    required=("study_intent",),
+    steps=[
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_intent_split",
+            error="phenotype_intent_split_prompt_failed",
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "study_intent"),
+            run=lambda values: build_intent_split_prompt(**_bundle_kwargs(values), study_intent=values["study_intent"]),
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step(
+            "validate",
+            "core",
+            inputs=("llm", "study_intent"),
+            run=lambda values: _split_intent(values["study_intent"], values["llm"]),
+        ),
+    ],
+    output=lambda values: {"status": "ok", "llm_used": values["llm"] is not None, "intent_split": values["validate"]},
+)
+
+
+# phenotype_improvements
+
+
+def _first_cohort(values: Values) -> List[Dict[str, Any]]:
+    cohorts = values["cohorts"] or []
+    return cohorts[:1]
+
+
+def _improvements_output(values: Values) -> Dict[str, Any]:
+    result = _with_llm_used(values["validate"], values)
+    if isinstance(result, dict):
+        result.setdefault("cohort_count", len(_first_cohort(values)))
+    return result
+
+
+PHENOTYPE_IMPROVEMENTS = FlowSpec(
+    name="phenotype_improvements",
+    params=("protocol_text", "cohorts", "characterization_previews"),
+    steps=[
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_prompt_bundle",
+            arguments=lambda values: {"task": "phenotype_improvements"},
+            error="phenotype_prompt_bundle_failed",
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "protocol_text", "cohorts"),
+            run=lambda values: build_improvements_prompt(
+                **_bundle_kwargs(values),
+                study_intent=values["protocol_text"],
+                cohorts=_first_cohort(values),
+            ),
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step(
+            "validate",
+            "tool",
+            inputs=("llm", "protocol_text", "cohorts", "characterization_previews"),
+            tool="phenotype_improvements",
+            arguments=lambda values: {
+                "protocol_text": values["protocol_text"],
+                "cohorts": _first_cohort(values),
+                "characterization_previews": values["characterization_previews"] or [],
+                "llm_result": values["llm"],
+            },
+        ),
+    ],
+    output=_improvements_output,
+)
+
+
+# concept_sets_review
+
+
+CONCEPT_SETS_REVIEW = FlowSpec(
+    name="concept_sets_review",
+    params=("concept_set", "study_intent"),
+    steps=[
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="lint_prompt_bundle",
+            arguments=lambda values: {"task": "concept_sets_review"},
+            error="lint_prompt_bundle_failed",
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "concept_set", "study_intent"),
+            run=lambda values: build_lint_prompt(
+                **_bundle_kwargs(values),
+                task="concept-sets-review",
+                payload={"concept_set": values["concept_set"], "study_intent": values["study_intent"]},
+                max_kb=15,
+            ),
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step(
+            "validate",
+            "tool",
+            inputs=("llm", "concept_set", "study_intent"),
+            tool="propose_concept_set_diff",
+            arguments=lambda values: {
+                "concept_set": values["concept_set"],
+                "study_intent": values["study_intent"],
+                "llm_result": values["llm"],
+            },
+        ),
+    ],
+    output=lambda values: _with_llm_used(values["validate"], values),
+)
+
+
+# cohort_critique_general_design
+
+
+COHORT_CRITIQUE_GENERAL_DESIGN = FlowSpec(
+    name="cohort_critique_general_design",
+    params=("cohort",),
+    steps=[
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_prompt_bundle",
+            arguments=lambda values: {"task": "cohort_critique_general_design"},
+            error="phenotype_prompt_bundle_failed",
+        ),
+        Step(
+            "prompt",
+            "prompt",
+            inputs=("prompt_bundle", "cohort"),
+            run=lambda values: build_lint_prompt(
+                **_bundle_kwargs(values),
+                task="cohort-critique-general-design",
+                payload={"cohort": values["cohort"]},
+                max_kb=15,
+            ),
+        ),
+        Step("llm", "llm", inputs=("prompt",)),
+        Step(
+            "validate",
+            "tool",
+            inputs=("llm", "cohort"),
+            tool="cohort_lint",
+            arguments=lambda values: {"cohort": values["cohort"], "llm_result": values["llm"]},
+        ),
+    ],
+    output=lambda values: _with_llm_used(values["validate"], values),
+)
+
+
+# phenotype_validation_review
+
+
+def _keeper_prompt(values: Values) -> str:
+    return build_keeper_prompt(
+        **_bundle_kwargs(values),
+        system_prompt=_full(values).get("system_prompt") or "",
+        main_prompt=_full(values, "case_prompt").get("prompt") or "",
+    )
+
+
+def _validation_review_output(values: Values) -> Dict[str, Any]:
+    parsed = values["parse"]
+    report_stage("validation_done", label=(parsed.get("full_result") or {}).get("label"))
+    if isinstance(parsed, dict):
+        parsed.setdefault("llm_used", values["llm"] is not None)
+    return parsed
+
+
+PHENOTYPE_VALIDATION_REVIEW = FlowSpec(
+    name="phenotype_validation_review",
+    params=("keeper_row", "disease_name"),
+    required=("disease_name",),
+    steps=[
+        # Building the case prompt needs the sanitized row; the prompt bundle does not.
+        Step(
+            "sanitize",
+            "tool",
+            inputs=("keeper_row",),
+            tool="keeper_sanitize_row",
+            arguments=lambda values: {"row": values["keeper_row"]},
+            error="phi_detected",
+        ),
+        Step(
+            "prompt_bundle",
+            "bundle",
+            inputs=("disease_name",),
+            tool="keeper_prompt_bundle",
+            arguments=lambda values: {"disease_name": values["disease_name"]},
+            error="keeper_prompt_bundle_failed",
+        ),
+        Step(
+            "case_prompt",
+            "tool",
+            inputs=("sanitize", "disease_name"),
+            tool="keeper_build_prompt",
+            arguments=lambda values: {
+                "disease_name": values["disease_name"],
+                "sanitized_row": _full(values, "sanitize").get("sanitized_row") or {},
+            },
+            error="keeper_build_prompt_failed",
+        ),
+        Step("prompt", "prompt", inputs=("prompt_bundle", "case_prompt"), run=_keeper_prompt),
+        Step("llm", "llm", inputs=("prompt",), phi_guard=True),
+        Step(
+            "parse",
+            "tool",
+            inputs=("llm",),
+            tool="keeper_parse_response",
+            arguments=lambda values: {"llm_output": values["llm"]},
+        ),
+    ],
+    output=_validation_review_output,
+)
+
+
+# phenotype_intent_recommendation: intent split, then target and outcome recommendations
+# side by side from one batched search.
+
+_BRANCHES = ("target", "outcome")
+
+
+def _statement(values: Values, branch: str) -> str:
+    return str(values["intent"].get(f"{branch}_statement") or "").strip()
+
+
+def _branch_search_arguments(values: Values) -> Dict[str, Any]:
+    arguments = {"queries": [_statement(values, branch) for branch in _BRANCHES], "top_k": values["top_k"]}
+    if values["candidate_offset"] is not None:
+        arguments["offset"] = int(values["candidate_offset"])
+    return arguments
+
+
+def _branch_candidates(values: Values, index: int) -> Dict[str, Any]:
+    full = values["search"].get("full_result") or {}
+    if full.get("error"):
+        _select_candidates_from(full, values["candidate_limit"])
+    searches = full.get("searches") or []
+    branch_full = searches[index] if index < len(searches) else {"results": []}
+    return _select_candidates_from(branch_full, values["candidate_limit"], branch=_BRANCHES[index])
+
+
+def _branch_prompt(values: Values, branch: str) -> Optional[str]:
+    # No statement for this side of the study: nothing to recommend, and no LLM call.
+    statement = _statement(values, branch)
+    if not statement:
+        return None
+    return build_prompt(
+        **_bundle_kwargs(values),
+        study_intent=statement,
+        candidates=values[f"candidates_{branch}"]["candidates"],
+        max_results=values["max_results"],
+    )
+
+
+def _branch_steps(index: int, branch: str) -> List[Step]:
+    return [
+        Step(
+            f"candidates_{branch}",
+            "core",
+            inputs=("search", "candidate_limit"),
+            run=lambda values: _branch_candidates(values, index),
+        ),
+        Step(
+            f"prompt_{branch}",
+            "prompt",
+            inputs=("prompt_bundle", "intent", f"candidates_{branch}", "max_results"),
+            run=lambda values: _branch_prompt(values, branch),
+        ),
+        Step(f"llm_{branch}", "llm", inputs=(f"prompt_{branch}",)),
+        Step(
+            f"validate_{branch}",
+            "core",
+            inputs=("intent", f"candidates_{branch}", f"llm_{branch}", "max_results"),
+            run=lambda values: _recommend(
+                _statement(values, branch),
+                values[f"candidates_{branch}"],
+                values,
+                values[f"llm_{branch}"],
+                branch=branch,
+            ),
+        ),
+    ]
+
+
+def _intent_recommendation_output(values: Values) -> Dict[str, Any]:
+    result: Dict[str, Any] = {
+        "status": "ok",
+        "llm_used": values["intent_llm"] is not None,
+        "intent_split": values["intent"],
+    }
+    for branch in _BRANCHES:
+        recommendation = _recommendation_result(
+            values[f"candidates_{branch}"], values, values[f"llm_{branch}"], values[f"validate_{branch}"]
+        )
+        recommendation["statement"] = _statement(values, branch)
+        result[branch] = recommendation
+    return result
+
+
+PHENOTYPE_INTENT_RECOMMENDATION = FlowSpec(
+    name="phenotype_intent_recommendation",
+    params=("study_intent", "top_k", "max_results", "candidate_limit", "candidate_offset"),
+    required=("study_intent",),
+    steps=[
+        # Both prompt bundles are fetched up front; the recommendation one is only
+        # needed after the split.
+        Step(
+            "intent_bundle",
+            "bundle",
+            tool="phenotype_intent_split",
+            error="phenotype_intent_split_prompt_failed",
+        ),
+        Step(
+            "prompt_bundle",
+            "bundle",
+            tool="phenotype_prompt_bundle",
+            arguments=lambda values: {"task": "phenotype_recommendations"},
+            error="phenotype_prompt_bundle_failed",
+        ),
+        Step(
+            "intent_prompt",
+            "prompt",
+            inputs=("intent_bundle", "study_intent"),
+            run=lambda values: build_intent_split_prompt(
+                **_bundle_kwargs(values, "intent_bundle"), study_intent=values["study_intent"]
+            ),
+        ),
+        Step("intent_llm", "llm", inputs=("intent_prompt",)),
+        Step(
+            "intent",
+            "core",
+            inputs=("intent_llm", "study_intent"),
+            run=lambda values: _split_intent(values["study_intent"], values["intent_llm"]),
+        ),
+        Step(
+            "search",
+            "tool",
+            inputs=("intent", "top_k", "candidate_offset"),
+            tool="phenotype_search_many",
+            arguments=_branch_search_arguments,
+            error="phenotype_search_failed",
+        ),
+        *_branch_steps(0, "target"),
+        *_branch_steps(1, "outcome"),
+    ],
+    output=_intent_recommendation_output,
+    branches={
+        "intent_split": ("intent_bundle", "intent_prompt", "intent_llm", "intent"),
+        "search": ("search",),
+        "target": ("candidates_target", "prompt_target", "llm_target", "validate_target"),
+        "outcome": ("candidates_outcome", "prompt_outcome", "llm_outcome", "validate_outcome"),
+    },
+)
+
+
+FLOWS: Dict[str, FlowSpec] = {
+    spec.name: spec
+    for spec in (
+        PHENOTYPE_RECOMMENDATION,
+        PHENOTYPE_IMPROVEMENTS,
+        CONCEPT_SETS_REVIEW,
+        COHORT_CRITIQUE_GENERAL_DESIGN,
+        PHENOTYPE_VALIDATION_REVIEW,
+        PHENOTYPE_RECOMMENDATION_ADVICE,
+        PHENOTYPE_INTENT_SPLIT,
+        PHENOTYPE_INTENT_RECOMMENDATION,
+    )
+}
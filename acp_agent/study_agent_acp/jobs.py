@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .progress import progress_scope
+
+FINISHED = ("done", "failed", "cancelled")
+
+# The job whose flow is running in this context, so long flows can stop early on DELETE.
+_CURRENT: contextvars.ContextVar[Optional["Job"]] = contextvars.ContextVar("acp_job", default=None)
+# Cancellation events of the flow steps running in this context; a step of a nested flow
+# sees its own and its parent's. The flow engine sets one when it gives up on a step.
+_STEP_CANCELS: contextvars.ContextVar[Tuple[threading.Event, ...]] = contextvars.ContextVar(
+    "acp_step_cancels", default=()
+)
+
+
+class Job:
+    def __init__(self, flow: str) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.flow = flow
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self.future: Optional[Future] = None
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "flow": self.flow,
+            "status": self.status,
+            "stage": self.stage,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": _seconds(self.submitted_at, self.started_at),
+            "run_seconds": _seconds(self.started_at, self.finished_at),
+        }
+        if self.status in FINISHED:
+            payload["status_code"] = self.status_code
+            if include_result:
+                payload["result"] = self.result
+        return payload
+
+
+class JobManager:
+    # Runs submitted flows on a fixed pool of worker threads. At most max_queue jobs wait
+    # for a worker; finished jobs are kept for ttl_seconds so clients can poll for them.
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, ttl_seconds: float = 3600.0) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.ttl_seconds = float(ttl_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="acp-job")
+        self._jobs: Dict[str, Job] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        return cls(
+            max_workers=int(os.getenv("ACP_JOB_WORKERS", "4")),
+            max_queue=int(os.getenv("ACP_JOB_QUEUE", "64")),
+            ttl_seconds=float(os.getenv("ACP_JOB_TTL", "3600")),
+        )
+
+    def submit(self, flow: str, run: Callable[[], Dict[str, Any]]) -> Optional[Job]:
+        # None when the queue is full; the caller should ask the client to retry later.
+        job = Job(flow)
+        with self._lock:
+            self._purge(time.time())
+            if self._active >= self.max_workers + self.max_queue:
+                return None
+            self._active += 1
+            self._jobs[job.job_id] = job
+        # The caller's context carries request-scoped settings such as the LLM cache bypass.
+        context = contextvars.copy_context()
+        job.future = self._executor.submit(context.run, self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._purge(time.time())
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        with self._lock:
+            self._purge(time.time())
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        # A queued job never starts. A running flow cannot be interrupted mid LLM call; it
+        # stops at its next checkpoint (see job_cancelled) and its result is discarded.
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            if job.status == "queued" and job.future is not None and job.future.cancel():
+                self._active -= 1
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.max_workers, "max_queue": self.max_queue, "ttl_seconds": self.ttl_seconds, "jobs": counts}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, run: Callable[[], Dict[str, Any]]) -> None:
+        with self._lock:
+            if job.cancel_requested:
+                self._active -= 1
+                return
+            job.status = "running"
+            job.started_at = time.time()
+
+        def _track(event: Dict[str, Any]) -> None:
+            if event.get("type") == "stage":
+                job.stage = event.get("stage")
+
+        token = _CURRENT.set(job)
+        try:
+            with progress_scope(_track):
+                result = run()
+            status_code = 200 if result.get("status") != "error" else 500
+        except Exception as exc:
+            print(f"ACP JOB > {job.flow} {job.job_id} failed: {exc}")
+            result, status_code = {"error": "flow_failed", "detail": str(exc)}, 500
+        finally:
+            _CURRENT.reset(token)
+        with self._lock:
+            self._active -= 1
+            if job.cancel_requested:
+                return
+            job.result = result
+            job.status_code = status_code
+            job.status = "done" if status_code == 200 else "failed"
+            job.finished_at = time.time()
+
+    def _purge(self, now: float) -> None:
+        if self.ttl_seconds < 0:
+            return
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def job_cancelled() -> bool:
+    job = _CURRENT.get()
+    if job is not None and job.cancel_requested:
+        return True
+    return any(event.is_set() for event in _STEP_CANCELS.get())
+
+
+@contextmanager
+def step_cancel_scope(event: threading.Event) -> Iterator[None]:
+    # job_cancelled() also reports True inside this scope once event is set.
+    token = _STEP_CANCELS.set(_STEP_CANCELS.get() + (event,))
+    try:
+        yield
+    finally:
+        _STEP_CANCELS.reset(token)
+
+
+def _seconds(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    if start is None:
+        return None
+    return round((end if end is not None else time.time()) - start, 3)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+JSONEvent = Dict[str, Any]
+
+_SCALAR_END = ",}]"
+
+
+class IncrementalJSONParser:
+    # Consumes a model's output text chunk by chunk and tracks the first top-level JSON
+    # object in it (text before the first "{" is ignored, like _extract_json_object).
+    # on_event receives, as soon as each completes:
+    #   {"type": "item", "field": key, "index": i, "value": ...}  one element of a top-level array
+    #   {"type": "field", "field": key, "value": ...}             one top-level value
+    # done turns True when the top-level object closes; anything after it is ignored.
+    def __init__(self, on_event: Optional[Callable[[JSONEvent], None]] = None) -> None:
+        self._on_event = on_event
+        self._buf: List[str] = []
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._field: Optional[str] = None
+        self._field_start = -1
+        self._item_start = -1
+        self._item_index = 0
+        self._expect_key = False
+        self.done = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.done or not chunk:
+            return self.done
+        self._buf.append(chunk)
+        text = "".join(self._buf)
+        self._buf = [text]
+        for pos in range(self._pos, len(text)):
+            self._step(text, pos)
+            if self.done:
+                break
+        self._pos = len(text)
+        return self.done
+
+    def text(self) -> str:
+        return "".join(self._buf)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if not self.done:
+            return None
+        try:
+            value = json.loads(self.text()[self._start : self._end + 1])
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    def _step(self, text: str, pos: int) -> None:
+        char = text[pos]
+        if self._start < 0:
+            if char == "{":
+                self._start = pos
+                self._stack.append("{")
+                self._expect_key = True
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._string_closed(text, pos)
+            return
+
+        depth = len(self._stack)
+        if char == '"':
+            self._value_starts(pos)
+            self._in_string = True
+            self._string_start = pos
+        elif char in "{[":
+            self._value_starts(pos)
+            self._stack.append(char)
+            self._expect_key = char == "{"
+        elif char in "}]":
+            if depth == 2 and self._stack[-1] == "[" and self._item_start >= 0:
+                self._emit_item(text, pos)
+            if depth == 1:
+                self._scalar_ends(text, pos)
+                self._end = pos
+                self.done = True
+                self._stack.pop()
+                return
+            self._stack.pop()
+            self._container_closed(text, pos)
+        elif char == ":":
+            if depth == 1:
+                self._field = self._last_key
+                self._field_start = -1
+        elif char == ",":
+            if depth == 1:
+                self._scalar_ends(text, pos)
+                self._expect_key = True
+            elif depth == 2 and self._stack[-1] == "[" and self._item_start >= 0:
+                self._emit_item(text, pos)
+        elif not char.isspace():
+            self._value_starts(pos)
+
+    def _value_starts(self, pos: int) -> None:
+        depth = len(self._stack)
+        if depth == 1 and not self._expect_key and self._field is not None and self._field_start < 0:
+            self._field_start = pos
+            self._item_index = 0
+        elif depth == 2 and self._stack[-1] == "[" and self._item_start < 0:
+            self._item_start = pos
+
+    def _string_closed(self, text: str, pos: int) -> None:
+        depth = len(self._stack)
+        if depth == 1 and self._expect_key:
+            try:
+                self._last_key = json.loads(text[self._string_start : pos + 1])
+            except json.JSONDecodeError:
+                self._last_key = None
+            self._expect_key = False
+        elif depth == 1:
+            self._emit_field(text, pos + 1)
+        elif depth == 2 and self._stack[-1] == "[":
+            self._emit_item(text, pos + 1)
+
+    def _container_closed(self, text: str, pos: int) -> None:
+        depth = len(self._stack)
+        if depth == 1:
+            self._emit_field(text, pos + 1)
+        elif depth == 2 and self._stack[-1] == "[":
+            self._emit_item(text, pos + 1)
+
+    def _scalar_ends(self, text: str, pos: int) -> None:
+        # Numbers, true/false/null end at the next delimiter rather than at a closing char.
+        if self._field_start >= 0 and self._field is not None:
+            self._emit_field(text, pos)
+
+    def _emit_field(self, text: str, end: int) -> None:
+        if self._field is None or self._field_start < 0:
+            return
+        value = _loads(text[self._field_start : end])
+        field = self._field
+        self._field, self._field_start = None, -1
+        if value is not _INVALID and self._on_event is not None:
+            self._on_event({"type": "field", "field": field, "value": value})
+
+    def _emit_item(self, text: str, end: int) -> None:
+        if self._item_start < 0:
+            return
+        value = _loads(text[self._item_start : end])
+        self._item_start = -1
+        if value is _INVALID or self._field is None:
+            return
+        index = self._item_index
+        self._item_index += 1
+        if self._on_event is not None:
+            self._on_event({"type": "item", "field": self._field, "index": index, "value": value})
+
+
+_INVALID = object()
+
+
+def _loads(fragment: str) -> Any:
+    fragment = fragment.strip()
+    if not fragment:
+        return _INVALID
+    try:
+        return json.loads(fragment)
+    except json.JSONDecodeError:
+        return _INVALID
+
+
+def replay_events(result: Dict[str, Any], on_event: Callable[[JSONEvent], None]) -> None:
+    # Emits the events a streamed parse of result would have produced, for answers that
+    # arrive whole (cache hits, gateways that ignore stream=true).
+    for field, value in result.items():
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                on_event({"type": "item", "field": field, "index": index, "value": item})
+        on_event({"type": "field", "field": field, "value": value})
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Set for the duration of one ACP request that asked not to use cached LLM answers.
+_BYPASS: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+def cache_key(model: str, api_mode: str, prompt: str) -> str:
+    canonical = json.dumps([model, api_mode, prompt], ensure_ascii=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    # Content-addressed store of parsed LLM answers in one SQLite file, so several
+    # ACP processes (or R re-runs) on the same machine share it.
+    def __init__(self, path: str, ttl_seconds: float = 86400.0, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.path = os.path.abspath(path)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT created_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds >= 0 and now - row[0] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        try:
+            return json.loads(row[1])
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        encoded = json.dumps(value, ensure_ascii=True)
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, created_at, accessed_at, size, value) VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, size, encoded),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"path": self.path, "entries": count, "bytes": total, "max_bytes": self.max_bytes, "ttl_seconds": self.ttl_seconds}
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, created_at REAL, accessed_at REAL, size INTEGER, value TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds >= 0:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Least recently used first until the store fits again.
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+
+
+_CACHES: Dict[Tuple[str, float, int], LLMResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_llm_cache(path: str, ttl_seconds: float = 86400.0, max_bytes: int = 256 * 1024 * 1024) -> LLMResponseCache:
+    # One store (and SQLite connection) per file and settings, shared by every LLM client.
+    key = (os.path.abspath(path), float(ttl_seconds), int(max_bytes))
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = LLMResponseCache(path, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+            _CACHES[key] = cache
+    return cache
+
+
+def cache_bypassed() -> bool:
+    return _BYPASS.get()
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True) -> Iterator[None]:
+    token = _BYPASS.set(enabled)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
@@ -1,11 +1,23 @@
 from __future__ import annotations
 
+import contextvars
+import http.client
 import json
 import os
+import socket
+import sqlite3
+import threading
 import time
-import urllib.error
-import urllib.request
-from typing import Any, Dict, Optional
+import urllib.parse
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from study_agent_core.phi import get_scanner
+from study_agent_core.tools import packed_validation_schema
+
+from .json_stream import IncrementalJSONParser, JSONEvent, replay_events
+from .llm_cache import cache_bypassed, cache_key, get_llm_cache
 
 
 def build_prompt(
@@ -175,18 +187,41 @@ def build_intent_split_prompt(
     ]
     return "\n\n".join([s for s in sections if s])
 
+
+_SINGLE_CASE_OUTPUT = "Return JSON with label and rationale only."
+_PACKED_OUTPUT = "Return JSON with one review (case_id, label and rationale) per case."
+
+
 def build_keeper_prompt(
     overview: str,
     spec: str,
     output_schema: Dict[str, Any],
     system_prompt: str,
-    main_prompt: str,
+    main_prompt: str = "",
+    cases: Optional[List[Dict[str, str]]] = None,
 ) -> str:
+    # With cases=[{"case_id", "prompt"}, ...] several patients share one prompt and the
+    # model answers with a "reviews" array; the fixed overview/spec/schema are sent once.
+    if cases:
+        output_schema = packed_validation_schema(output_schema)
+        # keeper_prompt_bundle's system prompt asks for a single answer; word it for a pack.
+        system_prompt = system_prompt.replace(_SINGLE_CASE_OUTPUT, _PACKED_OUTPUT)
+        case_ids = ", ".join(str(case["case_id"]) for case in cases)
+        output_rules = [
+            f"Review each of the {len(cases)} cases independently; do not carry evidence between cases.",
+            "Return exactly ONE JSON object with a \"reviews\" array that matches the output schema.",
+            f"Include exactly one review per case_id: {case_ids}.",
+        ]
+        summary_header = "PATIENT SUMMARIES:"
+        main_prompt = "\n\n".join(f"CASE {case['case_id']}:\n{case['prompt']}" for case in cases)
+    else:
+        output_rules = ["Return exactly ONE JSON object that matches the output schema."]
+        summary_header = "PATIENT SUMMARY:"
     strict_rules = "\n\n".join(
         [
             "STRICT OUTPUT RULES:",
             spec,
-            "Return exactly ONE JSON object that matches the output schema.",
+            *output_rules,
             "Do NOT wrap output in markdown, code fences, or prose.",
             "If uncertain, return required keys with label \"unknown\".",
         ]
@@ -197,7 +232,7 @@ def build_keeper_prompt(
         system_prompt,
         "OUTPUT SCHEMA (JSON):",
         json.dumps(output_schema, ensure_ascii=True),
-        "PATIENT SUMMARY:",
+        summary_header,
         main_prompt,
         strict_rules,
     ]
@@ -217,73 +252,442 @@ def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
         return None
 
 
-def call_llm(prompt: str) -> Optional[Dict[str, Any]]:
-    api_url = os.getenv("LLM_API_URL", "http://localhost:3000/api/chat/completions")
-    api_key = os.getenv("LLM_API_KEY")
-    model = os.getenv("LLM_MODEL", "agentstudyassistant")
-    timeout = int(os.getenv("LLM_TIMEOUT", "180"))
-    log_enabled = os.getenv("LLM_LOG", "0") == "1"
-    log_prompt = os.getenv("LLM_LOG_PROMPT", "0") == "1"
-    log_response = os.getenv("LLM_LOG_RESPONSE", "0") == "1"
-    log_json = os.getenv("LLM_LOG_JSON", "0") == "1"
-    dry_run = os.getenv("LLM_DRY_RUN", "0") == "1"
-    use_responses = os.getenv("LLM_USE_RESPONSES", "0") == "1"
-
-    if log_enabled:
-        print(f"LLM CONFIG > url={api_url} model={model} timeout={timeout} responses={use_responses}")
-
-    if dry_run:
-        if log_enabled or log_prompt:
-            print("LLM DRY RUN > skipping API call")
-            print("LLM OUTGOING PROMPT >", prompt)
+# Set while sending prompts built from patient data (Keeper rows). Only those go through
+# the PHI guard: cohort JSON and concept sets are full of ids and codes that look like
+# phone numbers and IPs.
+_PHI_GUARDED: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_phi_guarded", default=False)
+
+
+@contextmanager
+def phi_guarded() -> Iterator[None]:
+    token = _PHI_GUARDED.set(True)
+    try:
+        yield
+    finally:
+        _PHI_GUARDED.reset(token)
+
+
+def _phi_guard(prompt: str, log_enabled: bool, mode: str = "redact", categories: Optional[List[str]] = None) -> Optional[str]:
+    # Last check before a patient-data prompt leaves the process.
+    mode = mode.lower()
+    if mode == "off":
+        return prompt
+    if categories is None:
+        categories = ["email", "phone", "ip"]
+    try:
+        scanner = get_scanner(categories)
+    except ValueError as exc:
+        print(f"LLM PHI GUARD > {exc}; refusing to send prompt")
         return None
+    if mode == "block":
+        matches = scanner.scan(prompt)
+        if matches:
+            found = sorted({match.category for match in matches})
+            print(f"LLM PHI GUARD > blocked prompt categories={','.join(found)}")
+            return None
+        return prompt
+    redacted, counts = scanner.redact(prompt)
+    if counts and log_enabled:
+        print(f"LLM PHI GUARD > redacted {counts}")
+    return redacted
+
+
+@dataclass(frozen=True)
+class LLMConfig:
+    api_url: str = "http://localhost:3000/api/chat/completions"
+    api_key: Optional[str] = None
+    model: str = "agentstudyassistant"
+    connect_timeout: float = 10.0
+    read_timeout: float = 180.0
+    max_connections: int = 8
+    use_responses: bool = False
+    stream: bool = False
+    dry_run: bool = False
+    log_enabled: bool = False
+    log_prompt: bool = False
+    log_response: bool = False
+    log_json: bool = False
+    phi_guard: str = "redact"
+    phi_guard_categories: Tuple[str, ...] = ("email", "phone", "ip")
+    cache_path: str = ""
+    cache_ttl: float = 86400.0
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_phi: bool = False
+
+    @classmethod
+    def from_env(cls) -> "LLMConfig":
+        categories = os.getenv("LLM_PHI_GUARD_CATEGORIES", "email,phone,ip")
+        return cls(
+            api_url=os.getenv("LLM_API_URL", "http://localhost:3000/api/chat/completions"),
+            api_key=os.getenv("LLM_API_KEY"),
+            model=os.getenv("LLM_MODEL", "agentstudyassistant"),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("LLM_TIMEOUT", "180")),
+            max_connections=max(1, int(os.getenv("LLM_MAX_CONNECTIONS", "8"))),
+            use_responses=os.getenv("LLM_USE_RESPONSES", "0") == "1",
+            stream=os.getenv("LLM_STREAM", "0") == "1",
+            dry_run=os.getenv("LLM_DRY_RUN", "0") == "1",
+            log_enabled=os.getenv("LLM_LOG", "0") == "1",
+            log_prompt=os.getenv("LLM_LOG_PROMPT", "0") == "1",
+            log_response=os.getenv("LLM_LOG_RESPONSE", "0") == "1",
+            log_json=os.getenv("LLM_LOG_JSON", "0") == "1",
+            phi_guard=os.getenv("LLM_PHI_GUARD", "redact"),
+            phi_guard_categories=tuple(item.strip() for item in categories.split(",") if item.strip()),
+            cache_path=os.getenv("LLM_CACHE_PATH", "").strip(),
+            cache_ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+            cache_max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            cache_phi=os.getenv("LLM_CACHE_PHI", "0") == "1",
+        )
+
+
+class _LLMHTTPError(Exception):
+    def __init__(self, status: int, body: str) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+
+
+# Errors that mean a kept-alive connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class _HostPool:
+    # Idle keep-alive connections to one scheme/host/port, plus a cap on how many
+    # requests may be in flight to that host at once.
+    def __init__(self, scheme: str, host: str, port: Optional[int], config: LLMConfig) -> None:
+        self._scheme = scheme
+        self._host = host
+        self._port = port
+        self._config = config
+        self._slots = threading.BoundedSemaphore(config.max_connections)
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def post(self, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, str]:
+        with self.request(path, body, headers) as response:
+            return response.status, response.read().decode("utf-8")
+
+    @contextmanager
+    def request(self, path: str, body: bytes, headers: Dict[str, str]) -> Iterator[http.client.HTTPResponse]:
+        # Yields the response with its body unread. The connection goes back to the pool
+        # only if the caller read the body to the end; a response abandoned early (such as
+        # a stream cut off once its JSON is complete) closes it.
+        if not self._slots.acquire(timeout=self._config.read_timeout):
+            raise TimeoutError(f"no free LLM connection to {self._host} within {self._config.read_timeout}s")
+        try:
+            conn, reused = self._checkout()
+            try:
+                response = self._start(conn, path, body, headers)
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # The server dropped an idle connection; retry once on a fresh one.
+                conn = self._connect()
+                response = self._start(conn, path, body, headers)
+            try:
+                yield response
+            except BaseException:
+                conn.close()
+                raise
+            if response.isclosed() and not response.will_close:
+                with self._lock:
+                    self._idle.append(conn)
+            else:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _checkout(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn_cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+        conn = conn_cls(self._host, self._port, timeout=self._config.connect_timeout)
+        conn.connect()
+        # Connect and read use separate budgets: fail fast on a dead gateway but give
+        # slow local models the full read timeout.
+        if conn.sock is not None:
+            conn.sock.settimeout(self._config.read_timeout)
+            # Requests on a reused connection must not wait on Nagle + delayed ACK.
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _start(
+        self,
+        conn: http.client.HTTPConnection,
+        path: str,
+        body: bytes,
+        headers: Dict[str, str],
+    ) -> http.client.HTTPResponse:
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            return conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+
+class LLMClient:
+    # Holds the LLM configuration (read once; see reload) and persistent
+    # connections, so flows do not pay for env parsing and a TCP/TLS handshake per call.
+    def __init__(self, config: Optional[LLMConfig] = None) -> None:
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, str, Optional[int]], _HostPool] = {}
+        self._config = config or LLMConfig.from_env()
+
+    @property
+    def config(self) -> LLMConfig:
+        return self._config
+
+    def reload(self, config: Optional[LLMConfig] = None) -> LLMConfig:
+        # Re-read the environment (or apply an explicit config) and drop pooled
+        # connections, which may point at the old host.
+        with self._lock:
+            self._config = config or LLMConfig.from_env()
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+        return self._config
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+
+    def connections_opened(self) -> int:
+        with self._lock:
+            return sum(pool.opened for pool in self._pools.values())
+
+    def call(
+        self,
+        prompt: str,
+        use_cache: bool = True,
+        on_event: Optional[Callable[[JSONEvent], None]] = None,
+        stream: Optional[bool] = None,
+    ) -> Optional[Dict[str, Any]]:
+        # on_event receives "item"/"field" events (see IncrementalJSONParser) as parts of
+        # the answer's JSON complete. Passing it turns streaming on unless stream=False.
+        config = self._config
+        log_enabled = config.log_enabled
+        if stream is None:
+            stream = config.stream or on_event is not None
 
-    if not api_key:
         if log_enabled:
-            print("LLM ERROR > missing LLM_API_KEY")
-        return None
+            print(
+                f"LLM CONFIG > url={config.api_url} model={config.model} "
+                f"timeout={config.read_timeout} responses={config.use_responses}"
+            )
 
-    if use_responses:
-        payload = {
-            "model": model,
-            "input": prompt,
-        }
-    else:
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "user", "content": prompt},
-            ],
+        if _PHI_GUARDED.get():
+            guarded = _phi_guard(prompt, log_enabled, config.phi_guard, list(config.phi_guard_categories))
+            if guarded is None:
+                return None
+            prompt = guarded
+
+        if config.dry_run:
+            if log_enabled or config.log_prompt:
+                print("LLM DRY RUN > skipping API call")
+                print("LLM OUTGOING PROMPT >", prompt)
+            return None
+
+        # Keyed on the prompt as sent (after the PHI guard), so identical flow inputs hit.
+        # A bypassed request skips the lookup but still stores its fresh answer. Prompts
+        # sent under phi_guarded() carry patient data, and the cache file is not
+        # encrypted, so they are only cached with LLM_CACHE_PHI=1.
+        cache = None
+        if use_cache and config.cache_path and (config.cache_phi or not _PHI_GUARDED.get()):
+            cache = get_llm_cache(config.cache_path, config.cache_ttl, config.cache_max_bytes)
+        key = cache_key(config.model, "responses" if config.use_responses else "chat", prompt) if cache is not None else None
+        if cache is not None and key is not None and not cache_bypassed():
+            try:
+                cached = cache.get(key)
+            except sqlite3.Error as exc:
+                print(f"LLM CACHE ERROR > {exc}")
+                cached = None
+            if cached is not None:
+                if log_enabled:
+                    print(f"LLM CACHE > hit key={key[:12]}")
+                if on_event is not None:
+                    replay_events(cached, on_event)
+                return cached
+
+        if not config.api_key:
+            if log_enabled:
+                print("LLM ERROR > missing LLM_API_KEY")
+            return None
+
+        if config.use_responses:
+            payload = {
+                "model": config.model,
+                "input": prompt,
+            }
+        else:
+            payload = {
+                "model": config.model,
+                "messages": [
+                    {"role": "user", "content": prompt},
+                ],
+            }
+
+        if stream:
+            payload["stream"] = True
+
+        if log_enabled or config.log_prompt:
+            print("LLM OUTGOING PROMPT >", prompt)
+
+        try:
+            start = time.time()
+            raw, streamed = self._post(config, json.dumps(payload).encode("utf-8"), stream, on_event)
+            if log_enabled:
+                print(f"LLM TIMING > seconds={time.time() - start:.2f} streamed={streamed is not None}")
+        except _LLMHTTPError as exc:
+            if log_enabled or config.log_response:
+                print(f"LLM HTTP ERROR > {exc.status}")
+                print("LLM ERROR BODY >", exc.body)
+            return None
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            if log_enabled:
+                print(f"LLM ERROR > {exc}")
+            return None
+
+        if log_enabled or config.log_response:
+            print("LLM RAW RESPONSE >", raw)
+
+        if streamed is not None:
+            result = streamed.result() or _extract_json_object(raw)
+        else:
+            result = _parse_response(raw, config.use_responses, config.log_json)
+            if result is not None and on_event is not None:
+                # The gateway answered in one piece (stream ignored); still report the fields.
+                replay_events(result, on_event)
+        if result is not None and cache is not None and key is not None:
+            try:
+                cache.put(key, result)
+            except sqlite3.Error as exc:
+                print(f"LLM CACHE ERROR > {exc}")
+        return result
+
+    def _post(
+        self,
+        config: LLMConfig,
+        body: bytes,
+        stream: bool = False,
+        on_event: Optional[Callable[[JSONEvent], None]] = None,
+    ) -> Tuple[str, Optional[IncrementalJSONParser]]:
+        # Returns the response text and, when the gateway streamed it, the parser that
+        # assembled the answer; a gateway that ignores stream=true answers with plain JSON.
+        parts = urllib.parse.urlsplit(config.api_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported LLM_API_URL {config.api_url}")
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {config.api_key}",
         }
+        if stream:
+            headers["Accept"] = "text/event-stream"
+        with self._pool(parts.scheme, parts.hostname, parts.port, config).request(path, body, headers) as response:
+            if response.status >= 400:
+                raise _LLMHTTPError(response.status, response.read().decode("utf-8"))
+            if stream and "text/event-stream" in (response.getheader("Content-Type") or ""):
+                parser = IncrementalJSONParser(on_event)
+                return _read_event_stream(response, parser, config.use_responses), parser
+            return response.read().decode("utf-8"), None
 
-    body = json.dumps(payload).encode("utf-8")
-    request = urllib.request.Request(api_url, data=body, method="POST")
-    request.add_header("Content-Type", "application/json")
-    request.add_header("Authorization", f"Bearer {api_key}")
+    def _pool(self, scheme: str, host: str, port: Optional[int], config: LLMConfig) -> _HostPool:
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(scheme, host, port, config)
+                self._pools[key] = pool
+        return pool
 
-    if log_enabled or log_prompt:
-        print("LLM OUTGOING PROMPT >", prompt)
 
-    try:
-        start = time.time()
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            raw = response.read().decode("utf-8")
-        if log_enabled:
-            print(f"LLM TIMING > seconds={time.time() - start:.2f}")
-    except urllib.error.HTTPError as exc:
-        raw = exc.read().decode("utf-8")
-        if log_enabled or log_response:
-            print(f"LLM HTTP ERROR > {exc.code}")
-            print("LLM ERROR BODY >", raw)
-        return None
-    except urllib.error.URLError as exc:
-        if log_enabled:
-            print(f"LLM ERROR > {exc}")
-        return None
+_DEFAULT_CLIENT: Optional[LLMClient] = None
+_DEFAULT_CLIENT_LOCK = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    global _DEFAULT_CLIENT
+    if _DEFAULT_CLIENT is None:
+        with _DEFAULT_CLIENT_LOCK:
+            if _DEFAULT_CLIENT is None:
+                _DEFAULT_CLIENT = LLMClient()
+    return _DEFAULT_CLIENT
+
+
+def reload_llm_config() -> LLMConfig:
+    return get_llm_client().reload()
+
+
+def call_llm(
+    prompt: str,
+    use_cache: bool = True,
+    on_event: Optional[Callable[[JSONEvent], None]] = None,
+) -> Optional[Dict[str, Any]]:
+    return get_llm_client().call(prompt, use_cache=use_cache, on_event=on_event)
+
+
+def _stream_delta(event: Any, use_responses: bool) -> str:
+    if not isinstance(event, dict):
+        return ""
+    if use_responses:
+        if event.get("type") == "response.output_text.delta":
+            return str(event.get("delta") or "")
+        return ""
+    choices = event.get("choices") or []
+    if not choices or not isinstance(choices[0], dict):
+        return ""
+    delta = choices[0].get("delta")
+    if isinstance(delta, dict):
+        return str(delta.get("content") or "")
+    return str(choices[0].get("text") or "")
+
+
+def _read_event_stream(response: http.client.HTTPResponse, parser: IncrementalJSONParser, use_responses: bool) -> str:
+    # Server-sent events: "data: {...}" lines until "data: [DONE]". Reading stops as
+    # soon as the answer's top-level JSON object closes; the pool then drops the
+    # connection rather than wait for trailing tokens.
+    pieces: List[str] = []
+    while not parser.done:
+        line = response.readline()
+        if not line:
+            break
+        text = line.decode("utf-8").strip()
+        if not text.startswith("data:"):
+            continue
+        data = text[5:].strip()
+        if data == "[DONE]":
+            response.read()
+            break
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        delta = _stream_delta(event, use_responses)
+        if delta:
+            pieces.append(delta)
+            parser.feed(delta)
+    return "".join(pieces)
 
-    if log_enabled or log_response:
-        print("LLM RAW RESPONSE >", raw)
 
+def _parse_response(raw: str, use_responses: bool, log_json: bool) -> Optional[Dict[str, Any]]:
     try:
         data = json.loads(raw)
     except json.JSONDecodeError:
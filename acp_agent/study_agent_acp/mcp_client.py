@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from contextlib import AsyncExitStack
+import contextvars
+from concurrent.futures import Future, wait
+from contextlib import AsyncExitStack, nullcontext
 from dataclasses import dataclass
 import os
 import socket
+import threading
+import time
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import anyio
 import httpx
+import mcp.types as mcp_types
 from urllib.parse import urlparse
 from anyio.from_thread import start_blocking_portal
 from mcp.client.session import ClientSession
@@ -16,6 +21,175 @@ from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.client.streamable_http import streamable_http_client
 from mcp.shared._httpx_utils import create_mcp_http_client
 
+from .jobs import job_cancelled
+
+
+class MCPCallCancelled(RuntimeError):
+    pass
+
+
+class _PoolUnavailable(RuntimeError):
+    # No warm process could be lent: the MCP command fails to start, or none came free in time.
+    pass
+
+
+class _SessionClient:
+    # One MCP session owned by a long-lived task on a background event loop (the portal).
+    # Calls from any number of ACP threads run as concurrent tasks on that loop and share
+    # the session; JSON-RPC request ids keep their responses apart. A call that times out
+    # or whose ACP job is cancelled is abandoned and the server is told to stop it.
+    _call_timeout: Optional[float] = None
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._portal = None
+        self._portal_cm = None
+        self._session: ClientSession | None = None
+        self._closed: anyio.Event | None = None
+        self._holder: Future | None = None
+
+    def _request(self, func: Callable[..., Any], *args: Any) -> Any:
+        self._ensure_session()
+        assert self._portal is not None
+        future = self._portal.start_task_soon(func, *args)
+        try:
+            while not wait([future], timeout=0.25).done:
+                if job_cancelled():
+                    future.cancel()
+                    raise MCPCallCancelled("MCP call cancelled with its job or flow step")
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._session
+        assert session is not None
+        # Each call runs as its own task, so _RequestIdTap records only this call's request.
+        sent: List[Any] = []
+        token = _SENT_TOOL_CALLS.set(sent)
+        timeout = self._call_timeout
+        try:
+            with anyio.fail_after(timeout) if timeout else nullcontext():
+                result = await session.call_tool(name=name, arguments=arguments)
+        except (TimeoutError, anyio.get_cancelled_exc_class()) as exc:
+            reason = "timeout" if isinstance(exc, TimeoutError) else "cancelled"
+            if sent:
+                with anyio.CancelScope(shield=True):
+                    await _send_cancelled(session, sent[0], reason)
+            if isinstance(exc, TimeoutError):
+                raise TimeoutError(f"MCP tool {name} timed out after {timeout}s") from None
+            raise
+        finally:
+            _SENT_TOOL_CALLS.reset(token)
+        if result.structuredContent is not None:
+            return result.structuredContent
+        return {"content": [c.model_dump() for c in result.content or []]}
+
+    async def _list_tools(self) -> List[Dict[str, Any]]:
+        assert self._session is not None
+        result = await self._session.list_tools()
+        return [tool.model_dump() for tool in result.tools]
+
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        raise NotImplementedError
+
+    async def _hold_session(self, *, task_status=anyio.TASK_STATUS_IGNORED) -> None:
+        # The transport's task groups must be entered and exited by the same task, so this
+        # task owns the session for its whole life and only waits for close().
+        self._closed = anyio.Event()
+        async with AsyncExitStack() as stack:
+            session = await self._open_session(stack)
+            self._session = session
+            task_status.started()
+            try:
+                await self._closed.wait()
+            finally:
+                self._session = None
+
+    def _ensure_session(self) -> None:
+        if self._session is not None:
+            return
+        with self._lock:
+            if self._session is not None:
+                return
+            # A session that died (e.g. the MCP process exited) leaves its portal behind.
+            self._stop_portal()
+            self._portal_cm = start_blocking_portal()
+            self._portal = self._portal_cm.__enter__()
+            assert self._portal is not None
+            try:
+                self._holder, _ = self._portal.start_task(self._hold_session)
+            except BaseException:
+                self._stop_portal()
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop_portal()
+
+    def _stop_portal(self) -> None:
+        if self._portal is None:
+            return
+        try:
+            if self._closed is not None and self._holder is not None and not self._holder.done():
+                self._portal.call(self._closed.set)
+                self._holder.exception(timeout=10)
+        except Exception:
+            pass
+        finally:
+            if self._portal_cm is not None:
+                self._portal_cm.__exit__(None, None, None)
+                self._portal_cm = None
+            self._portal = None
+            self._holder = None
+            self._closed = None
+            self._session = None
+
+
+# Set by _call_tool for its own task; _RequestIdTap appends the id of each tools/call
+# request that task sends.
+_SENT_TOOL_CALLS: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar(
+    "mcp_sent_tool_calls", default=None
+)
+
+
+class _RequestIdTap:
+    # Wraps a session's write stream to learn the JSON-RPC id of each tool call as it is
+    # sent, which is what a CancelledNotification has to name.
+    def __init__(self, stream: Any) -> None:
+        self._stream = stream
+
+    async def send(self, message: Any) -> None:
+        sent = _SENT_TOOL_CALLS.get()
+        root = getattr(getattr(message, "message", None), "root", None)
+        if sent is not None and isinstance(root, mcp_types.JSONRPCRequest) and root.method == "tools/call":
+            sent.append(root.id)
+        await self._stream.send(message)
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+    async def __aenter__(self) -> "_RequestIdTap":
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> Any:
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._stream, item)
+
+
+async def _send_cancelled(session: ClientSession, request_id: Any, reason: str) -> None:
+    notification = mcp_types.CancelledNotification(
+        params=mcp_types.CancelledNotificationParams(requestId=request_id, reason=reason),
+    )
+    try:
+        await session.send_notification(mcp_types.ClientNotification(notification))
+    except Exception:
+        pass
+
 
 @dataclass
 class StdioMCPClientConfig:
@@ -23,68 +197,91 @@ class StdioMCPClientConfig:
     args: List[str]
     env: Optional[Dict[str, str]] = None
     cwd: Optional[str] = None
+    call_timeout: Optional[float] = None
+    # Oneshot mode: warm MCP processes kept ready (0 = spawn one per call), and the
+    # number of calls after which a process is replaced.
+    pool_size: int = 2
+    pool_max_calls: int = 50
+    pool_health_interval: float = 30.0
+    # Seconds a call waits for a warm process before starting a cold one instead.
+    pool_checkout_timeout: float = 30.0
 
 
-class StdioMCPClient:
+class StdioMCPClient(_SessionClient):
     def __init__(self, config: StdioMCPClientConfig) -> None:
+        super().__init__()
         self._config = config
-        self._lock = Lock()
-        self._portal = None
-        self._portal_cm = None
-        self._session: ClientSession | None = None
-        self._exit_stack: AsyncExitStack | None = None
+        self._call_timeout = config.call_timeout
+        self._pool: Optional[_WarmSessionPool] = None
+        self._pool_lock = Lock()
+        if _prefer_oneshot():
+            # Start warming processes now so the first flow does not pay the cold start.
+            self._warm_pool()
 
     def list_tools(self) -> List[Dict[str, Any]]:
         try:
             if _prefer_oneshot():
-                return anyio.run(self._list_tools_oneshot)
-            self._ensure_session()
-            assert self._portal is not None
-            return self._portal.call(self._list_tools)
+                return self._oneshot("_list_tools")
+            return self._request(self._list_tools)
         except Exception as exc:
             if _should_use_oneshot(exc):
-                return anyio.run(self._list_tools_oneshot)
+                return self._oneshot("_list_tools")
             raise
 
     def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         try:
             if _prefer_oneshot():
-                return anyio.run(self._call_tool_oneshot, name, arguments)
-            self._ensure_session()
-            assert self._portal is not None
-            return self._portal.call(self._call_tool, name, arguments)
+                return self._oneshot("_call_tool", name, arguments)
+            return self._request(self._call_tool, name, arguments)
         except Exception as exc:
             if _should_use_oneshot(exc):
-                return anyio.run(self._call_tool_oneshot, name, arguments)
+                return self._oneshot("_call_tool", name, arguments)
             raise
 
     def health_check(self) -> Dict[str, Any]:
         try:
             if _prefer_oneshot() and hasattr(self, "_ping_oneshot"):
-                return anyio.run(self._ping_oneshot)
+                result = self._oneshot("_ping")
+                pool = self._pool
+                return {**result, "mode": "oneshot", "pool": pool.stats()} if pool is not None else result
             self._ensure_session()
             assert self._portal is not None
             return self._portal.call(self._ping)
         except Exception as exc:
             return {"ok": False, "error": str(exc)}
 
-    async def _list_tools(self) -> List[Dict[str, Any]]:
-        assert self._session is not None
-        result = await self._session.list_tools()
-        return [tool.model_dump() for tool in result.tools]
-
-    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        assert self._session is not None
-        result = await self._session.call_tool(name=name, arguments=arguments)
-        if result.structuredContent is not None:
-            return result.structuredContent
-        return {"content": [c.model_dump() for c in result.content or []]}
-
     async def _ping(self) -> Dict[str, Any]:
         assert self._session is not None
         await self._session.send_ping()
         return {"ok": True}
 
+    def _oneshot(self, method: str, *args: Any) -> Any:
+        # Oneshot-safe platforms get a process of their own per call, taken warm from the
+        # pool when there is one instead of spawned cold.
+        pool = self._warm_pool()
+        if pool is not None:
+            try:
+                return pool.run(method, *args)
+            except _PoolUnavailable as exc:
+                # A cold process either works or raises the real startup error to the caller.
+                print(f"ACP MCP POOL > {exc}; starting a cold MCP process")
+        return anyio.run(getattr(self, f"{method}_oneshot"), *args)
+
+    def _warm_pool(self) -> Optional[_WarmSessionPool]:
+        if self._config.pool_size <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = _WarmSessionPool(self._config)
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+        super().close()
+
     async def _ping_oneshot(self) -> Dict[str, Any]:
         server = StdioServerParameters(
             command=self._config.command,
@@ -129,47 +326,174 @@ class StdioMCPClient:
                     return result.structuredContent
                 return {"content": [c.model_dump() for c in result.content or []]}
 
-    def _ensure_session(self) -> None:
-        if self._session is not None:
-            return
-        with self._lock:
-            if self._session is not None:
-                return
-            self._portal_cm = start_blocking_portal()
-            self._portal = self._portal_cm.__enter__()
-            assert self._portal is not None
-            self._portal.call(self._async_init)
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        return await _open_stdio_session(self._config, stack)
 
-    async def _async_init(self) -> None:
-        server = StdioServerParameters(
-            command=self._config.command,
-            args=self._config.args,
-            env=self._config.env or os.environ.copy(),
-            cwd=self._config.cwd,
-        )
-        self._exit_stack = AsyncExitStack()
-        read_stream, write_stream = await self._exit_stack.enter_async_context(stdio_client(server))
-        session = ClientSession(read_stream, write_stream)
-        await self._exit_stack.enter_async_context(session)
-        await session.initialize()
-        self._session = session
 
-    def close(self) -> None:
-        if self._portal is None:
-            return
+async def _open_stdio_session(config: StdioMCPClientConfig, stack: AsyncExitStack) -> ClientSession:
+    server = StdioServerParameters(
+        command=config.command,
+        args=config.args,
+        env=config.env or os.environ.copy(),
+        cwd=config.cwd,
+    )
+    read_stream, write_stream = await stack.enter_async_context(stdio_client(server))
+    session = ClientSession(read_stream, _RequestIdTap(write_stream))
+    await stack.enter_async_context(session)
+    await session.initialize()
+    return session
+
+
+class _WarmSession(_SessionClient):
+    # One pre-started MCP process, lent to one caller at a time by _WarmSessionPool.
+    def __init__(self, config: StdioMCPClientConfig) -> None:
+        super().__init__()
+        self._config = config
+        self._call_timeout = config.call_timeout
+        self.calls = 0
+        self.last_used = time.monotonic()
+
+    def run(self, method: str, *args: Any) -> Any:
+        return self._request(getattr(self, method), *args)
+
+    async def _ping(self) -> Dict[str, Any]:
+        assert self._session is not None
+        await self._session.send_ping()
+        return {"ok": True}
+
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        return await _open_stdio_session(self._config, stack)
+
+
+class _WarmSessionPool:
+    # Keeps pool_size MCP processes started and initialized in the background. A call
+    # borrows an idle one (pinged first if it sat idle past the health interval) and
+    # returns it; a process is replaced after pool_max_calls calls or any failed call.
+    # When processes fail to start, restarts back off exponentially and callers get
+    # _PoolUnavailable instead of waiting for a process that will not come.
+    def __init__(self, config: StdioMCPClientConfig) -> None:
+        self._config = config
+        self._size = max(1, config.pool_size)
+        self._idle: List[_WarmSession] = []
+        self._live = 0
+        self._started = 0
+        self._recycled = 0
+        self._closed = False
+        self._failures = 0
+        self._last_error: Optional[str] = None
+        self._retry_at = 0.0
+        self._changed = threading.Condition()
+        for _ in range(self._size):
+            self._spawn()
+
+    def run(self, method: str, *args: Any) -> Any:
+        session = self._checkout()
+        ok = False
         try:
-            self._portal.call(self._async_close)
+            result = session.run(method, *args)
+            ok = True
+            return result
         finally:
-            if self._portal_cm is not None:
-                self._portal_cm.__exit__(None, None, None)
-                self._portal_cm = None
-            self._portal = None
+            self._checkin(session, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._changed:
+            return {
+                "size": self._size,
+                "live": self._live,
+                "idle": len(self._idle),
+                "started": self._started,
+                "recycled": self._recycled,
+                "startup_failures": self._failures,
+                "last_error": self._last_error,
+            }
 
-    async def _async_close(self) -> None:
-        if self._exit_stack is not None:
-            await self._exit_stack.aclose()
-        self._exit_stack = None
-        self._session = None
+    def close(self) -> None:
+        with self._changed:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._changed.notify_all()
+        for session in idle:
+            session.close()
+
+    def _checkout(self) -> _WarmSession:
+        deadline = time.monotonic() + self._config.pool_checkout_timeout
+        while True:
+            with self._changed:
+                while not self._idle:
+                    if self._closed:
+                        raise RuntimeError("MCP session pool is closed")
+                    if self._live < self._size:
+                        if self._failures and time.monotonic() < self._retry_at:
+                            raise _PoolUnavailable(f"MCP process failed to start: {self._last_error}")
+                        self._spawn()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise _PoolUnavailable(
+                            f"no warm MCP process free after {self._config.pool_checkout_timeout}s"
+                        )
+                    self._changed.wait(remaining)
+                session = self._idle.pop()
+            if time.monotonic() - session.last_used < self._config.pool_health_interval:
+                return session
+            try:
+                session.run("_ping")
+                return session
+            except Exception as exc:
+                print(f"ACP MCP POOL > idle MCP process failed its health check: {exc}")
+                self._retire(session)
+
+    def _checkin(self, session: _WarmSession, ok: bool) -> None:
+        session.calls += 1
+        session.last_used = time.monotonic()
+        if not ok or session.calls >= self._config.pool_max_calls:
+            self._retire(session)
+            return
+        with self._changed:
+            if not self._closed:
+                self._idle.append(session)
+                self._changed.notify()
+                return
+        session.close()
+
+    def _retire(self, session: _WarmSession) -> None:
+        with self._changed:
+            self._live -= 1
+            self._recycled += 1
+            if not self._closed and time.monotonic() >= self._retry_at:
+                self._spawn()
+        threading.Thread(target=session.close, name="acp-mcp-retire", daemon=True).start()
+
+    def _spawn(self) -> None:
+        # Called with the lock held; the process starts on its own thread.
+        self._live += 1
+        self._started += 1
+        threading.Thread(target=self._warm_up, name="acp-mcp-warm", daemon=True).start()
+
+    def _warm_up(self) -> None:
+        session = _WarmSession(self._config)
+        try:
+            session.run("_ping")
+        except Exception as exc:
+            print(f"ACP MCP POOL > could not start MCP process: {exc}")
+            session.close()
+            with self._changed:
+                # Nothing restarts the process until the backoff has passed and a caller
+                # asks for one; callers waiting on this start get the error instead.
+                self._live -= 1
+                self._failures += 1
+                self._last_error = str(exc) or type(exc).__name__
+                self._retry_at = time.monotonic() + min(30.0, 0.5 * 2 ** (self._failures - 1))
+                self._changed.notify_all()
+            return
+        with self._changed:
+            self._failures = 0
+            self._last_error = None
+            if not self._closed:
+                self._idle.append(session)
+                self._changed.notify()
+                return
+        session.close()
 
 
 def _prefer_oneshot() -> bool:
@@ -196,31 +520,25 @@ class HttpMCPClientConfig:
     url: str
     token: Optional[str] = None
     timeout: int = 30
+    call_timeout: Optional[float] = None
 
 
-class HttpMCPClient:
+class HttpMCPClient(_SessionClient):
     def __init__(self, config: HttpMCPClientConfig) -> None:
+        super().__init__()
         if "://" not in config.url:
             config.url = f"http://{config.url}"
         self._config = config
+        self._call_timeout = config.call_timeout
         parsed = urlparse(config.url)
         self._host = parsed.hostname
         self._port = parsed.port
-        self._lock = Lock()
-        self._portal = None
-        self._portal_cm = None
-        self._session: ClientSession | None = None
-        self._exit_stack: AsyncExitStack | None = None
 
     def list_tools(self) -> List[Dict[str, Any]]:
-        self._ensure_session()
-        assert self._portal is not None
-        return self._portal.call(self._list_tools)
+        return self._request(self._list_tools)
 
     def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        self._ensure_session()
-        assert self._portal is not None
-        return self._portal.call(self._call_tool, name, arguments)
+        return self._request(self._call_tool, name, arguments)
 
     def health_check(self) -> Dict[str, Any]:
         if self._host and self._port:
@@ -236,63 +554,22 @@ class HttpMCPClient:
         except Exception as exc:
             return {"ok": False, "error": str(exc)}
 
-    async def _list_tools(self) -> List[Dict[str, Any]]:
-        assert self._session is not None
-        result = await self._session.list_tools()
-        return [tool.model_dump() for tool in result.tools]
-
-    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        assert self._session is not None
-        result = await self._session.call_tool(name=name, arguments=arguments)
-        if result.structuredContent is not None:
-            return result.structuredContent
-        return {"content": [c.model_dump() for c in result.content or []]}
-
     async def _ping(self) -> Dict[str, Any]:
         assert self._session is not None
         await self._session.send_ping()
         return {"ok": True, "mode": "http"}
 
-    def _ensure_session(self) -> None:
-        if self._session is not None:
-            return
-        with self._lock:
-            if self._session is not None:
-                return
-            self._portal_cm = start_blocking_portal()
-            self._portal = self._portal_cm.__enter__()
-            assert self._portal is not None
-            self._portal.call(self._async_init)
-
-    async def _async_init(self) -> None:
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
         headers = {}
         if self._config.token:
             headers["Authorization"] = f"Bearer {self._config.token}"
         timeout = httpx.Timeout(self._config.timeout)
         client = create_mcp_http_client(headers=headers, timeout=timeout)
-        self._exit_stack = AsyncExitStack()
-        await self._exit_stack.enter_async_context(client)
-        read_stream, write_stream, _ = await self._exit_stack.enter_async_context(
+        await stack.enter_async_context(client)
+        read_stream, write_stream, _ = await stack.enter_async_context(
             streamable_http_client(self._config.url, http_client=client)
         )
-        session = ClientSession(read_stream, write_stream)
-        await self._exit_stack.enter_async_context(session)
+        session = ClientSession(read_stream, _RequestIdTap(write_stream))
+        await stack.enter_async_context(session)
         await session.initialize()
-        self._session = session
-
-    def close(self) -> None:
-        if self._portal is None:
-            return
-        try:
-            self._portal.call(self._async_close)
-        finally:
-            if self._portal_cm is not None:
-                self._portal_cm.__exit__(None, None, None)
-                self._portal_cm = None
-            self._portal = None
-
-    async def _async_close(self) -> None:
-        if self._exit_stack is not None:
-            await self._exit_stack.aclose()
-        self._exit_stack = None
-        self._session = None
+        return session
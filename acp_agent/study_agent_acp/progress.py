@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+ProgressSink = Callable[[Dict[str, Any]], None]
+
+# The reporter for the flow running in this context, if its client asked for progress.
+_CURRENT: contextvars.ContextVar[Optional["ProgressReporter"]] = contextvars.ContextVar("acp_progress", default=None)
+# The flow step (and its branch) running in this context; added to the events it emits,
+# so a client can tell apart events from steps that run concurrently.
+_STEP: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("acp_progress_step", default=None)
+
+
+class ProgressReporter:
+    def __init__(self, sink: ProgressSink) -> None:
+        self._sink = sink
+        self._started = time.monotonic()
+
+    def emit(self, event_type: str, **fields: Any) -> None:
+        event = {"type": event_type, "elapsed_seconds": round(time.monotonic() - self._started, 3)}
+        event.update(_STEP.get() or {})
+        event.update(fields)
+        try:
+            self._sink(event)
+        except Exception as exc:
+            # Progress is best effort; a broken sink must not fail the flow.
+            print(f"ACP PROGRESS > sink failed: {exc}")
+
+
+@contextmanager
+def progress_scope(sink: ProgressSink) -> Iterator[ProgressReporter]:
+    reporter = ProgressReporter(sink)
+    token = _CURRENT.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _CURRENT.reset(token)
+
+
+@contextmanager
+def step_scope(step: str, branch: Optional[str] = None) -> Iterator[None]:
+    labels = {"step": step}
+    if branch:
+        labels["branch"] = branch
+    token = _STEP.set(labels)
+    try:
+        yield
+    finally:
+        _STEP.reset(token)
+
+
+def report_stage(stage: str, **fields: Any) -> None:
+    reporter = _CURRENT.get()
+    if reporter is not None:
+        reporter.emit("stage", stage=stage, **fields)
+
+
+def partial_sink() -> Optional[Callable[[Dict[str, Any]], None]]:
+    # Forwards the LLM client's streamed JSON events as "partial" progress events.
+    # The step labels are taken here, as the LLM client may call back on another thread.
+    reporter = _CURRENT.get()
+    if reporter is None:
+        return None
+    labels = _STEP.get() or {}
+
+    def _forward(event: Dict[str, Any]) -> None:
+        fields = {key: value for key, value in event.items() if key != "type"}
+        reporter.emit("partial", **{**labels, "kind": event.get("type"), **fields})
+
+    return _forward
@@ -1,48 +1,207 @@
 from __future__ import annotations
 
+import contextvars
 import json
 import os
+import queue
+import threading
+import time
 from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
-from typing import Any, Dict, Optional
-
-from .agent import StudyAgent
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .agent import MAX_KEEPER_CHUNK_ROWS, StudyAgent
+from .flows import FLOWS
+from .jobs import Job, JobManager, job_cancelled
+from .llm_cache import llm_cache_bypass
+from .llm_client import get_llm_client
+from .progress import progress_scope
 from .mcp_client import HttpMCPClient, HttpMCPClientConfig, StdioMCPClient, StdioMCPClientConfig
 
+# POST routes: path -> ACPRequestHandler method taking the parsed JSON body. SERVICES
+# is built from the /flows/ routes so the two cannot drift apart.
+_POST_ROUTES = {
+    "/tools/call": "_post_tool_call",
+    "/flows/phenotype_recommendation": "_post_phenotype_recommendation",
+    "/flows/phenotype_improvements": "_post_phenotype_improvements",
+    "/flows/concept_sets_review": "_post_concept_sets_review",
+    "/flows/cohort_critique_general_design": "_post_cohort_critique_general_design",
+    "/flows/phenotype_validation_review": "_post_phenotype_validation_review",
+    "/flows/phenotype_validation_review_batch": "_post_phenotype_validation_review_batch",
+    "/flows/phenotype_recommendation_advice": "_post_phenotype_recommendation_advice",
+    "/flows/phenotype_intent_split": "_post_phenotype_intent_split",
+    "/flows/phenotype_intent_recommendation": "_post_phenotype_intent_recommendation",
+}
 SERVICES = [
-    {"name": "phenotype_recommendation", "endpoint": "/flows/phenotype_recommendation"},
-    {"name": "phenotype_improvements", "endpoint": "/flows/phenotype_improvements"},
-    {"name": "concept_sets_review", "endpoint": "/flows/concept_sets_review"},
-    {"name": "cohort_critique_general_design", "endpoint": "/flows/cohort_critique_general_design"},
-    {"name": "phenotype_validation_review", "endpoint": "/flows/phenotype_validation_review"},
-    {"name": "phenotype_recommendation_advice", "endpoint": "/flows/phenotype_recommendation_advice"},
-    {"name": "phenotype_intent_split", "endpoint": "/flows/phenotype_intent_split"},
+    {"name": path[len("/flows/") :], "endpoint": path} for path in _POST_ROUTES if path.startswith("/flows/")
 ]
 SERVICE_REGISTRY_PATH = os.getenv("STUDY_AGENT_SERVICE_REGISTRY", "docs/SERVICE_REGISTRY.yaml")
 
 
-def _read_json(handler: BaseHTTPRequestHandler) -> Dict[str, Any]:
+def _read_body_bytes(handler: BaseHTTPRequestHandler) -> bytes:
+    # Reads exactly one request body (Content-Length or chunked) so the next request on
+    # a kept-alive connection starts at the right byte.
+    setattr(handler, "_body_read", True)
+    if "chunked" in (handler.headers.get("Transfer-Encoding") or "").lower():
+        parts = []
+        while True:
+            size = int(handler.rfile.readline(65537).split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip trailers up to the blank line that ends the body.
+                while handler.rfile.readline(65537) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            parts.append(handler.rfile.read(size))
+            handler.rfile.readline(65537)
     length = int(handler.headers.get("Content-Length", "0"))
     if length <= 0:
-        return {}
-    raw = handler.rfile.read(length)
+        return b""
+    return handler.rfile.read(length)
+
+
+def _body_pending(handler: BaseHTTPRequestHandler) -> bool:
+    # An unread request body would be parsed as the next request, so such a connection
+    # is closed after the response instead of kept alive.
+    if getattr(handler, "_body_read", True):
+        return False
+    headers = handler.headers
+    return int(headers.get("Content-Length") or "0") > 0 or "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+
+
+def _read_json(handler: BaseHTTPRequestHandler) -> Dict[str, Any]:
+    raw = _read_body_bytes(handler)
     if not raw:
         return {}
     return json.loads(raw.decode("utf-8"))
 
 
-def _write_json(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]) -> None:
+def _write_json(
+    handler: BaseHTTPRequestHandler,
+    status: int,
+    payload: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
     body = json.dumps(payload).encode("utf-8")
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json")
     handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    if _body_pending(handler):
+        handler.send_header("Connection", "close")
+        handler.close_connection = True
     handler.end_headers()
     try:
         handler.wfile.write(body)
-    except BrokenPipeError:
+    except (BrokenPipeError, ConnectionResetError):
+        handler.close_connection = True
         if getattr(handler, "debug", False):
             print("ACP response write failed: client disconnected.")
 
 
+def _stream_mode(accept: Optional[str]) -> Optional[str]:
+    accept = (accept or "").lower()
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+
+def _encode_event(event: Dict[str, Any], mode: str) -> bytes:
+    if mode == "sse":
+        if event.get("type") == "heartbeat":
+            return b": heartbeat\n\n"
+        return f"event: {event.get('type') or 'message'}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+    return (json.dumps(event) + "\n").encode("utf-8")
+
+
+def _write_stream(handler: BaseHTTPRequestHandler, events: Iterable[Dict[str, Any]], mode: str = "ndjson") -> None:
+    # No Content-Length: each event is flushed as its own line (or SSE message). HTTP/1.1
+    # clients get it as one chunk per event and keep the connection; HTTP/1.0 clients
+    # read until the connection closes.
+    chunked = getattr(handler, "request_version", "HTTP/1.0") != "HTTP/1.0" and not _body_pending(handler)
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream" if mode == "sse" else "application/x-ndjson")
+    handler.send_header("Cache-Control", "no-cache")
+    if chunked:
+        handler.send_header("Transfer-Encoding", "chunked")
+    else:
+        handler.send_header("Connection", "close")
+        handler.close_connection = True
+    handler.end_headers()
+    iterator = iter(events)
+    try:
+        for event in iterator:
+            data = _encode_event(event, mode)
+            if chunked:
+                data = b"%x\r\n%s\r\n" % (len(data), data)
+            handler.wfile.write(data)
+            handler.wfile.flush()
+        if chunked:
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+        handler.close_connection = True
+        if getattr(handler, "debug", False):
+            print("ACP stream write failed: client disconnected.")
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _flow_events(run: Callable[[], Dict[str, Any]], debug: bool, heartbeat: float) -> Iterator[Dict[str, Any]]:
+    # Runs the flow on its own thread with a progress reporter attached and yields its
+    # stage/partial events as they happen, then a final "result" event. Heartbeats
+    # keep idle proxies and client timeouts from firing during long LLM calls.
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+    def _worker() -> None:
+        with progress_scope(events.put) as reporter:
+            try:
+                result = run()
+            except Exception as exc:
+                if debug:
+                    import traceback
+
+                    traceback.print_exc()
+                reporter.emit("result", status_code=500, result={"error": "flow_failed", "detail": str(exc) if debug else None})
+            else:
+                status = 200 if result.get("status") != "error" else 500
+                reporter.emit("result", status_code=status, result=result)
+        events.put(None)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(_worker,), name="acp-flow", daemon=True).start()
+    started = time.monotonic()
+    while True:
+        try:
+            event = events.get(timeout=heartbeat)
+        except queue.Empty:
+            yield {"type": "heartbeat", "elapsed_seconds": round(time.monotonic() - started, 3)}
+            continue
+        if event is None:
+            return
+        yield event
+
+
+def _iter_keeper_rows(path: str) -> Iterator[Any]:
+    if path.endswith(".csv"):
+        import csv
+
+        with open(path, "r", encoding="utf-8", newline="") as handle:
+            yield from csv.DictReader(handle)
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        yield from (data if isinstance(data, list) else [data])
+
+
 def _load_registry_services() -> tuple[list[Dict[str, Any]], list[str]]:
     warnings: list[str] = []
     try:
@@ -62,16 +221,33 @@ def _load_registry_services() -> tuple[list[Dict[str, Any]], list[str]]:
             continue
         endpoint = entry.get("endpoint")
         if endpoint:
-            services.append({"name": name, "endpoint": endpoint})
+            services.append({"name": name, "endpoint": endpoint, "mcp_tools": list(entry.get("mcp_tools") or [])})
         else:
             warnings.append(f"service_registry_missing_endpoint:{name}")
     return services, warnings
 
 
 class ACPRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests (R's httr reuses them), so a
+    # client's requests share one TCP connection and one server thread. timeout closes
+    # connections idle that long; small header/body writes go out without Nagle delay.
+    protocol_version = "HTTP/1.1"
+    timeout: Optional[float] = 15.0
+    disable_nagle_algorithm = True
     agent: StudyAgent
     mcp_client: Optional[object]
     debug: bool = False
+    jobs: Optional[JobManager] = None
+    # Set while POST /jobs replays its flow body through the flow branches below.
+    _job_flow: Optional[str] = None
+    _job_body: Optional[Dict[str, Any]] = None
+
+    def parse_request(self) -> bool:
+        # One handler serves every request on a kept-alive connection; reset per-request state.
+        self._body_read = False
+        self._job_flow = None
+        self._job_body = None
+        return super().parse_request()
 
     def log_message(self, format: str, *args: Any) -> None:
         if self.debug:
@@ -105,6 +281,14 @@ class ACPRequestHandler(BaseHTTPRequestHandler):
             for endpoint, svc in registry_map.items():
                 merged = dict(svc)
                 merged["implemented"] = endpoint in runtime_map
+                spec = FLOWS.get(svc["name"])
+                if spec is not None:
+                    merged["steps"] = [
+                        {"name": step.name, "kind": step.kind, "inputs": list(step.inputs), "tool": step.tool}
+                        for step in spec.steps
+                    ]
+                    if set(spec.tools()) != set(svc.get("mcp_tools") or []):
+                        warnings.append(f"service_tools_drift:{svc['name']}")
                 services.append(merged)
             for endpoint, svc in runtime_map.items():
                 if endpoint not in registry_map:
@@ -113,269 +297,347 @@ class ACPRequestHandler(BaseHTTPRequestHandler):
 
             _write_json(self, 200, {"services": services, "warnings": warnings})
             return
-        _write_json(self, 404, {"error": "not_found"})
-
-    def do_POST(self) -> None:
-        if self.debug:
-            length = int(self.headers.get("Content-Length", "0"))
-            content_type = self.headers.get("Content-Type")
-            print(f"ACP POST > path={self.path} length={length} content_type={content_type}")
-        if self.path == "/tools/call":
-            try:
-                body = _read_json(self)
-            except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+        if self.path == "/jobs" or self.path.startswith("/jobs/"):
+            if self.jobs is None:
+                _write_json(self, 404, {"error": "jobs_disabled"})
                 return
-
-            name = body.get("name")
-            arguments = body.get("arguments") or {}
-            confirm = bool(body.get("confirm", False))
-            if not name:
-                _write_json(self, 400, {"error": "missing tool name"})
+            if self.path == "/jobs":
+                jobs = [job.snapshot(include_result=False) for job in self.jobs.list_jobs()]
+                _write_json(self, 200, {"jobs": jobs, "stats": self.jobs.stats()})
                 return
-
-            try:
-                result = self.agent.call_tool(name=name, arguments=arguments, confirm=confirm)
-            except Exception as exc:
-                if self.debug:
-                    import traceback
-
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "tool_call_failed", "detail": str(exc) if self.debug else None})
+            job = self.jobs.get(self.path[len("/jobs/") :])
+            if job is None:
+                _write_json(self, 404, {"error": "job_not_found"})
                 return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
+            _write_json(self, 200, job.snapshot())
             return
+        _write_json(self, 404, {"error": "not_found"})
 
-        if self.path == "/flows/phenotype_recommendation":
-            try:
-                body = _read_json(self)
-            except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+    def do_DELETE(self) -> None:
+        if self.path.startswith("/jobs/") and self.jobs is not None:
+            job = self.jobs.cancel(self.path[len("/jobs/") :])
+            if job is None:
+                _write_json(self, 404, {"error": "job_not_found"})
                 return
-            study_intent = body.get("study_intent") or body.get("query") or ""
-            top_k = int(body.get("top_k", 20))
-            max_results = int(body.get("max_results", 10))
-            candidate_limit = body.get("candidate_limit")
-            if candidate_limit is not None:
-                candidate_limit = int(candidate_limit)
-            candidate_offset = body.get("candidate_offset")
-            if candidate_offset is not None:
-                candidate_offset = int(candidate_offset)
-            try:
-                result = self.agent.run_phenotype_recommendation_flow(
-                    study_intent=study_intent,
-                    top_k=top_k,
-                    max_results=max_results,
-                    candidate_limit=candidate_limit,
-                    candidate_offset=candidate_offset,
-                )
-            except Exception as exc:
-                if self.debug:
-                    import traceback
+            _write_json(self, 200, job.snapshot(include_result=False))
+            return
+        _write_json(self, 404, {"error": "not_found"})
 
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
-                return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
+    def do_POST(self) -> None:
+        # "Cache-Control: no-cache" skips the LLM response cache for this request only.
+        cache_control = (self.headers.get("Cache-Control") or "").lower()
+        with llm_cache_bypass("no-cache" in cache_control or "no-store" in cache_control):
+            if self.path == "/jobs":
+                self._submit_job()
+            else:
+                self._handle_post()
+
+    def _submit_job(self) -> None:
+        # POST /jobs {"flow": name, "body": {...}} validates the body exactly like
+        # POST /flows/<name> and answers 202 with the job instead of the result.
+        if self.jobs is None:
+            _write_json(self, 404, {"error": "jobs_disabled"})
             return
+        try:
+            body = _read_json(self)
+        except Exception as exc:
+            _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+            return
+        flow = body.get("flow") or ""
+        flow_body = body.get("body") or {}
+        if f"/flows/{flow}" not in {svc["endpoint"] for svc in SERVICES}:
+            _write_json(self, 400, {"error": f"unknown_flow: {flow}"})
+            return
+        if not isinstance(flow_body, dict):
+            _write_json(self, 400, {"error": "body must be a JSON object"})
+            return
+        self._job_flow = flow
+        self._job_body = flow_body
+        self._handle_post(f"/flows/{flow}")
+
+    def _read_body(self) -> Dict[str, Any]:
+        if self._job_body is not None:
+            return self._job_body
+        return _read_json(self)
+
+    def _respond_job(self, job: Optional[Job]) -> None:
+        if job is None:
+            _write_json(self, 429, {"error": "job_queue_full"}, headers={"Retry-After": "5"})
+            return
+        payload = job.snapshot(include_result=False)
+        payload["status_url"] = f"/jobs/{job.job_id}"
+        _write_json(self, 202, payload, headers={"Location": payload["status_url"]})
+
+    def _respond_flow(self, run: Callable[[], Dict[str, Any]]) -> None:
+        # Accept: text/event-stream or application/x-ndjson streams progress events
+        # ending in the result; anything else gets the single JSON response.
+        if self._job_flow is not None:
+            self._respond_job(self.jobs.submit(self._job_flow, run))
+            return
+        mode = _stream_mode(self.headers.get("Accept"))
+        if mode is not None:
+            heartbeat = float(os.getenv("ACP_STREAM_HEARTBEAT", "15"))
+            _write_stream(self, _flow_events(run, self.debug, heartbeat), mode)
+            return
+        try:
+            result = run()
+        except Exception as exc:
+            if self.debug:
+                import traceback
 
-        if self.path == "/flows/phenotype_improvements":
-            try:
-                body = _read_json(self)
-            except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
-                return
-            protocol_text = body.get("protocol_text") or ""
-            protocol_path = body.get("protocol_path")
-            if not protocol_text and protocol_path:
-                try:
-                    with open(protocol_path, "r", encoding="utf-8") as handle:
-                        protocol_text = handle.read()
-                except Exception as exc:
-                    _write_json(self, 400, {"error": f"invalid_protocol_path: {exc}"})
-                    return
-            cohorts = body.get("cohorts") or []
-            cohort_paths = body.get("cohort_paths") or []
-            if cohort_paths and not cohorts:
-                loaded = []
-                for path in cohort_paths:
-                    try:
-                        with open(path, "r", encoding="utf-8") as handle:
-                            loaded.append(json.load(handle))
-                    except Exception as exc:
-                        _write_json(self, 400, {"error": f"invalid_cohort_path: {exc}"})
-                        return
-                cohorts = loaded
-            cohorts = _ensure_cohort_ids(cohorts, cohort_paths)
-            if len(cohorts) > 1:
-                cohorts = [cohorts[0]]
-            characterization_previews = body.get("characterization_previews") or []
-            try:
-                result = self.agent.run_phenotype_improvements_flow(
-                    protocol_text=protocol_text,
-                    cohorts=cohorts,
-                    characterization_previews=characterization_previews,
-                )
-            except Exception as exc:
-                if self.debug:
-                    import traceback
+                traceback.print_exc()
+            _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
+            return
+        status = 200 if result.get("status") != "error" else 500
+        _write_json(self, status, result)
 
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
-                return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
+    def _handle_post(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if self.debug:
+            length = int(self.headers.get("Content-Length", "0"))
+            content_type = self.headers.get("Content-Type")
+            print(f"ACP POST > path={path} length={length} content_type={content_type}")
+        route = _POST_ROUTES.get(path)
+        if route is None:
+            _write_json(self, 404, {"error": "not_found"})
+            return
+        try:
+            body = self._read_body()
+        except Exception as exc:
+            _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+            return
+        getattr(self, route)(body)
+
+    def _post_tool_call(self, body: Dict[str, Any]) -> None:
+        name = body.get("name")
+        arguments = body.get("arguments") or {}
+        confirm = bool(body.get("confirm", False))
+        if not name:
+            _write_json(self, 400, {"error": "missing tool name"})
             return
 
-        if self.path == "/flows/concept_sets_review":
-            try:
-                body = _read_json(self)
-            except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
-                return
-            concept_set = body.get("concept_set")
-            concept_set_path = body.get("concept_set_path")
-            if concept_set is None and concept_set_path:
-                try:
-                    with open(concept_set_path, "r", encoding="utf-8") as handle:
-                        concept_set = json.load(handle)
-                except Exception as exc:
-                    _write_json(self, 400, {"error": f"invalid_concept_set_path: {exc}"})
-                    return
-            study_intent = body.get("study_intent") or ""
-            try:
-                result = self.agent.run_concept_sets_review_flow(
-                    concept_set=concept_set,
-                    study_intent=study_intent,
-                )
-            except Exception as exc:
-                if self.debug:
-                    import traceback
+        try:
+            result = self.agent.call_tool(name=name, arguments=arguments, confirm=confirm)
+        except Exception as exc:
+            if self.debug:
+                import traceback
 
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
-                return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
+                traceback.print_exc()
+            _write_json(self, 500, {"error": "tool_call_failed", "detail": str(exc) if self.debug else None})
             return
+        status = 200 if result.get("status") != "error" else 500
+        _write_json(self, status, result)
+
+    def _post_phenotype_recommendation(self, body: Dict[str, Any]) -> None:
+        study_intent = body.get("study_intent") or body.get("query") or ""
+        top_k = int(body.get("top_k", 20))
+        max_results = int(body.get("max_results", 10))
+        candidate_limit = body.get("candidate_limit")
+        if candidate_limit is not None:
+            candidate_limit = int(candidate_limit)
+        candidate_offset = body.get("candidate_offset")
+        if candidate_offset is not None:
+            candidate_offset = int(candidate_offset)
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_recommendation_flow(
+                study_intent=study_intent,
+                top_k=top_k,
+                max_results=max_results,
+                candidate_limit=candidate_limit,
+                candidate_offset=candidate_offset,
+            )
+        )
+
+    def _post_phenotype_intent_recommendation(self, body: Dict[str, Any]) -> None:
+        study_intent = body.get("study_intent") or body.get("query") or ""
+        top_k = int(body.get("top_k", 20))
+        max_results = int(body.get("max_results", 10))
+        candidate_limit = body.get("candidate_limit")
+        if candidate_limit is not None:
+            candidate_limit = int(candidate_limit)
+        candidate_offset = body.get("candidate_offset")
+        if candidate_offset is not None:
+            candidate_offset = int(candidate_offset)
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_intent_recommendation_flow(
+                study_intent=study_intent,
+                top_k=top_k,
+                max_results=max_results,
+                candidate_limit=candidate_limit,
+                candidate_offset=candidate_offset,
+            )
+        )
 
-        if self.path == "/flows/cohort_critique_general_design":
+    def _post_phenotype_improvements(self, body: Dict[str, Any]) -> None:
+        protocol_text = body.get("protocol_text") or ""
+        protocol_path = body.get("protocol_path")
+        if not protocol_text and protocol_path:
             try:
-                body = _read_json(self)
+                with open(protocol_path, "r", encoding="utf-8") as handle:
+                    protocol_text = handle.read()
             except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+                _write_json(self, 400, {"error": f"invalid_protocol_path: {exc}"})
                 return
-            cohort = body.get("cohort") or {}
-            cohort_path = body.get("cohort_path")
-            if (not cohort or cohort == {}) and cohort_path:
+        cohorts = body.get("cohorts") or []
+        cohort_paths = body.get("cohort_paths") or []
+        if cohort_paths and not cohorts:
+            loaded = []
+            for path in cohort_paths:
                 try:
-                    with open(cohort_path, "r", encoding="utf-8") as handle:
-                        cohort = json.load(handle)
+                    with open(path, "r", encoding="utf-8") as handle:
+                        loaded.append(json.load(handle))
                 except Exception as exc:
                     _write_json(self, 400, {"error": f"invalid_cohort_path: {exc}"})
                     return
-            try:
-                result = self.agent.run_cohort_critique_general_design_flow(cohort=cohort)
-            except Exception as exc:
-                if self.debug:
-                    import traceback
-
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
-                return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
-            return
+            cohorts = loaded
+        cohorts = _ensure_cohort_ids(cohorts, cohort_paths)
+        if len(cohorts) > 1:
+            cohorts = [cohorts[0]]
+        characterization_previews = body.get("characterization_previews") or []
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_improvements_flow(
+                protocol_text=protocol_text,
+                cohorts=cohorts,
+                characterization_previews=characterization_previews,
+            )
+        )
 
-        if self.path == "/flows/phenotype_validation_review":
+    def _post_concept_sets_review(self, body: Dict[str, Any]) -> None:
+        concept_set = body.get("concept_set")
+        concept_set_path = body.get("concept_set_path")
+        if concept_set is None and concept_set_path:
             try:
-                body = _read_json(self)
+                with open(concept_set_path, "r", encoding="utf-8") as handle:
+                    concept_set = json.load(handle)
             except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
-                return
-            disease_name = body.get("disease_name") or ""
-            keeper_row = body.get("keeper_row")
-            keeper_row_path = body.get("keeper_row_path")
-            if keeper_row is None and keeper_row_path:
-                try:
-                    if keeper_row_path.endswith(".csv"):
-                        import csv
-
-                        with open(keeper_row_path, "r", encoding="utf-8") as handle:
-                            reader = csv.DictReader(handle)
-                            keeper_row = next(reader, None)
-                    else:
-                        with open(keeper_row_path, "r", encoding="utf-8") as handle:
-                            keeper_row = json.load(handle)
-                except Exception as exc:
-                    _write_json(self, 400, {"error": f"invalid_keeper_row_path: {exc}"})
-                    return
-            if not isinstance(keeper_row, dict):
-                _write_json(self, 400, {"error": "keeper_row must be a JSON object"})
+                _write_json(self, 400, {"error": f"invalid_concept_set_path: {exc}"})
                 return
+        study_intent = body.get("study_intent") or ""
+        self._respond_flow(
+            lambda: self.agent.run_concept_sets_review_flow(
+                concept_set=concept_set,
+                study_intent=study_intent,
+            )
+        )
+
+    def _post_cohort_critique_general_design(self, body: Dict[str, Any]) -> None:
+        cohort = body.get("cohort") or {}
+        cohort_path = body.get("cohort_path")
+        if (not cohort or cohort == {}) and cohort_path:
             try:
-                result = self.agent.run_phenotype_validation_review_flow(
-                    keeper_row=keeper_row,
-                    disease_name=disease_name,
-                )
+                with open(cohort_path, "r", encoding="utf-8") as handle:
+                    cohort = json.load(handle)
             except Exception as exc:
-                if self.debug:
-                    import traceback
-
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
+                _write_json(self, 400, {"error": f"invalid_cohort_path: {exc}"})
                 return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
-            return
+        self._respond_flow(lambda: self.agent.run_cohort_critique_general_design_flow(cohort=cohort))
 
-        if self.path == "/flows/phenotype_recommendation_advice":
+    def _post_phenotype_validation_review(self, body: Dict[str, Any]) -> None:
+        disease_name = body.get("disease_name") or ""
+        keeper_row = body.get("keeper_row")
+        keeper_row_path = body.get("keeper_row_path")
+        if keeper_row is None and keeper_row_path:
             try:
-                body = _read_json(self)
+                if keeper_row_path.endswith(".csv"):
+                    import csv
+
+                    with open(keeper_row_path, "r", encoding="utf-8") as handle:
+                        reader = csv.DictReader(handle)
+                        keeper_row = next(reader, None)
+                else:
+                    with open(keeper_row_path, "r", encoding="utf-8") as handle:
+                        keeper_row = json.load(handle)
             except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
+                _write_json(self, 400, {"error": f"invalid_keeper_row_path: {exc}"})
                 return
-            study_intent = body.get("study_intent") or body.get("query") or ""
-            try:
-                result = self.agent.run_phenotype_recommendation_advice_flow(
-                    study_intent=study_intent,
-                )
-            except Exception as exc:
-                if self.debug:
-                    import traceback
+        if not isinstance(keeper_row, dict):
+            _write_json(self, 400, {"error": "keeper_row must be a JSON object"})
+            return
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_validation_review_flow(
+                keeper_row=keeper_row,
+                disease_name=disease_name,
+            )
+        )
 
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
+    def _post_phenotype_validation_review_batch(self, body: Dict[str, Any]) -> None:
+        disease_name = body.get("disease_name") or ""
+        keeper_rows = body.get("keeper_rows")
+        keeper_rows_path = body.get("keeper_rows_path") or body.get("keeper_row_path")
+        if not disease_name:
+            _write_json(self, 400, {"error": "missing disease_name"})
+            return
+        if keeper_rows is None and keeper_rows_path:
+            if not os.path.isfile(keeper_rows_path):
+                _write_json(self, 400, {"error": f"invalid_keeper_rows_path: {keeper_rows_path}"})
                 return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
+            keeper_rows = _iter_keeper_rows(keeper_rows_path)
+        if keeper_rows is None or isinstance(keeper_rows, (dict, str)):
+            _write_json(self, 400, {"error": "keeper_rows must be a list or keeper_rows_path a file"})
             return
+        max_workers = int(body.get("max_workers") or os.getenv("ACP_BATCH_WORKERS", "4"))
+        max_workers = max(1, min(max_workers, int(os.getenv("ACP_BATCH_MAX_WORKERS", "32"))))
+        chunk_size = max(1, min(int(body.get("chunk_size") or 50), MAX_KEEPER_CHUNK_ROWS))
+        pack_size = int(body.get("pack_size") or os.getenv("ACP_KEEPER_PACK_SIZE", "1"))
+        events = self.agent.run_phenotype_validation_review_batch_flow(
+            keeper_rows=keeper_rows,
+            disease_name=disease_name,
+            max_workers=max_workers,
+            chunk_size=chunk_size,
+            pack_size=pack_size,
+        )
+        if self._job_flow is not None:
+            self._respond_job(self.jobs.submit(self._job_flow, lambda: _collect_batch(events)))
+            return
+        _write_stream(self, _guard_stream(events, self.debug), _stream_mode(self.headers.get("Accept")) or "ndjson")
+
+    def _post_phenotype_recommendation_advice(self, body: Dict[str, Any]) -> None:
+        study_intent = body.get("study_intent") or body.get("query") or ""
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_recommendation_advice_flow(
+                study_intent=study_intent,
+            )
+        )
 
-        if self.path == "/flows/phenotype_intent_split":
-            try:
-                body = _read_json(self)
-            except Exception as exc:
-                _write_json(self, 400, {"error": f"invalid_json: {exc}"})
-                return
-            study_intent = body.get("study_intent") or body.get("query") or ""
-            try:
-                result = self.agent.run_phenotype_intent_split_flow(
-                    study_intent=study_intent,
-                )
-            except Exception as exc:
-                if self.debug:
-                    import traceback
+    def _post_phenotype_intent_split(self, body: Dict[str, Any]) -> None:
+        study_intent = body.get("study_intent") or body.get("query") or ""
+        self._respond_flow(
+            lambda: self.agent.run_phenotype_intent_split_flow(
+                study_intent=study_intent,
+            )
+        )
 
-                    traceback.print_exc()
-                _write_json(self, 500, {"error": "flow_failed", "detail": str(exc) if self.debug else None})
-                return
-            status = 200 if result.get("status") != "error" else 500
-            _write_json(self, status, result)
-            return
 
-        _write_json(self, 404, {"error": "not_found"})
+def _collect_batch(events: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    # A batch run as a job: the row events and summary become one result, and a
+    # cancelled job stops submitting cases as soon as it is noticed.
+    rows = []
+    summary: Dict[str, Any] = {}
+    try:
+        for event in events:
+            if event.get("type") == "summary":
+                summary = event
+            else:
+                rows.append(event)
+            if job_cancelled():
+                break
+    finally:
+        events.close()
+    return {"status": "ok", "rows": rows, "summary": summary}
+
+
+def _guard_stream(events: Iterator[Dict[str, Any]], debug: bool) -> Iterator[Dict[str, Any]]:
+    # Headers are already sent once streaming starts, so failures become a final error event.
+    try:
+        yield from events
+    except Exception as exc:
+        if debug:
+            import traceback
+
+            traceback.print_exc()
+        yield {"type": "error", "status": "error", "error": "flow_failed", "detail": str(exc) if debug else None}
+    finally:
+        events.close()
 
 
 def _build_agent(
@@ -386,15 +648,28 @@ def _build_agent(
     mcp_url: Optional[str],
     mcp_token: Optional[str],
     mcp_timeout: int,
+    mcp_call_timeout: Optional[float] = None,
+    mcp_pool_size: int = 2,
+    mcp_pool_max_calls: int = 50,
 ) -> tuple[StudyAgent, Optional[object]]:
     mcp_client = None
     if mcp_url:
-        mcp_client = HttpMCPClient(HttpMCPClientConfig(url=mcp_url, token=mcp_token, timeout=mcp_timeout))
+        mcp_client = HttpMCPClient(
+            HttpMCPClientConfig(url=mcp_url, token=mcp_token, timeout=mcp_timeout, call_timeout=mcp_call_timeout)
+        )
     elif mcp_command:
         mcp_client = StdioMCPClient(
-            StdioMCPClientConfig(command=mcp_command, args=mcp_args or [], cwd=mcp_cwd),
+            StdioMCPClientConfig(
+                command=mcp_command,
+                args=mcp_args or [],
+                cwd=mcp_cwd,
+                call_timeout=mcp_call_timeout,
+                pool_size=mcp_pool_size,
+                pool_max_calls=mcp_pool_max_calls,
+            ),
         )
-    return StudyAgent(mcp_client=mcp_client, allow_core_fallback=allow_core_fallback), mcp_client
+    agent = StudyAgent(mcp_client=mcp_client, allow_core_fallback=allow_core_fallback, llm_client=get_llm_client())
+    return agent, mcp_client
 
 
 def _cohort_id_from_path(path: str) -> Optional[int]:
@@ -461,10 +736,14 @@ def main(host: str = "127.0.0.1", port: int = 8765) -> None:
     allow_core_fallback = os.getenv("STUDY_AGENT_ALLOW_CORE_FALLBACK", "1") == "1"
     debug = os.getenv("STUDY_AGENT_DEBUG", "0") == "1"
     threaded = os.getenv("STUDY_AGENT_THREADING", "1") == "1"
+    use_asyncio = os.getenv("STUDY_AGENT_ASYNCIO", "0") == "1"
     mcp_cwd = os.getenv("STUDY_AGENT_MCP_CWD") or os.getcwd()
     mcp_url = os.getenv("STUDY_AGENT_MCP_URL")
     mcp_token = os.getenv("STUDY_AGENT_MCP_TOKEN")
     mcp_timeout = int(os.getenv("STUDY_AGENT_MCP_TIMEOUT", "30"))
+    mcp_call_timeout = float(os.getenv("STUDY_AGENT_MCP_CALL_TIMEOUT", "0")) or None
+    mcp_pool_size = int(os.getenv("STUDY_AGENT_MCP_POOL_SIZE", "2"))
+    mcp_pool_max_calls = int(os.getenv("STUDY_AGENT_MCP_POOL_MAX_CALLS", "50"))
 
     if mcp_url:
         if "://" in mcp_url and ":" not in mcp_url.split("://", 1)[1]:
@@ -488,6 +767,9 @@ def main(host: str = "127.0.0.1", port: int = 8765) -> None:
         mcp_url,
         mcp_token,
         mcp_timeout,
+        mcp_call_timeout,
+        mcp_pool_size,
+        mcp_pool_max_calls,
     )
 
     class Handler(ACPRequestHandler):
@@ -498,8 +780,22 @@ def main(host: str = "127.0.0.1", port: int = 8765) -> None:
     Handler.agent = agent
     Handler.mcp_client = mcp_client
     Handler.debug = debug
-    server_cls = ThreadingHTTPServer if threaded else HTTPServer
-    server = server_cls((host, port), Handler)
+    Handler.jobs = JobManager.from_env()
+    Handler.timeout = float(os.getenv("ACP_KEEPALIVE_TIMEOUT", "15"))
+    if use_asyncio:
+        from .async_server import AsyncACPServer, FlowLimiter
+
+        server = AsyncACPServer(
+            (host, port),
+            Handler,
+            limiter=FlowLimiter.from_env(),
+            retry_after=int(os.getenv("ACP_RETRY_AFTER", "5")),
+            control_workers=int(os.getenv("ACP_CONTROL_WORKERS", "4")),
+        )
+        print(f"ACP INFO > asyncio server limits={server.limiter.stats()}")
+    else:
+        server_cls = ThreadingHTTPServer if threaded else HTTPServer
+        server = server_cls((host, port), Handler)
 
     shutdown_lock = threading.Lock()
     shutdown_once = {"done": False}
@@ -521,13 +817,15 @@ def main(host: str = "127.0.0.1", port: int = 8765) -> None:
 
     signal.signal(signal.SIGINT, _shutdown)
     signal.signal(signal.SIGTERM, _shutdown)
-    _serve(server, mcp_client)
+    _serve(server, mcp_client, Handler.jobs)
 
 
-def _serve(server: HTTPServer, mcp_client: Optional[object]) -> None:
+def _serve(server: HTTPServer, mcp_client: Optional[object], jobs: Optional[JobManager] = None) -> None:
     try:
         server.serve_forever()
     finally:
+        if jobs is not None:
+            jobs.shutdown()
         if mcp_client is not None:
             mcp_client.close()
 
@@ -1,4 +1,10 @@
+import json
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
 
 
 def pytest_runtest_logreport(report):
@@ -8,3 +14,97 @@ def pytest_runtest_logreport(report):
         return
     status = "PASS" if report.passed else "FAIL" if report.failed else "SKIP"
     print(f"{status}: {report.nodeid}")
+
+
+class FakeLLMGateway:
+    # OpenAI-compatible chat/completions stub on a real socket, so tests exercise the
+    # LLM client's connection handling. reply(request_json) returns the message content.
+    def __init__(self) -> None:
+        self.requests = []
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self.delay = 0.0
+        self.drop_idle = False
+        self.stream_chunk = 0
+        self.stream_trailer = ""
+        self.stream_writes = 0
+        self.reply = lambda request: {"ok": True}
+        self._lock = threading.Lock()
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with gateway._lock:
+                    gateway.connections += 1
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+                with gateway._lock:
+                    gateway.requests.append(body)
+                    gateway.active += 1
+                    gateway.peak = max(gateway.peak, gateway.active)
+                time.sleep(gateway.delay)
+                with gateway._lock:
+                    gateway.active -= 1
+                content = json.dumps(gateway.reply(body))
+                if body.get("stream") and gateway.stream_chunk:
+                    self._stream(content + gateway.stream_trailer)
+                    return
+                raw = json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+                # Simulates a gateway that drops idle keep-alive connections without saying so.
+                self.close_connection = gateway.drop_idle
+
+            def _stream(self, content: str) -> None:
+                # Chat-completions SSE, one delta per stream_chunk characters.
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [content[idx : idx + gateway.stream_chunk] for idx in range(0, len(content), gateway.stream_chunk)]
+                events = [json.dumps({"choices": [{"delta": {"content": piece}}]}) for piece in pieces] + ["[DONE]"]
+                try:
+                    for event in events:
+                        data = f"data: {event}\n\n".encode("utf-8")
+                        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                        self.wfile.flush()
+                        with gateway._lock:
+                            gateway.stream_writes += 1
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def log_message(self, format, *args) -> None:
+                return
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/chat/completions"
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def llm_gateway(monkeypatch):
+    from study_agent_acp import llm_client
+
+    gateway = FakeLLMGateway()
+    monkeypatch.setenv("LLM_API_URL", gateway.url)
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    llm_client.reload_llm_config()
+    yield gateway
+    gateway.close()
+    llm_client.get_llm_client().close()
@@ -0,0 +1,168 @@
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# (category, pattern, replacement). Order matters: when two patterns match at the
+# same position the earlier one wins, mirroring the order the redactions used to run in.
+PHI_PATTERNS: List[Tuple[str, str, str]] = [
+    ("email", r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", "[REDACTED_EMAIL]"),
+    ("url", r"https?://\S+", "[REDACTED_URL]"),
+    ("ip", r"\b(?:\d{1,3}\.){3}\d{1,3}\b", "[REDACTED_IP]"),
+    # With a country code the groups may run together; without one they must be
+    # separated, so 10-digit identifiers such as concept ids are not taken for numbers.
+    (
+        "phone",
+        r"\+?\b\d{1,2}[\s.-]?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b|(?:\(\d{3}\)\s?|\b\d{3}[\s.-])\d{3}[\s.-]\d{4}\b",
+        "[REDACTED_PHONE]",
+    ),
+    ("date", r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}-\d{1,2}-\d{1,2}\b", "[REDACTED_DATE]"),
+    ("zip", r"\b\d{5}(?:-\d{4})?\b", "[REDACTED_ZIP]"),
+    ("day", r"(?i:\(day[^)\x00]*\))", "(prior)"),
+]
+
+# Joins texts for batched scans. No pattern can match across it (every class that
+# admits \x00 stops at the surrounding newlines), so matches stay inside one text.
+_SEGMENT_SEP = "\n\x00\n"
+
+# Categories that count as PHI when checking text; zip and relative-day markers are
+# redacted but too common in clinical text (codes, counts) to flag on their own.
+DETECT_CATEGORIES = ("email", "url", "ip", "phone", "date")
+
+# Characters a match of each category can start with. The combined pattern leads with a
+# lookahead over their union so the regex engine can skip straight to candidate positions.
+_LEAD_CHARS = {
+    "email": r"A-Za-z0-9._%+\-",
+    "url": "h",
+    "ip": r"\d",
+    "phone": r"\d+(",
+    "date": r"\d",
+    "zip": r"\d",
+    "day": "(",
+}
+
+# Categories whose lead characters include letters are only worth trying when the text
+# contains a cheap literal marker; without it they would make every position a candidate.
+_TRIGGERS = {"email": "@", "url": "://"}
+
+
+@dataclass(frozen=True)
+class PhiMatch:
+    category: str
+    start: int
+    end: int
+
+
+class PhiScanner:
+    def __init__(self, categories: Optional[Iterable[str]] = None) -> None:
+        wanted = None if categories is None else set(categories)
+        if wanted is not None:
+            unknown = wanted - {item[0] for item in PHI_PATTERNS}
+            if unknown:
+                raise ValueError(f"unknown PHI categories: {sorted(unknown)}")
+        self._selected = [item for item in PHI_PATTERNS if wanted is None or item[0] in wanted]
+        self.categories = tuple(item[0] for item in self._selected)
+        self._replacements = {name: replacement for name, _, replacement in self._selected}
+        self._triggers = [(name, _TRIGGERS[name]) for name in self.categories if name in _TRIGGERS]
+        self._compiled: Dict[FrozenSet[str], "re.Pattern[str]"] = {}
+
+    def contains(self, text: str) -> bool:
+        if not text:
+            return False
+        return self._pattern_for(text).search(text) is not None
+
+    def scan(self, text: str) -> List[PhiMatch]:
+        if not text:
+            return []
+        return [
+            PhiMatch(match.lastgroup or "", match.start(), match.end())
+            for match in self._pattern_for(text).finditer(text)
+        ]
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        counts: Dict[str, int] = {}
+        if not text:
+            return text, counts
+
+        def _replace(match: "re.Match[str]") -> str:
+            category = match.lastgroup or ""
+            counts[category] = counts.get(category, 0) + 1
+            return self._replacements[category]
+
+        return self._pattern_for(text).sub(_replace, text), counts
+
+    def scan_many(self, texts: List[str]) -> List[List[PhiMatch]]:
+        # One scan over all texts; spans are relative to each text.
+        results: List[List[PhiMatch]] = [[] for _ in texts]
+        joined, starts = _join(texts)
+        for match in self._pattern_for(joined).finditer(joined):
+            idx = bisect_right(starts, match.start()) - 1
+            offset = starts[idx]
+            results[idx].append(PhiMatch(match.lastgroup or "", match.start() - offset, match.end() - offset))
+        return results
+
+    def redact_many(self, texts: List[str]) -> Tuple[List[str], List[Dict[str, int]]]:
+        counts: List[Dict[str, int]] = [{} for _ in texts]
+        if not texts:
+            return [], counts
+        joined, starts = _join(texts)
+
+        def _replace(match: "re.Match[str]") -> str:
+            category = match.lastgroup or ""
+            bucket = counts[bisect_right(starts, match.start()) - 1]
+            bucket[category] = bucket.get(category, 0) + 1
+            return self._replacements[category]
+
+        redacted = self._pattern_for(joined).sub(_replace, joined).split(_SEGMENT_SEP)
+        if len(redacted) != len(texts):
+            # A text contained the separator itself; fall back to one scan per text.
+            pairs = [self.redact(text) for text in texts]
+            return [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+        return redacted, counts
+
+    def _pattern_for(self, text: str) -> "re.Pattern[str]":
+        skipped = frozenset(name for name, marker in self._triggers if marker not in text)
+        pattern = self._compiled.get(skipped)
+        if pattern is None:
+            pattern = self._compile(skipped)
+            self._compiled[skipped] = pattern
+        return pattern
+
+    def _compile(self, skipped: FrozenSet[str]) -> "re.Pattern[str]":
+        # One alternation with a named group per category: a single left-to-right scan
+        # reports every category instead of one regex pass per category.
+        active = [(name, pattern) for name, pattern, _ in self._selected if name not in skipped]
+        if not active:
+            return re.compile(r"(?!)")
+        lead = "".join(dict.fromkeys(_LEAD_CHARS[name] for name, _ in active))
+        branches = "|".join(f"(?P<{name}>{pattern})" for name, pattern in active)
+        return re.compile(f"(?=[{lead}])(?:{branches})")
+
+
+def _join(texts: List[str]) -> Tuple[str, List[int]]:
+    starts: List[int] = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + len(_SEGMENT_SEP)
+    return _SEGMENT_SEP.join(texts), starts
+
+
+_SCANNERS: Dict[Optional[Tuple[str, ...]], PhiScanner] = {}
+
+
+def get_scanner(categories: Optional[Iterable[str]] = None) -> PhiScanner:
+    key = None if categories is None else tuple(sorted(set(categories)))
+    scanner = _SCANNERS.get(key)
+    if scanner is None:
+        scanner = PhiScanner(key)
+        _SCANNERS[key] = scanner
+    return scanner
+
+
+def phi_detected(text: str) -> bool:
+    return get_scanner(DETECT_CATEGORIES).contains(text)
+
+
+def redact_phi(text: str) -> Tuple[str, Dict[str, int]]:
+    return get_scanner().redact(text)
@@ -1,3 +1,4 @@
+import copy
 import json
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -528,3 +529,49 @@ def phenotype_validation_review(
         mode=mode,
     )
     return _model_dump(output)
+
+
+def packed_validation_schema(output_schema: Dict[str, Any]) -> Dict[str, Any]:
+    # Output schema for several Keeper cases reviewed in one LLM call: the single-case
+    # object gains a case_id and is wrapped in a "reviews" array.
+    item = copy.deepcopy(output_schema) if isinstance(output_schema, dict) else {}
+    item.pop("$schema", None)
+    item.pop("title", None)
+    properties = dict(item.get("properties") or {})
+    properties = {"case_id": {"type": "string"}, **properties}
+    item["properties"] = properties
+    item["required"] = ["case_id"] + [key for key in item.get("required") or [] if key != "case_id"]
+    return {
+        "title": "phenotype_validation_review_packed_output",
+        "type": "object",
+        "properties": {"reviews": {"type": "array", "items": item}},
+        "required": ["reviews"],
+        "additionalProperties": False,
+    }
+
+
+def split_validation_reviews(
+    disease_name: str,
+    llm_result: Optional[Dict[str, Any]],
+    case_ids: List[str],
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    # Splits a packed review back per case. A case is only accepted when it appears
+    # exactly once with a valid label; everything else is returned as failed so the
+    # caller can retry it on its own.
+    wanted = [str(case_id) for case_id in case_ids]
+    entries: Dict[str, List[Dict[str, Any]]] = {}
+    reviews = llm_result.get("reviews") if isinstance(llm_result, dict) else None
+    if isinstance(reviews, list):
+        for entry in reviews:
+            if isinstance(entry, dict) and entry.get("case_id") is not None:
+                entries.setdefault(str(entry["case_id"]), []).append(entry)
+
+    accepted: Dict[str, Dict[str, Any]] = {}
+    failed: List[str] = []
+    for case_id in wanted:
+        found = entries.get(case_id) or []
+        if len(found) != 1 or found[0].get("label") not in ("yes", "no", "unknown"):
+            failed.append(case_id)
+            continue
+        accepted[case_id] = phenotype_validation_review(disease_name=disease_name, llm_result=found[0])
+    return accepted, failed
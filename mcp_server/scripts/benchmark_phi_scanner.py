@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+from study_agent_core.phi import PHI_PATTERNS, phi_detected, redact_phi
+
+# Per-category passes, the way keeper sanitization worked before the combined scanner.
+_LEGACY = [(re.compile(pattern), replacement) for _, pattern, replacement in PHI_PATTERNS]
+_LEGACY_DETECT = [re.compile(pattern) for name, pattern, _ in PHI_PATTERNS if name not in ("zip", "day")]
+
+_WORDS = [
+    "Aspirin 81 MG Oral Tablet",
+    "Type 2 diabetes mellitus",
+    "Hemoglobin A1c/Hemoglobin.total in Blood",
+    "(day -12)",
+    "(Day 3)",
+    "Colonoscopy",
+    "Essential hypertension",
+    "Metformin hydrochloride 500 MG",
+    "Gastrointestinal hemorrhage",
+    "201826",
+    "Esophagogastroduodenoscopy",
+]
+_PHI = ["jane.doe@example.org", "2019-04-02", "04/02/2019", "+1 617 555 0199", "10.1.2.3", "https://ehr.example/p/1", "02139"]
+
+_FIELDS = [
+    "presentation",
+    "priorDisease",
+    "symptoms",
+    "comorbidities",
+    "priorDrugs",
+    "priorTreatmentProcedures",
+    "diagnosticProcedures",
+    "measurements",
+    "alternativeDiagnosis",
+    "afterDisease",
+    "afterDrugs",
+    "afterTreatmentProcedures",
+]
+
+
+def _legacy_redact(text: str) -> str:
+    for pattern, replacement in _LEGACY:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _legacy_detect(text: str) -> bool:
+    return any(pattern.search(text) for pattern in _LEGACY_DETECT)
+
+
+def _make_row(rng: random.Random, field_chars: int, phi_rate: float) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"age": rng.randint(18, 90), "gender": rng.choice(["Male", "Female"])}
+    for field in _FIELDS:
+        parts: List[str] = []
+        size = 0
+        while size < field_chars:
+            token = rng.choice(_PHI) if rng.random() < phi_rate else rng.choice(_WORDS)
+            parts.append(token)
+            size += len(token) + 2
+        row[field] = "; ".join(parts)
+    return row
+
+
+def _time(label: str, fn: Callable[[str], Any], texts: List[str], repeat: int) -> float:
+    total_bytes = sum(len(text) for text in texts)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    mb_per_s = total_bytes / best / 1e6
+    print(f"{label:<22} {best * 1000:9.1f} ms  {len(texts) / best:10.0f} texts/s  {mb_per_s:7.1f} MB/s")
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the single-pass PHI scanner against per-pattern passes.")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--field-chars", type=int, default=4000, help="Approximate characters per text field.")
+    parser.add_argument("--phi-rate", type=float, default=0.01, help="Fraction of tokens that look like PHI.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = [_make_row(rng, args.field_chars, args.phi_rate) for _ in range(args.rows)]
+    fields = [str(row[field]) for row in rows for field in _FIELDS]
+    documents = [json.dumps(row, ensure_ascii=True) for row in rows]
+    print(
+        f"rows={args.rows} fields={len(fields)} "
+        f"field_bytes={sum(len(text) for text in fields)} row_json_bytes={sum(len(doc) for doc in documents)}"
+    )
+
+    mismatches = sum(1 for doc in documents if _legacy_detect(doc) != phi_detected(doc))
+    print(f"detect mismatches vs legacy: {mismatches}")
+
+    legacy = _time("redact legacy", _legacy_redact, fields, args.repeat)
+    single = _time("redact single-pass", redact_phi, fields, args.repeat)
+    print(f"redact speedup: {legacy / single:.2f}x")
+
+    clean = [_legacy_redact(doc) for doc in documents]
+    legacy = _time("detect clean legacy", _legacy_detect, clean, args.repeat)
+    single = _time("detect clean single", phi_detected, clean, args.repeat)
+    print(f"detect (no PHI) speedup: {legacy / single:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,12 +9,50 @@ import math
 import os
 import pickle
 import re
-from typing import Any, Dict, Iterable, List, Optional, Tuple
-
-from study_agent_mcp.retrieval.index import EmbeddingClient, _hash_text, _tokenize
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from study_agent_mcp.retrieval.definitions import packed_paths, write_packed_definitions
+from study_agent_mcp.retrieval.index import (
+    CONCEPT_FLAG_DESCENDANTS,
+    CONCEPT_FLAG_EXCLUDED,
+    CONCEPT_FLAG_INCLUDED,
+    EmbeddingClient,
+    _hash_text,
+    _tokenize,
+)
 
 _SPLIT_RE = re.compile(r"[;,|\\s]+")
 
+PROGRESS_PREFIX = "PROGRESS "
+_STAGE_WEIGHTS: List[Tuple[str, float]] = [
+    ("load_metadata", 5.0),
+    ("load_definitions", 10.0),
+    ("write_definitions", 10.0),
+    ("catalog", 5.0),
+    ("sparse", 10.0),
+    ("concepts", 5.0),
+    ("dense", 50.0),
+    ("meta", 5.0),
+]
+
+
+class _Progress:
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def __call__(self, stage: str, fraction: float = 0.0, **fields: Any) -> None:
+        if not self.enabled:
+            return
+        percent = 0.0
+        for name, weight in _STAGE_WEIGHTS:
+            if name == stage:
+                percent += weight * max(0.0, min(1.0, fraction))
+                break
+            percent += weight
+        event = {"stage": stage, "percent": round(percent, 1)}
+        event.update(fields)
+        print(PROGRESS_PREFIX + json.dumps(event, ensure_ascii=True), flush=True)
+
 
 def _parse_int(value: Any) -> Optional[int]:
     try:
@@ -163,6 +201,50 @@ def _build_sparse_index(catalog: List[Dict[str, Any]], k1: float = 1.5, b: float
     }
 
 
+def _concept_flags(definition: Optional[Dict[str, Any]]) -> Dict[int, int]:
+    if not isinstance(definition, dict):
+        return {}
+    concept_sets = definition.get("ConceptSets")
+    if concept_sets is None and isinstance(definition.get("expression"), dict):
+        concept_sets = definition["expression"].get("ConceptSets")
+    flags: Dict[int, int] = {}
+    for concept_set in concept_sets or []:
+        if not isinstance(concept_set, dict):
+            continue
+        expression = concept_set.get("expression") or {}
+        for item in expression.get("items") or []:
+            if not isinstance(item, dict):
+                continue
+            concept = item.get("concept") or {}
+            concept_id = _parse_int(concept.get("CONCEPT_ID") or concept.get("conceptId"))
+            if concept_id is None:
+                continue
+            value = CONCEPT_FLAG_EXCLUDED if item.get("isExcluded") else CONCEPT_FLAG_INCLUDED
+            if item.get("includeDescendants"):
+                value |= CONCEPT_FLAG_DESCENDANTS
+            flags[concept_id] = flags.get(concept_id, 0) | value
+    return flags
+
+
+def _build_concept_index(
+    catalog: List[Dict[str, Any]],
+    definitions: Dict[int, Dict[str, Any]],
+) -> Dict[str, Any]:
+    postings: Dict[int, List[Tuple[int, int]]] = {}
+    doc_concept_counts: List[int] = []
+    for idx, row in enumerate(catalog):
+        cohort_id = row.get("cohortId")
+        flags = _concept_flags(definitions.get(cohort_id) if cohort_id is not None else None)
+        doc_concept_counts.append(len(flags))
+        for concept_id, value in flags.items():
+            postings.setdefault(concept_id, []).append((idx, value))
+    return {
+        "postings": postings,
+        "doc_concept_counts": doc_concept_counts,
+        "doc_count": len(catalog),
+    }
+
+
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
@@ -192,6 +274,7 @@ def _build_dense_index(
     cache_path: str,
     batch_size: int = 64,
     require_dense: bool = False,
+    on_batch: Optional[Callable[[int, int], None]] = None,
 ) -> Dict[str, Any]:
     try:
         import numpy as np  # type: ignore
@@ -221,13 +304,18 @@ def _build_dense_index(
             texts.append(text)
 
     if texts:
-        for i in range(0, len(texts), batch_size):
+        batches_total = (len(texts) + batch_size - 1) // batch_size
+        if on_batch is not None:
+            on_batch(0, batches_total)
+        for batch_no, i in enumerate(range(0, len(texts), batch_size), start=1):
             batch = texts[i : i + batch_size]
             vectors = embed_client.embed_texts(batch)
             if len(vectors) != len(batch):
                 raise RuntimeError("Embedding batch size mismatch.")
             for text, vec in zip(batch, vectors):
                 cache[_hash_text(text)] = vec
+            if on_batch is not None:
+                on_batch(batch_no, batches_total)
 
     # Rebuild embeddings list in catalog order
     embeddings = []
@@ -258,11 +346,31 @@ def main() -> int:
     parser.add_argument("--build-dense", action="store_true", help="Build dense FAISS index.")
     parser.add_argument("--require-dense", action="store_true", help="Fail if dense index cannot be built.")
     parser.add_argument("--batch-size", type=int, default=64, help="Embedding batch size.")
+    parser.add_argument(
+        "--definitions-format",
+        choices=["files", "packed", "both"],
+        default="files",
+        help="Write definitions as definitions/*.json files, a packed definitions.pack store, or both.",
+    )
+    parser.add_argument(
+        "--compress-definitions",
+        action="store_true",
+        help="zlib-compress each record in the packed definitions store.",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help=f"Print machine-readable '{PROGRESS_PREFIX.strip()} {{json}}' lines to stdout.",
+    )
     args = parser.parse_args()
+    progress = _Progress(args.progress)
 
+    progress("load_metadata")
     metadata_rows = _load_metadata(args.metadata_csv)
+    progress("load_definitions")
     definitions = _load_definitions(args.definitions_dir)
 
+    progress("write_definitions")
     catalog: List[Dict[str, Any]] = []
     for row in metadata_rows:
         cohort_id = _parse_int(row.get("cohortId"))
@@ -271,20 +379,40 @@ def main() -> int:
 
     _ensure_dir(args.output_dir)
     definitions_out = os.path.join(args.output_dir, "definitions")
-    if args.definitions_dir:
+    definitions_info: Dict[str, Any] = {"format": args.definitions_format, "count": len(definitions)}
+    if args.definitions_dir and args.definitions_format in ("files", "both"):
         _ensure_dir(definitions_out)
         for cohort_id, data in definitions.items():
             path = os.path.join(definitions_out, f"{cohort_id}.json")
             with open(path, "w", encoding="utf-8") as handle:
                 json.dump(data, handle, ensure_ascii=True)
+    if args.definitions_dir and args.definitions_format in ("packed", "both"):
+        definitions_info["packed"] = write_packed_definitions(
+            args.output_dir,
+            definitions,
+            compress=args.compress_definitions,
+        )
+    elif args.definitions_dir:
+        # A stale pack would shadow the freshly written definitions/*.json files.
+        for path in packed_paths(args.output_dir).values():
+            if os.path.exists(path):
+                os.remove(path)
 
+    progress("catalog")
     catalog_path = os.path.join(args.output_dir, "catalog.jsonl")
     _write_catalog(catalog_path, catalog)
 
+    progress("sparse")
     sparse_index = _build_sparse_index(catalog)
     with open(os.path.join(args.output_dir, "sparse_index.pkl"), "wb") as handle:
         pickle.dump(sparse_index, handle)
 
+    progress("concepts")
+    concept_index = _build_concept_index(catalog, definitions)
+    with open(os.path.join(args.output_dir, "concept_index.pkl"), "wb") as handle:
+        pickle.dump(concept_index, handle)
+
+    progress("dense")
     dense_info = {"status": "skipped"}
     if args.build_dense:
         embed_url = os.getenv("EMBED_URL", "http://localhost:3000/ollama/api/embed")
@@ -298,8 +426,15 @@ def main() -> int:
             cache_path=os.path.join(args.output_dir, "embedding_cache.pkl"),
             batch_size=args.batch_size,
             require_dense=args.require_dense,
+            on_batch=lambda done, total: progress(
+                "dense",
+                fraction=done / total if total else 1.0,
+                batches_done=done,
+                batches_total=total,
+            ),
         )
 
+    progress("meta")
     meta = {
         "built_at": dt.datetime.utcnow().isoformat() + "Z",
         "catalog_count": len(catalog),
@@ -309,12 +444,18 @@ def main() -> int:
             "k1": sparse_index["k1"],
             "b": sparse_index["b"],
         },
+        "definitions": definitions_info,
+        "concepts": {
+            "concept_count": len(concept_index["postings"]),
+            "cohorts_with_concepts": sum(1 for count in concept_index["doc_concept_counts"] if count),
+        },
         "embedding_model": os.getenv("EMBED_MODEL", "qwen3-embedding:4b"),
         "embedding_url": os.getenv("EMBED_URL", "http://localhost:3000/ollama/api/embed"),
     }
     with open(os.path.join(args.output_dir, "meta.json"), "w", encoding="utf-8") as handle:
         json.dump(meta, handle, ensure_ascii=True, indent=2)
 
+    progress("done")
     return 0
 
 
@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+from .definitions import PackedDefinitionStore, write_packed_definitions
 from .index import PhenotypeIndex, get_default_index, index_status
 
-__all__ = ["PhenotypeIndex", "get_default_index", "index_status"]
+__all__ = [
+    "PackedDefinitionStore",
+    "PhenotypeIndex",
+    "get_default_index",
+    "index_status",
+    "write_packed_definitions",
+]
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PACK_FILENAME = "definitions.pack"
+OFFSETS_FILENAME = "definitions.offsets"
+
+_MAGIC = b"SADEFS1\x00"
+_HEADER = struct.Struct("<8sI")
+_RECORD = struct.Struct("<qQIB")
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+
+def packed_paths(index_dir: str) -> Dict[str, str]:
+    return {
+        "pack": os.path.join(index_dir, PACK_FILENAME),
+        "offsets": os.path.join(index_dir, OFFSETS_FILENAME),
+    }
+
+
+def write_packed_definitions(
+    index_dir: str,
+    definitions: Dict[int, Dict[str, Any]],
+    compress: bool = False,
+) -> Dict[str, Any]:
+    # A running server may have the current pack mapped, so both files are written
+    # beside it and swapped in with os.replace, the offset table last.
+    paths = packed_paths(index_dir)
+    pack_tmp = paths["pack"] + ".tmp"
+    offsets_tmp = paths["offsets"] + ".tmp"
+    records: List[Tuple[int, int, int, int]] = []
+    offset = 0
+    raw_bytes = 0
+    try:
+        with open(pack_tmp, "wb") as handle:
+            for cohort_id in sorted(definitions):
+                blob = json.dumps(definitions[cohort_id], ensure_ascii=True).encode("utf-8")
+                raw_bytes += len(blob)
+                codec = CODEC_RAW
+                if compress:
+                    blob = zlib.compress(blob, 6)
+                    codec = CODEC_ZLIB
+                handle.write(blob)
+                records.append((int(cohort_id), offset, len(blob), codec))
+                offset += len(blob)
+        with open(offsets_tmp, "wb") as handle:
+            handle.write(_HEADER.pack(_MAGIC, len(records)))
+            for record in records:
+                handle.write(_RECORD.pack(*record))
+        os.replace(pack_tmp, paths["pack"])
+        os.replace(offsets_tmp, paths["offsets"])
+    finally:
+        for path in (pack_tmp, offsets_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+    return {
+        "count": len(records),
+        "compressed": compress,
+        "raw_bytes": raw_bytes,
+        "packed_bytes": offset,
+    }
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_offsets(path: str) -> Dict[int, Tuple[int, int, int]]:
+    with open(path, "rb") as handle:
+        header = handle.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError(f"Packed definitions offset table truncated: {path}")
+        magic, count = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise ValueError(f"Packed definitions offset table has unknown format: {path}")
+        body = handle.read(_RECORD.size * count)
+    if len(body) != _RECORD.size * count:
+        raise ValueError(f"Packed definitions offset table truncated: {path}")
+    offsets: Dict[int, Tuple[int, int, int]] = {}
+    for cohort_id, offset, length, codec in _RECORD.iter_unpack(body):
+        offsets[cohort_id] = (offset, length, codec)
+    return offsets
+
+
+class PackedDefinitionStore:
+    # The offset table and the mapped pack are read together and swapped as one
+    # snapshot, so a reader never pairs offsets from one build with bytes from another.
+    def __init__(self, index_dir: str) -> None:
+        paths = packed_paths(index_dir)
+        self.pack_path = paths["pack"]
+        self.offsets_path = paths["offsets"]
+        self._lock = Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._snapshot: Tuple[Dict[int, Tuple[int, int, int]], Optional[mmap.mmap]] = ({}, None)
+        self._open()
+
+    @classmethod
+    def exists(cls, index_dir: str) -> bool:
+        paths = packed_paths(index_dir)
+        return os.path.exists(paths["pack"]) and os.path.exists(paths["offsets"])
+
+    def __contains__(self, cohort_id: object) -> bool:
+        return cohort_id in self._snapshot[0]
+
+    def __len__(self) -> int:
+        return len(self._snapshot[0])
+
+    def cohort_ids(self) -> Iterable[int]:
+        return self._snapshot[0].keys()
+
+    def refresh(self) -> bool:
+        # Reopens the pack if a reindex has replaced it since it was opened. The old
+        # mapping is not closed here: readers may still hold it, and it is unmapped
+        # once they drop it.
+        if _file_signature(self.offsets_path) == self._signature:
+            return False
+        with self._lock:
+            if _file_signature(self.offsets_path) == self._signature:
+                return False
+            self._open()
+        return True
+
+    def read_bytes(self, cohort_id: int) -> Optional[bytes]:
+        offsets, buffer = self._snapshot
+        entry = offsets.get(int(cohort_id))
+        if entry is None:
+            return None
+        offset, length, codec = entry
+        if length == 0:
+            return b""
+        if buffer is None:
+            raise ValueError(f"Packed definitions file is empty: {self.pack_path}")
+        blob = buffer[offset : offset + length]
+        if codec == CODEC_ZLIB:
+            blob = zlib.decompress(blob)
+        elif codec != CODEC_RAW:
+            raise ValueError(f"Unknown definition codec {codec} for cohortId {cohort_id}")
+        return blob
+
+    def get(self, cohort_id: int) -> Optional[Dict[str, Any]]:
+        blob = self.read_bytes(cohort_id)
+        if blob is None:
+            return None
+        return json.loads(blob.decode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            _, buffer = self._snapshot
+            self._snapshot = ({}, None)
+            if buffer is not None:
+                buffer.close()
+
+    def _open(self) -> None:
+        # The offset table is replaced after the pack, so once it has changed the pack
+        # it describes is already in place.
+        signature = _file_signature(self.offsets_path)
+        offsets = _read_offsets(self.offsets_path)
+        buffer = None
+        with open(self.pack_path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size:
+                buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._snapshot = (offsets, buffer)
+        self._signature = signature
+
+
+class DefinitionCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = Lock()
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._generation: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, generation: str, cohort_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if generation != self._generation:
+                self.misses += 1
+                return None
+            entry = self._entries.get(cohort_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cohort_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, generation: str, cohort_id: int, definition: Dict[str, Any], size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                self._reset(generation)
+            previous = self._entries.pop(cohort_id, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[cohort_id] = (definition, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def invalidate(self, generation: Optional[str] = None) -> None:
+        with self._lock:
+            self._reset(generation)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generation": self._generation,
+            }
+
+    def _reset(self, generation: Optional[str]) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self._generation = generation
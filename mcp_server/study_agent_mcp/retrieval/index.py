@@ -1,30 +1,42 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import math
 import os
 import pickle
 import re
+import threading
 import urllib.error
 import urllib.request
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
+from .definitions import DefinitionCache, PackedDefinitionStore, packed_paths
+
 _TOKEN_RE = re.compile(r"[a-z0-9]+")
 
+CONCEPT_FLAG_INCLUDED = 1
+CONCEPT_FLAG_EXCLUDED = 2
+CONCEPT_FLAG_DESCENDANTS = 4
+
 
 def _tokenize(text: str) -> List[str]:
     return _TOKEN_RE.findall((text or "").lower())
 
 
 def _index_paths(index_dir: str) -> Dict[str, str]:
+    packed = packed_paths(index_dir)
     return {
         "catalog": os.path.join(index_dir, "catalog.jsonl"),
         "sparse": os.path.join(index_dir, "sparse_index.pkl"),
+        "concepts": os.path.join(index_dir, "concept_index.pkl"),
         "dense": os.path.join(index_dir, "dense.index"),
         "meta": os.path.join(index_dir, "meta.json"),
         "definitions": os.path.join(index_dir, "definitions"),
+        "definitions_pack": packed["pack"],
+        "definitions_offsets": packed["offsets"],
     }
 
 
@@ -39,6 +51,17 @@ def _hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+def _non_empty(queries: List[str]) -> List[str]:
+    return [query for query in queries if query]
+
+
+def _mtime_token(path: str) -> str:
+    try:
+        return str(os.path.getmtime(path))
+    except OSError:
+        return ""
+
+
 def _load_catalog(path: str) -> List[Dict[str, Any]]:
     catalog: List[Dict[str, Any]] = []
     if not os.path.exists(path):
@@ -70,14 +93,87 @@ class EmbeddingClient:
                 raw = response.read().decode("utf-8")
         except urllib.error.URLError as exc:
             raise RuntimeError(f"Embedding request failed: {exc}") from exc
-        data = json.loads(raw)
-        if isinstance(data.get("embeddings"), list):
-            return data["embeddings"]
-        if isinstance(data.get("data"), list):
-            return [row.get("embedding") for row in data["data"]]
-        if isinstance(data.get("embedding"), list):
-            return [data["embedding"]]
-        raise RuntimeError("Embedding response missing embeddings payload.")
+        return _parse_embeddings(json.loads(raw))
+
+
+def _parse_embeddings(data: Dict[str, Any]) -> List[List[float]]:
+    if isinstance(data.get("embeddings"), list):
+        return data["embeddings"]
+    if isinstance(data.get("data"), list):
+        return [row.get("embedding") for row in data["data"]]
+    if isinstance(data.get("embedding"), list):
+        return [data["embedding"]]
+    raise RuntimeError("Embedding response missing embeddings payload.")
+
+
+class AsyncEmbeddingClient:
+    def __init__(
+        self,
+        url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        timeout: int = 30,
+        max_concurrency: int = 8,
+        max_connections: int = 16,
+        http2: Optional[bool] = None,
+        transport: Optional[Any] = None,
+    ) -> None:
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_connections = max(1, int(max_connections))
+        if http2 is None:
+            try:
+                import h2  # type: ignore  # noqa: F401
+            except ImportError:
+                http2 = False
+            else:
+                http2 = True
+        self.http2 = http2
+        self._transport = transport
+        self._client: Optional[Any] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        import httpx
+
+        client = self._ensure_client()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            try:
+                response = await client.post(self.url, json={"model": self.model, "input": texts})
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                raise RuntimeError(f"Embedding request failed: {exc}") from exc
+        return _parse_embeddings(response.json())
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+
+    def _ensure_client(self) -> Any:
+        if self._client is None:
+            import httpx
+
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                http2=self.http2,
+                transport=self._transport,
+            )
+        return self._client
 
 
 class PhenotypeIndex:
@@ -87,15 +183,23 @@ class PhenotypeIndex:
         embedding_client: Optional[EmbeddingClient] = None,
         allow_dense: bool = True,
         allow_sparse: bool = True,
+        async_embedding_client: Optional[AsyncEmbeddingClient] = None,
     ) -> None:
         self.index_dir = index_dir
         self.embedding_client = embedding_client
+        self.async_embedding_client = async_embedding_client
         self.allow_dense = allow_dense
         self.allow_sparse = allow_sparse
 
         self._catalog: List[Dict[str, Any]] = []
         self._catalog_by_id: Dict[int, Dict[str, Any]] = {}
         self._sparse: Optional[Dict[str, Any]] = None
+        self._concepts: Optional[Dict[str, Any]] = None
+        self._definitions: Optional[PackedDefinitionStore] = None
+        self._definition_cache = DefinitionCache(
+            int(os.getenv("PHENOTYPE_DEFINITION_CACHE_BYTES", str(64 * 1024 * 1024)))
+        )
+        self._generation = ""
         self._dense: Optional[Any] = None
         self._meta: Dict[str, Any] = {}
 
@@ -107,6 +211,14 @@ class PhenotypeIndex:
     def meta(self) -> Dict[str, Any]:
         return self._meta
 
+    @property
+    def generation(self) -> str:
+        return self._generation
+
+    @property
+    def definition_cache(self) -> DefinitionCache:
+        return self._definition_cache
+
     def load(self) -> "PhenotypeIndex":
         paths = _index_paths(self.index_dir)
         self._catalog = _load_catalog(paths["catalog"])
@@ -121,6 +233,19 @@ class PhenotypeIndex:
         if self.allow_sparse and os.path.exists(paths["sparse"]):
             with open(paths["sparse"], "rb") as handle:
                 self._sparse = pickle.load(handle)
+        if os.path.exists(paths["concepts"]):
+            with open(paths["concepts"], "rb") as handle:
+                self._concepts = pickle.load(handle)
+        if not PackedDefinitionStore.exists(self.index_dir):
+            if self._definitions is not None:
+                self._definitions.close()
+            self._definitions = None
+        elif self._definitions is None:
+            self._definitions = PackedDefinitionStore(self.index_dir)
+        else:
+            self._definitions.refresh()
+        self._generation = self._meta.get("built_at") or _mtime_token(paths["catalog"])
+        self._definition_cache.invalidate(self._generation)
         if self.allow_dense and os.path.exists(paths["dense"]):
             try:
                 import faiss  # type: ignore
@@ -144,6 +269,32 @@ class PhenotypeIndex:
             "logic_features": row.get("logic_features") or {},
         }
 
+    def fetch_definition(self, cohort_id: int) -> Optional[Dict[str, Any]]:
+        # Cached definitions are shared between callers and must not be mutated.
+        cohort_id = int(cohort_id)
+        cached = self._definition_cache.get(self._generation, cohort_id)
+        if cached is not None:
+            return cached
+        raw = self._read_definition_bytes(cohort_id)
+        if raw is None:
+            return None
+        definition = json.loads(raw.decode("utf-8"))
+        self._definition_cache.put(self._generation, cohort_id, definition, len(raw))
+        return definition
+
+    def fetch_definitions(self, cohort_ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+        unique_ids = dict.fromkeys(int(cid) for cid in cohort_ids)
+        return {cid: self.fetch_definition(cid) for cid in unique_ids}
+
+    def _read_definition_bytes(self, cohort_id: int) -> Optional[bytes]:
+        if self._definitions is not None and cohort_id in self._definitions:
+            return self._definitions.read_bytes(cohort_id)
+        path = os.path.join(_index_paths(self.index_dir)["definitions"], f"{cohort_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as handle:
+            return handle.read()
+
     def search(
         self,
         query: str,
@@ -157,10 +308,96 @@ class PhenotypeIndex:
         if not query:
             return []
         dense_scores: Dict[int, float] = {}
-        sparse_scores: Dict[int, float] = {}
-
         if self._dense is not None and self.embedding_client is not None:
             dense_scores = self._dense_search(query, dense_k)
+        return self._rank(query, dense_scores, top_k, offset, sparse_k, dense_weight, sparse_weight)
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 20,
+        offset: int = 0,
+        dense_k: int = 100,
+        sparse_k: int = 100,
+        dense_weight: float = 0.9,
+        sparse_weight: float = 0.1,
+    ) -> List[List[Dict[str, Any]]]:
+        vectors: Dict[int, List[float]] = {}
+        texts = _non_empty(queries)
+        if self._dense is not None and self.embedding_client is not None and texts:
+            vectors = self._embed_queries(queries, self.embedding_client.embed_texts(texts))
+        return self._rank_many(queries, vectors, top_k, offset, dense_k, sparse_k, dense_weight, sparse_weight)
+
+    async def search_async(self, query: str, **kwargs: Any) -> List[Dict[str, Any]]:
+        results = await self.search_many_async([query], **kwargs)
+        return results[0]
+
+    async def search_many_async(
+        self,
+        queries: List[str],
+        top_k: int = 20,
+        offset: int = 0,
+        dense_k: int = 100,
+        sparse_k: int = 100,
+        dense_weight: float = 0.9,
+        sparse_weight: float = 0.1,
+    ) -> List[List[Dict[str, Any]]]:
+        # The embedding request is awaited on the event loop; an index built with only a
+        # blocking client sends it from a thread instead.
+        vectors: Dict[int, List[float]] = {}
+        texts = _non_empty(queries)
+        if self._dense is not None and texts:
+            embedded: Optional[List[List[float]]] = None
+            if self.async_embedding_client is not None:
+                embedded = await self.async_embedding_client.embed_texts(texts)
+            elif self.embedding_client is not None:
+                embedded = await asyncio.to_thread(self.embedding_client.embed_texts, texts)
+            if embedded is not None:
+                vectors = self._embed_queries(queries, embedded)
+        # Ranking (FAISS and BM25) is CPU work; keep it off the event loop.
+        return await asyncio.to_thread(
+            self._rank_many, queries, vectors, top_k, offset, dense_k, sparse_k, dense_weight, sparse_weight
+        )
+
+    def _embed_queries(self, queries: List[str], embedded: List[List[float]]) -> Dict[int, List[float]]:
+        positions = [idx for idx, query in enumerate(queries) if query]
+        if len(embedded) != len(positions):
+            raise RuntimeError("Embedding batch size mismatch.")
+        return dict(zip(positions, embedded))
+
+    def _rank_many(
+        self,
+        queries: List[str],
+        vectors: Dict[int, List[float]],
+        top_k: int,
+        offset: int,
+        dense_k: int,
+        sparse_k: int,
+        dense_weight: float,
+        sparse_weight: float,
+    ) -> List[List[Dict[str, Any]]]:
+        results: List[List[Dict[str, Any]]] = []
+        for idx, query in enumerate(queries):
+            if not query:
+                results.append([])
+                continue
+            dense_scores: Dict[int, float] = {}
+            if idx in vectors:
+                dense_scores = self._dense_search_vector(vectors[idx], dense_k)
+            results.append(self._rank(query, dense_scores, top_k, offset, sparse_k, dense_weight, sparse_weight))
+        return results
+
+    def _rank(
+        self,
+        query: str,
+        dense_scores: Dict[int, float],
+        top_k: int,
+        offset: int,
+        sparse_k: int,
+        dense_weight: float,
+        sparse_weight: float,
+    ) -> List[Dict[str, Any]]:
+        sparse_scores: Dict[int, float] = {}
         if self._sparse is not None:
             sparse_scores = self._sparse_search(query, sparse_k)
 
@@ -192,6 +429,68 @@ class PhenotypeIndex:
             )
         return results
 
+    def search_by_concepts(
+        self,
+        concept_ids: List[int],
+        top_k: int = 20,
+        offset: int = 0,
+        include_excluded: bool = False,
+    ) -> List[Dict[str, Any]]:
+        if self._concepts is None or not concept_ids:
+            return []
+        postings = self._concepts["postings"]
+        doc_concept_counts = self._concepts["doc_concept_counts"]
+        doc_count = self._concepts.get("doc_count") or len(doc_concept_counts)
+        query_ids = list(dict.fromkeys(int(cid) for cid in concept_ids))
+
+        weights: Dict[int, float] = {}
+        for concept_id in query_ids:
+            df = len(postings.get(concept_id) or [])
+            weights[concept_id] = math.log((doc_count - df + 0.5) / (df + 0.5) + 1.0)
+        total_weight = sum(weights.values())
+        if total_weight <= 0.0:
+            return []
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[Dict[str, Any]]] = {}
+        for concept_id in query_ids:
+            for doc_id, flags in postings.get(concept_id) or []:
+                if not flags & CONCEPT_FLAG_INCLUDED and not include_excluded:
+                    continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + weights[concept_id]
+                matched.setdefault(doc_id, []).append(
+                    {
+                        "conceptId": concept_id,
+                        "includeDescendants": bool(flags & CONCEPT_FLAG_DESCENDANTS),
+                        "isExcluded": bool(flags & CONCEPT_FLAG_EXCLUDED),
+                    }
+                )
+
+        # Ties go to the cohort with fewer concepts, i.e. the more specific definition.
+        ranked_all = sorted(
+            scores.items(),
+            key=lambda item: (-item[1], doc_concept_counts[item[0]]),
+        )
+        offset = max(0, int(offset or 0))
+        ranked = ranked_all[offset : offset + top_k]
+        results: List[Dict[str, Any]] = []
+        for doc_id, score in ranked:
+            if doc_id < 0 or doc_id >= len(self._catalog):
+                continue
+            row = self._catalog[doc_id]
+            results.append(
+                {
+                    "cohortId": row.get("cohortId"),
+                    "name": row.get("name"),
+                    "short_description": row.get("short_description"),
+                    "score": score / total_weight,
+                    "matched_count": len(matched[doc_id]),
+                    "concept_count": doc_concept_counts[doc_id],
+                    "matched_concepts": matched[doc_id],
+                }
+            )
+        return results
+
     def list_similar(self, cohort_id: int, top_k: int = 10) -> List[Dict[str, Any]]:
         if self._dense is None:
             return []
@@ -238,14 +537,19 @@ class PhenotypeIndex:
     def _dense_search(self, query: str, top_k: int) -> Dict[int, float]:
         if self.embedding_client is None:
             return {}
+        vectors = self.embedding_client.embed_texts([query])
+        if not vectors:
+            return {}
+        return self._dense_search_vector(vectors[0], top_k)
+
+    def _dense_search_vector(self, embedding: List[float], top_k: int) -> Dict[int, float]:
+        if self._dense is None:
+            return {}
         try:
             import numpy as np  # type: ignore
         except ImportError:
             return {}
-        vectors = self.embedding_client.embed_texts([query])
-        if not vectors:
-            return {}
-        vector = np.array(vectors[0], dtype="float32").reshape(1, -1)
+        vector = np.array(embedding, dtype="float32").reshape(1, -1)
         norm = np.linalg.norm(vector, axis=1, keepdims=True)
         norm[norm == 0.0] = 1.0
         vector = vector / norm
@@ -285,6 +589,8 @@ class PhenotypeIndex:
 
 
 _DEFAULT_INDEX: Optional[PhenotypeIndex] = None
+_DEFAULT_INDEX_TOKEN = ""
+_DEFAULT_INDEX_LOCK = threading.Lock()
 
 
 def _default_index_dir() -> tuple[str, str]:
@@ -319,9 +625,32 @@ def index_status(index_dir: Optional[str] = None) -> Dict[str, Any]:
     }
 
 
+def _generation_token(index_dir: str) -> str:
+    paths = _index_paths(index_dir)
+    return f"{_mtime_token(paths['meta'])}:{_mtime_token(paths['catalog'])}"
+
+
 def get_default_index() -> PhenotypeIndex:
-    global _DEFAULT_INDEX
-    if _DEFAULT_INDEX is None:
+    # Reloaded once meta.json (written last by the builder) or the catalog changes, so a
+    # reindex into the served directory takes effect without a restart. Requests that
+    # already hold the previous index finish on it.
+    global _DEFAULT_INDEX, _DEFAULT_INDEX_TOKEN
+    index = _DEFAULT_INDEX
+    if index is not None and _generation_token(index.index_dir) == _DEFAULT_INDEX_TOKEN:
+        return index
+    with _DEFAULT_INDEX_LOCK:
+        index = _DEFAULT_INDEX
+        if index is not None:
+            token = _generation_token(index.index_dir)
+            if token == _DEFAULT_INDEX_TOKEN:
+                return index
+            _DEFAULT_INDEX = PhenotypeIndex(
+                index_dir=index.index_dir,
+                embedding_client=index.embedding_client,
+                async_embedding_client=index.async_embedding_client,
+            ).load()
+            _DEFAULT_INDEX_TOKEN = token
+            return _DEFAULT_INDEX
         status = index_status()
         if not status["exists"]:
             raise RuntimeError(f"Phenotype index directory not found: {status['index_dir']}")
@@ -332,5 +661,17 @@ def get_default_index() -> PhenotypeIndex:
         embed_model = os.getenv("EMBED_MODEL", "qwen3-embedding:4b")
         api_key = os.getenv("EMBED_API_KEY")
         embedding_client = EmbeddingClient(url=embed_url, model=embed_model, api_key=api_key)
-        _DEFAULT_INDEX = PhenotypeIndex(index_dir=status["index_dir"], embedding_client=embedding_client).load()
-    return _DEFAULT_INDEX
+        async_embedding_client = AsyncEmbeddingClient(
+            url=embed_url,
+            model=embed_model,
+            api_key=api_key,
+            max_concurrency=int(os.getenv("EMBED_MAX_CONCURRENCY", "8")),
+        )
+        token = _generation_token(status["index_dir"])
+        _DEFAULT_INDEX = PhenotypeIndex(
+            index_dir=status["index_dir"],
+            embedding_client=embedding_client,
+            async_embedding_client=async_embedding_client,
+        ).load()
+        _DEFAULT_INDEX_TOKEN = token
+        return _DEFAULT_INDEX
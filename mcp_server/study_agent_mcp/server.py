@@ -7,7 +7,7 @@ from study_agent_mcp.tools import register_all
 from study_agent_mcp.retrieval import index_status
 
 mcp = FastMCP("study-agent")
-register_all(mcp)
+register_all(mcp, offload=os.getenv("MCP_TOOL_OFFLOAD", "1") == "1")
 
 def _log(level: str, message: str) -> None:
     configured = os.getenv("MCP_LOG_LEVEL", "INFO").upper()
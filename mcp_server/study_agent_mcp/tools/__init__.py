@@ -12,6 +12,7 @@ TOOL_MODULES: list[str] = [
     "study_agent_mcp.tools.phenotype_improvements",
     "study_agent_mcp.tools.phenotype_intent_split",
     "study_agent_mcp.tools.phenotype_search",
+    "study_agent_mcp.tools.phenotype_search_by_concepts",
     "study_agent_mcp.tools.phenotype_fetch_summary",
     "study_agent_mcp.tools.phenotype_fetch_definition",
     "study_agent_mcp.tools.phenotype_list_similar",
@@ -28,7 +29,11 @@ def iter_tool_modules() -> Iterable[str]:
     return TOOL_MODULES
 
 
-def register_all(mcp: object) -> None:
+def register_all(mcp: object, offload: bool = False) -> None:
+    if offload:
+        from ._executor import OffloadingRegistrar
+
+        mcp = OffloadingRegistrar(mcp)
     for module_name in iter_tool_modules():
         module = importlib.import_module(module_name)
         register = getattr(module, "register", None)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib
+import inspect
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ._log import log_debug
+
+# Where each tool runs and how many calls may be in flight at once.
+# "thread": bounded thread pool (blocking I/O such as embeddings, file reads, subprocesses).
+# "process": process pool for CPU-heavy tools; falls back to "thread" unless
+#            MCP_PROCESS_POOL_WORKERS > 0.
+# "inline": run on the event loop (only for trivial tools).
+# Tools not listed use DEFAULT_TOOL_EXECUTION. Coroutine tools (phenotype_search,
+# phenotype_search_many) already run on the event loop and are not wrapped.
+DEFAULT_TOOL_EXECUTION: Dict[str, Any] = {"pool": "thread", "max_concurrency": None}
+TOOL_EXECUTION: Dict[str, Dict[str, Any]] = {
+    "phenotype_search_by_concepts": {"pool": "thread", "max_concurrency": 8},
+    "phenotype_fetch_definition": {"pool": "thread", "max_concurrency": 16},
+    "phenotype_fetch_definitions": {"pool": "thread", "max_concurrency": 4},
+    "phenotype_list_similar": {"pool": "thread", "max_concurrency": 8},
+    "phenotype_reindex": {"pool": "thread", "max_concurrency": 1},
+    "keeper_sanitize_row": {"pool": "process", "max_concurrency": 8},
+    "keeper_sanitize_rows": {"pool": "process", "max_concurrency": 2},
+    "cohort_lint": {"pool": "process", "max_concurrency": 4},
+    "propose_concept_set_diff": {"pool": "process", "max_concurrency": 4},
+}
+
+
+class _ToolCollector:
+    def __init__(self) -> None:
+        self.tools: Dict[str, Callable[..., Any]] = {}
+
+    def tool(self, name: Optional[str] = None, **_: Any):
+        def decorator(fn):
+            self.tools[name or fn.__name__] = fn
+            return fn
+
+        return decorator
+
+
+_WORKER_TOOLS: Dict[str, Callable[..., Any]] = {}
+
+
+def _invoke_in_worker(module_name: str, tool_name: str, kwargs: Dict[str, Any]) -> Any:
+    # Tool functions are closures created by register(mcp), so a worker process
+    # re-runs the module's register() once to look them up by name.
+    fn = _WORKER_TOOLS.get(tool_name)
+    if fn is None:
+        collector = _ToolCollector()
+        importlib.import_module(module_name).register(collector)
+        _WORKER_TOOLS.update(collector.tools)
+        fn = _WORKER_TOOLS[tool_name]
+    return fn(**kwargs)
+
+
+class OffloadingRegistrar:
+    # Stands in for the MCP server during register_all so sync tools run on
+    # worker pools instead of blocking the event loop.
+    def __init__(
+        self,
+        mcp: object,
+        config: Optional[Dict[str, Dict[str, Any]]] = None,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+    ) -> None:
+        self._mcp = mcp
+        self._config = TOOL_EXECUTION if config is None else config
+        if thread_workers is None:
+            thread_workers = int(os.getenv("MCP_THREAD_POOL_WORKERS", "16"))
+        if process_workers is None:
+            process_workers = int(os.getenv("MCP_PROCESS_POOL_WORKERS", "0"))
+        self._thread_workers = max(1, thread_workers)
+        self._process_workers = max(0, process_workers)
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._mcp, item)
+
+    def tool(self, name: Optional[str] = None, **kwargs: Any):
+        register = self._mcp.tool(name=name, **kwargs)
+
+        def decorator(fn):
+            return register(self.wrap(name or fn.__name__, fn))
+
+        return decorator
+
+    def settings_for(self, name: str) -> Dict[str, Any]:
+        settings = dict(DEFAULT_TOOL_EXECUTION)
+        settings.update(self._config.get(name) or {})
+        if settings["pool"] == "process" and self._process_workers <= 0:
+            settings["pool"] = "thread"
+        return settings
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(fn):
+            return fn
+        settings = self.settings_for(name)
+        pool = settings["pool"]
+        if pool == "inline":
+            return fn
+        max_concurrency = settings.get("max_concurrency")
+        module_name = fn.__module__
+
+        @functools.wraps(fn)
+        async def offloaded(**kwargs: Any) -> Any:
+            limit = self._limit(name, max_concurrency)
+            if limit is None:
+                return await self._submit(pool, module_name, name, fn, kwargs)
+            async with limit:
+                return await self._submit(pool, module_name, name, fn, kwargs)
+
+        return offloaded
+
+    def shutdown(self) -> None:
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def _limit(self, name: str, max_concurrency: Optional[int]) -> Optional[asyncio.Semaphore]:
+        if not max_concurrency:
+            return None
+        limit = self._limits.get(name)
+        if limit is None:
+            limit = asyncio.Semaphore(int(max_concurrency))
+            self._limits[name] = limit
+        return limit
+
+    async def _submit(
+        self,
+        pool: str,
+        module_name: str,
+        name: str,
+        fn: Callable[..., Any],
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        log_debug("tool offload", tool=name, pool=pool)
+        if pool == "process":
+            call = functools.partial(_invoke_in_worker, module_name, name, kwargs)
+            return await loop.run_in_executor(self._executor("process"), call)
+        return await loop.run_in_executor(self._executor("thread"), functools.partial(fn, **kwargs))
+
+    def _executor(self, pool: str) -> Executor:
+        if pool == "process":
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self._thread_workers,
+                thread_name_prefix="mcp-tool",
+            )
+        return self._thread_pool
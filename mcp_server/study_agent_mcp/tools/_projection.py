@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_SKIP = object()
+
+Pointer = List[str]
+
+
+def _parse_pointer(text: str) -> Pointer:
+    if text in ("", "/"):
+        return []
+    if not text.startswith("/"):
+        text = "/" + text
+    return [token.replace("~1", "/").replace("~0", "~") for token in text[1:].split("/")]
+
+
+def parse_fields(fields: Optional[List[str]]) -> Tuple[Optional[List[Pointer]], List[Pointer]]:
+    # "/a/b" includes a subtree, "-/a/b" excludes it; "*" matches any key or list index.
+    includes: List[Pointer] = []
+    excludes: List[Pointer] = []
+    for field in fields or []:
+        text = str(field).strip()
+        if not text:
+            continue
+        if text.startswith("-"):
+            pointer = _parse_pointer(text[1:])
+            if pointer:
+                excludes.append(pointer)
+            continue
+        includes.append(_parse_pointer(text))
+    if not includes or any(not pointer for pointer in includes):
+        return None, excludes
+    return includes, excludes
+
+
+def item_fields(fields: Optional[List[str]]) -> List[str]:
+    # Rewrite per-item pointers so they apply to every element of a list.
+    rewritten = []
+    for field in fields or []:
+        text = str(field).strip()
+        if not text:
+            continue
+        sign = ""
+        if text.startswith("-"):
+            sign, text = "-", text[1:]
+        if not text.startswith("/"):
+            text = "/" + text
+        rewritten.append(f"{sign}/*{text.rstrip('/')}")
+    return rewritten
+
+
+def _json_size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, ensure_ascii=True, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return len(json.dumps(str(value), ensure_ascii=True))
+
+
+def _descend(
+    includes: Optional[List[Pointer]],
+    excludes: List[Pointer],
+    key: str,
+) -> Tuple[Any, List[Pointer]]:
+    child_excludes = [pointer[1:] for pointer in excludes if pointer[0] in ("*", key)]
+    if any(not pointer for pointer in child_excludes):
+        return _SKIP, []
+    if includes is None:
+        return None, child_excludes
+    matches = [pointer[1:] for pointer in includes if pointer[0] in ("*", key)]
+    if not matches:
+        return _SKIP, []
+    if any(not pointer for pointer in matches):
+        return None, child_excludes
+    return matches, child_excludes
+
+
+class Projector:
+    def __init__(
+        self,
+        fields: Optional[List[str]] = None,
+        max_bytes: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        max_list: Optional[int] = None,
+        max_keys: Optional[int] = None,
+    ) -> None:
+        self._includes, self._excludes = parse_fields(fields)
+        self.max_bytes = int(max_bytes) if max_bytes is not None else None
+        self.max_depth = max_depth
+        self.max_list = max_list
+        self.max_keys = max_keys
+        self.used = 0
+        self.truncated = False
+
+    def project(self, obj: Any) -> Any:
+        value = self._walk(obj, self._includes, self._excludes, 0, 0)
+        return None if value is _SKIP else value
+
+    def info(self) -> Dict[str, Any]:
+        return {"bytes": self.used, "max_bytes": self.max_bytes, "truncated": self.truncated}
+
+    def _take(self, size: int) -> bool:
+        if self.truncated:
+            return False
+        if self.max_bytes is not None and self.used + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self.used += size
+        return True
+
+    def _walk(
+        self,
+        obj: Any,
+        includes: Optional[List[Pointer]],
+        excludes: List[Pointer],
+        depth: int,
+        overhead: int,
+    ) -> Any:
+        if self.max_depth is not None and depth >= self.max_depth:
+            obj = "..."
+        if isinstance(obj, dict):
+            if not self._take(overhead + 2):
+                return _SKIP
+            out: Dict[Any, Any] = {}
+            for idx, (key, value) in enumerate(obj.items()):
+                if self.max_keys is not None and idx >= self.max_keys:
+                    break
+                child_includes, child_excludes = _descend(includes, excludes, str(key))
+                if child_includes is _SKIP:
+                    continue
+                child_overhead = _json_size(str(key)) + 1 + (1 if out else 0)
+                child = self._walk(value, child_includes, child_excludes, depth + 1, child_overhead)
+                if child is _SKIP:
+                    if self.truncated:
+                        break
+                    continue
+                out[key] = child
+            return out
+        if isinstance(obj, (list, tuple)):
+            if not self._take(overhead + 2):
+                return _SKIP
+            items: List[Any] = []
+            for idx, value in enumerate(obj):
+                if self.max_list is not None and idx >= self.max_list:
+                    break
+                child_includes, child_excludes = _descend(includes, excludes, str(idx))
+                if child_includes is _SKIP:
+                    continue
+                child = self._walk(value, child_includes, child_excludes, depth + 1, 1 if items else 0)
+                if child is _SKIP:
+                    if self.truncated:
+                        break
+                    continue
+                items.append(child)
+            return items
+        if includes is not None:
+            return _SKIP
+        if not self._take(overhead + _json_size(obj)):
+            return _SKIP
+        return obj
+
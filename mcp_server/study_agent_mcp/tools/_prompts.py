@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._log import log_debug
+
+# Every prompt bundle served by the MCP tools: task -> (overview, spec, output schema),
+# relative to the prompts directory.
+PROMPT_BUNDLES: Dict[str, Tuple[str, str, str]] = {
+    "phenotype_recommendations": (
+        "phenotype/overview_phenotype.md",
+        "phenotype/spec_phenotype_recommendations.md",
+        "phenotype/output_schema_phenotype_recommendations.json",
+    ),
+    "phenotype_improvements": (
+        "phenotype/overview_phenotype.md",
+        "phenotype/spec_phenotype_improvements.md",
+        "phenotype/output_schema_phenotype_improvements.json",
+    ),
+    "phenotype_intent_split": (
+        "phenotype/overview_phenotype_intent_split.md",
+        "phenotype/spec_phenotype_intent_split.md",
+        "phenotype/output_schema_phenotype_intent_split.json",
+    ),
+    "phenotype_recommendation_advice": (
+        "phenotype/overview_phenotype_advice.md",
+        "phenotype/spec_phenotype_recommendation_advice.md",
+        "phenotype/output_schema_phenotype_recommendation_advice.json",
+    ),
+    "cohort_critique_general_design": (
+        "lint/overview_lint.md",
+        "lint/spec_cohort_critique.md",
+        "lint/output_schema_cohort_critique_general_design.json",
+    ),
+    "concept_sets_review": (
+        "lint/overview_lint.md",
+        "lint/spec_concept_sets_review.md",
+        "lint/output_schema_concept_sets_review.json",
+    ),
+    "phenotype_validation_review": (
+        "keeper/overview_keeper.md",
+        "keeper/spec_phenotype_validation_review.md",
+        "keeper/output_schema_phenotype_validation_review.json",
+    ),
+}
+
+
+def default_prompt_dir() -> str:
+    env_dir = os.getenv("MCP_PROMPT_DIR")
+    if env_dir:
+        return os.path.abspath(env_dir)
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "prompts"))
+
+
+def _signature(paths: List[str]) -> Tuple[Any, ...]:
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamps.append(None)
+            continue
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {key: payload[key] for key in ("overview", "spec", "output_schema")},
+        ensure_ascii=True,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PromptRegistry:
+    def __init__(
+        self,
+        prompt_dir: Optional[str] = None,
+        bundles: Optional[Dict[str, Tuple[str, str, str]]] = None,
+    ) -> None:
+        self.prompt_dir = prompt_dir or default_prompt_dir()
+        self.bundles = PROMPT_BUNDLES if bundles is None else bundles
+        self._lock = Lock()
+        self._entries: Dict[str, Tuple[Tuple[Any, ...], Dict[str, Any]]] = {}
+        self._loaded = False
+
+    def tasks(self) -> List[str]:
+        return sorted(self.bundles)
+
+    def get(self, task: str) -> Dict[str, Any]:
+        if task not in self.bundles:
+            return {"error": f"unsupported task {task}"}
+        with self._lock:
+            if not self._loaded:
+                self._load_all()
+            paths = self._paths(task)
+            signature = _signature(paths)
+            entry = self._entries.get(task)
+            if entry is None or entry[0] != signature:
+                log_debug("prompt bundle reload", task=task)
+                entry = (signature, self._load(task, paths))
+                self._entries[task] = entry
+        # Callers attach _meta and per-call fields and may edit the schema, so hand out
+        # a deep copy.
+        return copy.deepcopy(entry[1])
+
+    def hashes(self) -> Dict[str, str]:
+        return {task: self.get(task).get("content_hash", "") for task in self.tasks()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loaded = False
+
+    def _load_all(self) -> None:
+        for task in self.bundles:
+            paths = self._paths(task)
+            try:
+                self._entries[task] = (_signature(paths), self._load(task, paths))
+            except (OSError, ValueError):
+                # Surface the error on first get() of that task instead of failing every bundle.
+                self._entries.pop(task, None)
+        self._loaded = True
+
+    def _paths(self, task: str) -> List[str]:
+        return [os.path.join(self.prompt_dir, *relative.split("/")) for relative in self.bundles[task]]
+
+    def _load(self, task: str, paths: List[str]) -> Dict[str, Any]:
+        overview_path, spec_path, schema_path = paths
+        payload: Dict[str, Any] = {
+            "task": task,
+            "overview": _load_text(overview_path),
+            "spec": _load_text(spec_path),
+            "output_schema": _load_json(schema_path),
+        }
+        payload["content_hash"] = content_hash(payload)
+        return payload
+
+
+def _load_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as handle:
+        return handle.read().strip()
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+_DEFAULT_REGISTRY: Optional[PromptRegistry] = None
+_DEFAULT_LOCK = Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    global _DEFAULT_REGISTRY
+    if _DEFAULT_REGISTRY is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT_REGISTRY is None:
+                _DEFAULT_REGISTRY = PromptRegistry()
+    return _DEFAULT_REGISTRY
+
+
+def load_prompt_bundle(task: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+    payload = get_prompt_registry().get(task)
+    if if_none_match and payload.get("content_hash") == if_none_match:
+        # The caller already holds this exact bundle; skip re-sending the text.
+        return {"task": task, "not_modified": True, "content_hash": payload["content_hash"]}
+    return payload
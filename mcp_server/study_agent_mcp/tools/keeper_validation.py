@@ -1,21 +1,15 @@
 from __future__ import annotations
 
+import csv
 import json
 import os
-import re
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from ._common import with_meta
-
-_CACHE: Dict[str, Dict[str, Any]] = {}
+from study_agent_core.phi import DETECT_CATEGORIES, get_scanner
+from study_agent_core.tools import packed_validation_schema, split_validation_reviews
 
-_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-_URL_RE = re.compile(r"https?://\S+")
-_IP_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
-_PHONE_RE = re.compile(r"\b\+?\d{1,2}[\s.-]?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")
-_DATE_RE = re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}-\d{1,2}-\d{1,2}\b")
-_ZIP_RE = re.compile(r"\b\d{5}(?:-\d{4})?\b")
-_DAY_RE = re.compile(r"\(day[^)]*\)", re.IGNORECASE)
+from ._common import with_meta
+from ._prompts import load_prompt_bundle
 
 _PHI_KEYS = {
     "name",
@@ -57,18 +51,7 @@ _PHI_KEYS = {
 }
 
 
-def _prompt_dir() -> str:
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "prompts", "keeper"))
-
-
-def _load_text(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as handle:
-        return handle.read().strip()
-
-
-def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as handle:
-        return json.load(handle)
+_MAX_BATCH_ROWS = 1000
 
 
 def _bucket_age(age: Any) -> str:
@@ -82,31 +65,6 @@ def _bucket_age(age: Any) -> str:
     return f"{bucket}-{bucket+4}"
 
 
-def _sanitize_text(text: str) -> str:
-    if not text:
-        return "None"
-    text = _EMAIL_RE.sub("[REDACTED_EMAIL]", text)
-    text = _URL_RE.sub("[REDACTED_URL]", text)
-    text = _IP_RE.sub("[REDACTED_IP]", text)
-    text = _PHONE_RE.sub("[REDACTED_PHONE]", text)
-    text = _DATE_RE.sub("[REDACTED_DATE]", text)
-    text = _ZIP_RE.sub("[REDACTED_ZIP]", text)
-    text = _DAY_RE.sub("(prior)", text)
-    return text
-
-
-def _phi_detected(text: str) -> bool:
-    if not text:
-        return False
-    return bool(
-        _EMAIL_RE.search(text)
-        or _URL_RE.search(text)
-        or _IP_RE.search(text)
-        or _PHONE_RE.search(text)
-        or _DATE_RE.search(text)
-    )
-
-
 def _has_phi_keys(row: Dict[str, Any]) -> bool:
     for key, value in row.items():
         if key is None:
@@ -117,25 +75,163 @@ def _has_phi_keys(row: Dict[str, Any]) -> bool:
     return False
 
 
-def _sanitize_row(row: Dict[str, Any]) -> Dict[str, Any]:
-    sanitized = {}
-    sanitized["age_bucket"] = _bucket_age(row.get("age"))
-    sanitized["gender"] = _sanitize_text(str(row.get("gender") or "unknown"))
-    sanitized["visit_context"] = _sanitize_text(str(row.get("visitContext") or "unknown"))
-    sanitized["presentation"] = _sanitize_text(str(row.get("presentation") or "None"))
-    sanitized["prior_disease"] = _sanitize_text(str(row.get("priorDisease") or "None"))
-    sanitized["symptoms"] = _sanitize_text(str(row.get("symptoms") or "None"))
-    sanitized["comorbidities"] = _sanitize_text(str(row.get("comorbidities") or "None"))
-    sanitized["prior_drugs"] = _sanitize_text(str(row.get("priorDrugs") or "None"))
-    sanitized["prior_treatments"] = _sanitize_text(str(row.get("priorTreatmentProcedures") or "None"))
-    sanitized["diagnostic_procedures"] = _sanitize_text(str(row.get("diagnosticProcedures") or "None"))
-    sanitized["measurements"] = _sanitize_text(str(row.get("measurements") or "None"))
-    sanitized["alternative_diagnosis"] = _sanitize_text(str(row.get("alternativeDiagnosis") or "None"))
-    sanitized["after_disease"] = _sanitize_text(str(row.get("afterDisease") or "None"))
-    sanitized["after_drugs"] = _sanitize_text(str(row.get("afterDrugs") or "None"))
-    sanitized["after_treatments"] = _sanitize_text(str(row.get("afterTreatmentProcedures") or "None"))
-    sanitized["death"] = _sanitize_text(str(row.get("death") or "None"))
-    return sanitized
+# sanitized key -> (keeper row key, default when missing)
+_TEXT_FIELDS = [
+    ("gender", "gender", "unknown"),
+    ("visit_context", "visitContext", "unknown"),
+    ("presentation", "presentation", "None"),
+    ("prior_disease", "priorDisease", "None"),
+    ("symptoms", "symptoms", "None"),
+    ("comorbidities", "comorbidities", "None"),
+    ("prior_drugs", "priorDrugs", "None"),
+    ("prior_treatments", "priorTreatmentProcedures", "None"),
+    ("diagnostic_procedures", "diagnosticProcedures", "None"),
+    ("measurements", "measurements", "None"),
+    ("alternative_diagnosis", "alternativeDiagnosis", "None"),
+    ("after_disease", "afterDisease", "None"),
+    ("after_drugs", "afterDrugs", "None"),
+    ("after_treatments", "afterTreatmentProcedures", "None"),
+    ("death", "death", "None"),
+]
+
+
+def _merge_counts(target: Dict[str, int], counts: Dict[str, int]) -> None:
+    for category, count in counts.items():
+        target[category] = target.get(category, 0) + count
+
+
+def _sanitize_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    # Each stage (raw PHI check, field redaction, post-sanitize check) is one scanner
+    # pass over the whole chunk rather than one pass per field per row.
+    detector = get_scanner(DETECT_CATEGORIES)
+    results: List[Dict[str, Any]] = [{"status": "error", "error": "row must be a dict"} for _ in rows]
+    valid = [idx for idx, row in enumerate(rows) if isinstance(row, dict)]
+    if not valid:
+        return results
+
+    raw_hits = detector.scan_many([json.dumps(rows[idx], ensure_ascii=True, default=str) for idx in valid])
+    texts = [str(rows[idx].get(in_key) or default) for idx in valid for _, in_key, default in _TEXT_FIELDS]
+    redacted, counts = get_scanner().redact_many(texts)
+
+    width = len(_TEXT_FIELDS)
+    sanitized_rows: List[Dict[str, Any]] = []
+    reports: List[Dict[str, Any]] = []
+    for pos, idx in enumerate(valid):
+        row = rows[idx]
+        sanitized = {"age_bucket": _bucket_age(row.get("age"))}
+        redactions: Dict[str, int] = {}
+        for field_pos, (out_key, _, _) in enumerate(_TEXT_FIELDS):
+            sanitized[out_key] = redacted[pos * width + field_pos]
+            _merge_counts(redactions, counts[pos * width + field_pos])
+        sanitized_rows.append(sanitized)
+        reports.append(
+            {
+                "phi_keys_present": _has_phi_keys(row),
+                "phi_patterns_present": bool(raw_hits[pos]),
+                "redactions": redactions,
+            }
+        )
+
+    post_hits = detector.scan_many([json.dumps(row, ensure_ascii=True) for row in sanitized_rows])
+    for pos, idx in enumerate(valid):
+        if post_hits[pos]:
+            results[idx] = {"status": "phi_detected", "error": "phi_detected"}
+            continue
+        results[idx] = {
+            "status": "ok",
+            "sanitized_row": sanitized_rows[pos],
+            "redaction_report": reports[pos],
+        }
+    return results
+
+
+def _read_rows(path: str, cursor: Optional[str], limit: int) -> Tuple[List[Any], int, Optional[str]]:
+    # Cursor is "<byte offset>:<row index>" into a streamed .csv/.jsonl file. A .json
+    # array has to be parsed whole, so it is only accepted if it fits in one call.
+    position, start_index = 0, 0
+    if cursor:
+        head, _, tail = str(cursor).partition(":")
+        position, start_index = int(head), int(tail or 0)
+    lower = path.lower()
+    if lower.endswith(".json"):
+        if cursor:
+            raise ValueError(".json files cannot be paged; use .csv or .jsonl")
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            raise ValueError("JSON file must contain an object or a list of objects")
+        if len(data) > limit:
+            raise ValueError(f".json files cannot be paged and hold more than {limit} rows; use .csv or .jsonl")
+        return data, 0, None
+
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        if lower.endswith(".csv"):
+            fieldnames = next(csv.reader(_lines(handle)), None) or []
+            if position:
+                handle.seek(position)
+            records: Iterator[Any] = csv.DictReader(_lines(handle), fieldnames=fieldnames)
+        elif lower.endswith((".jsonl", ".ndjson")):
+            handle.seek(position)
+            records = (json.loads(line) for line in _lines(handle) if line.strip())
+        else:
+            raise ValueError("path must end with .csv, .jsonl, .ndjson or .json")
+        chunk: List[Any] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= limit:
+                break
+        # Reading stops right after the last returned record, so tell() marks the next one.
+        end = handle.tell()
+        more = bool(handle.readline())
+    next_cursor = f"{end}:{start_index + len(chunk)}" if more and len(chunk) >= limit else None
+    return chunk, start_index, next_cursor
+
+
+def _path_denied(path: str) -> Optional[str]:
+    # Reading files from the MCP host is opt-in and limited to one directory tree.
+    root = os.getenv("KEEPER_ROWS_DIR")
+    if not root:
+        return "keeper_sanitize_rows path input is disabled. Set KEEPER_ROWS_DIR to enable."
+    root = os.path.realpath(root)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        return "path must be inside KEEPER_ROWS_DIR"
+    return None
+
+
+def _lines(handle: Any) -> Iterator[str]:
+    # readline() keeps tell() usable, unlike iterating the file object directly.
+    while True:
+        line = handle.readline()
+        if not line:
+            return
+        yield line
+
+
+def _aggregate(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "rows": len(results),
+        "ok": 0,
+        "phi_detected": 0,
+        "errors": 0,
+        "phi_keys_present": 0,
+        "phi_patterns_present": 0,
+        "redactions": {},
+    }
+    for result in results:
+        status = result.get("status")
+        if status == "ok":
+            report["ok"] += 1
+            row_report = result.get("redaction_report") or {}
+            report["phi_keys_present"] += int(bool(row_report.get("phi_keys_present")))
+            report["phi_patterns_present"] += int(bool(row_report.get("phi_patterns_present")))
+            _merge_counts(report["redactions"], row_report.get("redactions") or {})
+        elif status == "phi_detected":
+            report["phi_detected"] += 1
+        else:
+            report["errors"] += 1
+    return report
 
 
 def _build_prompt(disease_name: str, sanitized: Dict[str, Any]) -> str:
@@ -153,6 +249,15 @@ def _build_prompt(disease_name: str, sanitized: Dict[str, Any]) -> str:
     return "\n\n".join(lines)
 
 
+def _pack_cases(cases: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"CASE {case['case_id']}:\n{case['prompt']}" for case in cases)
+
+
+def _packed_schema() -> Dict[str, Any]:
+    bundle = load_prompt_bundle("phenotype_validation_review")
+    return packed_validation_schema(bundle.get("output_schema") or {})
+
+
 def _parse_label(text: str) -> str:
     if not text:
         return "unknown"
@@ -166,63 +271,108 @@ def _parse_label(text: str) -> str:
     return "unknown"
 
 
-def _load_bundle() -> Dict[str, Any]:
-    cached = _CACHE.get("phenotype_validation_review")
-    if cached is not None:
-        return cached
-    base = _prompt_dir()
-    overview = _load_text(os.path.join(base, "overview_keeper.md"))
-    spec = _load_text(os.path.join(base, "spec_phenotype_validation_review.md"))
-    schema = _load_json(os.path.join(base, "output_schema_phenotype_validation_review.json"))
-    payload = {
-        "task": "phenotype_validation_review",
-        "overview": overview,
-        "spec": spec,
-        "output_schema": schema,
-    }
-    _CACHE["phenotype_validation_review"] = payload
-    return payload
-
-
 def register(mcp: object) -> None:
     @mcp.tool(name="keeper_prompt_bundle")
-    def keeper_prompt_bundle_tool(disease_name: str) -> Dict[str, Any]:
-        payload = _load_bundle()
-        payload = dict(payload)
+    def keeper_prompt_bundle_tool(disease_name: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        payload = load_prompt_bundle("phenotype_validation_review", if_none_match=if_none_match)
         payload["disease_name"] = disease_name
+        if payload.get("not_modified"):
+            return with_meta(payload, "keeper_prompt_bundle")
         payload["system_prompt"] = (
             "Act as a medical doctor reviewing a patient's healthcare data captured during routine clinical care. "
             f"Write a brief clinical narrative and then determine whether the patient had {disease_name}. "
             "Remember that a diagnosis can be recorded as part of testing, and may not confirm disease. "
             "If evidence is insufficient, respond with label \"unknown\". "
+            # ACP's build_keeper_prompt rewords this sentence when it packs several cases.
             "Return JSON with label and rationale only."
         )
         return with_meta(payload, "keeper_prompt_bundle")
 
     @mcp.tool(name="keeper_sanitize_row")
     def keeper_sanitize_row_tool(row: Dict[str, Any]) -> Dict[str, Any]:
-        if not isinstance(row, dict):
-            return with_meta({"error": "row must be a dict"}, "keeper_sanitize_row")
-        redaction_report = {
-            "phi_keys_present": _has_phi_keys(row),
-            "phi_patterns_present": _phi_detected(json.dumps(row, ensure_ascii=True)),
-        }
-        sanitized = _sanitize_row(row)
-        sanitized_text = json.dumps(sanitized, ensure_ascii=True)
-        if _phi_detected(sanitized_text):
-            return with_meta({"error": "phi_detected"}, "keeper_sanitize_row")
+        result = _sanitize_rows([row])[0]
+        if result["status"] != "ok":
+            return with_meta({"error": result["error"]}, "keeper_sanitize_row")
         return with_meta(
-            {"sanitized_row": sanitized, "redaction_report": redaction_report},
+            {"sanitized_row": result["sanitized_row"], "redaction_report": result["redaction_report"]},
             "keeper_sanitize_row",
         )
 
+    @mcp.tool(name="keeper_sanitize_rows")
+    def keeper_sanitize_rows_tool(
+        rows: Optional[List[Dict[str, Any]]] = None,
+        path: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 200,
+        disease_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        limit = max(1, min(int(limit), _MAX_BATCH_ROWS))
+        if (rows is None) == (path is None):
+            return with_meta({"error": "provide exactly one of rows or path"}, "keeper_sanitize_rows")
+        try:
+            if path is not None:
+                denied = _path_denied(path)
+                if denied:
+                    return with_meta({"error": denied}, "keeper_sanitize_rows")
+                if not os.path.isfile(path):
+                    return with_meta({"error": f"file not found: {path}"}, "keeper_sanitize_rows")
+                chunk, start, next_cursor = _read_rows(path, cursor, limit)
+            else:
+                start = int(str(cursor).partition(":")[0]) if cursor else 0
+                chunk = list(rows or [])[start : start + limit]
+                end = start + len(chunk)
+                next_cursor = f"{end}:{end}" if end < len(rows or []) else None
+        except (OSError, ValueError, csv.Error) as exc:
+            return with_meta({"error": f"invalid keeper rows: {exc}"}, "keeper_sanitize_rows")
+
+        results = _sanitize_rows(chunk)
+        for offset, result in enumerate(results):
+            result["index"] = start + offset
+            if disease_name and result["status"] == "ok":
+                result["prompt"] = _build_prompt(disease_name, result["sanitized_row"])
+        payload = {
+            "results": results,
+            "report": _aggregate(results),
+            "next_cursor": next_cursor,
+        }
+        return with_meta(payload, "keeper_sanitize_rows")
+
     @mcp.tool(name="keeper_build_prompt")
-    def keeper_build_prompt_tool(disease_name: str, sanitized_row: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = _build_prompt(disease_name, sanitized_row)
-        return with_meta({"prompt": prompt}, "keeper_build_prompt")
+    def keeper_build_prompt_tool(
+        disease_name: str,
+        sanitized_row: Optional[Dict[str, Any]] = None,
+        sanitized_rows: Optional[List[Dict[str, Any]]] = None,
+        case_ids: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        if sanitized_rows is None:
+            if sanitized_row is None:
+                return with_meta({"error": "provide sanitized_row or sanitized_rows"}, "keeper_build_prompt")
+            prompt = _build_prompt(disease_name, sanitized_row)
+            return with_meta({"prompt": prompt}, "keeper_build_prompt")
+        # Packed mode: several cases share one prompt, each tagged with its case_id.
+        ids = [str(case_id) for case_id in case_ids] if case_ids else [str(idx) for idx in range(len(sanitized_rows))]
+        if len(ids) != len(sanitized_rows) or len(set(ids)) != len(ids):
+            return with_meta({"error": "case_ids must be unique and match sanitized_rows"}, "keeper_build_prompt")
+        cases = [{"case_id": case_id, "prompt": _build_prompt(disease_name, row)} for case_id, row in zip(ids, sanitized_rows)]
+        return with_meta(
+            {"prompt": _pack_cases(cases), "cases": cases, "case_ids": ids, "output_schema": _packed_schema()},
+            "keeper_build_prompt",
+        )
 
     @mcp.tool(name="keeper_parse_response")
-    def keeper_parse_response_tool(llm_output: Any) -> Dict[str, Any]:
+    def keeper_parse_response_tool(
+        llm_output: Any,
+        case_ids: Optional[List[str]] = None,
+        disease_name: str = "",
+    ) -> Dict[str, Any]:
+        if case_ids:
+            llm_result = llm_output if isinstance(llm_output, dict) else None
+            accepted, failed = split_validation_reviews(disease_name, llm_result, case_ids)
+            results = [
+                {"case_id": case_id, "label": review["label"], "rationale": review["rationale"]}
+                for case_id, review in accepted.items()
+            ]
+            return with_meta({"results": results, "failed_case_ids": failed}, "keeper_parse_response")
         label = "unknown"
         rationale = ""
         if isinstance(llm_output, dict):
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import json
-import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from study_agent_mcp.retrieval import get_default_index
 
 from ._common import with_meta
+from ._projection import Projector
+
+# Returned when max_bytes leaves no room for a definition at all.
+_BUDGET_EXHAUSTED = "max_bytes budget exhausted"
 
 
 def _truncate(obj: Any, depth: int = 0, max_depth: int = 4, max_list: int = 20, max_keys: int = 50) -> Any:
@@ -21,29 +24,85 @@ def _truncate(obj: Any, depth: int = 0, max_depth: int = 4, max_list: int = 20,
     return obj
 
 
+def _projector(truncate: bool, fields: Optional[List[str]], max_bytes: Optional[int]) -> Optional[Projector]:
+    if not fields and max_bytes is None:
+        return None
+    if truncate and not fields:
+        return Projector(max_bytes=max_bytes, max_depth=4, max_list=20, max_keys=50)
+    return Projector(fields=fields, max_bytes=max_bytes)
+
+
 def register(mcp: object) -> None:
     @mcp.tool(name="phenotype_fetch_definition")
     def phenotype_fetch_definition_tool(
         cohortId: int,
         truncate: bool = True,
+        fields: Optional[List[str]] = None,
+        max_bytes: Optional[int] = None,
     ) -> Dict[str, Any]:
         index = get_default_index()
-        definitions_dir = os.path.join(index.index_dir, "definitions")
-        path = os.path.join(definitions_dir, f"{int(cohortId)}.json")
-        if not os.path.exists(path):
+        try:
+            data = index.fetch_definition(int(cohortId))
+        except json.JSONDecodeError:
+            payload = {"error": f"definition JSON invalid for cohortId {cohortId}"}
+            return with_meta(payload, "phenotype_fetch_definition")
+        if data is None:
             payload = {"error": f"definition not found for cohortId {cohortId}"}
             return with_meta(payload, "phenotype_fetch_definition")
 
-        with open(path, "r", encoding="utf-8") as handle:
-            try:
-                data = json.load(handle)
-            except json.JSONDecodeError:
-                payload = {"error": f"definition JSON invalid for cohortId {cohortId}"}
-                return with_meta(payload, "phenotype_fetch_definition")
-
+        projector = _projector(truncate, fields, max_bytes)
+        if projector is not None:
+            projected = projector.project(data)
+            if projected is None:
+                payload = {"error": _BUDGET_EXHAUSTED, "projection": projector.info()}
+            else:
+                payload = {"definition": projected, "projection": projector.info()}
+            return with_meta(payload, "phenotype_fetch_definition")
         if truncate:
             data = _truncate(data)
         payload = {"definition": data}
         return with_meta(payload, "phenotype_fetch_definition")
 
+    @mcp.tool(name="phenotype_fetch_definitions")
+    def phenotype_fetch_definitions_tool(
+        cohortIds: List[int],
+        truncate: bool = True,
+        fields: Optional[List[str]] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        index = get_default_index()
+        projector = _projector(truncate, fields, max_bytes)
+        definitions = []
+        missing = []
+        for cohort_id in dict.fromkeys(int(cid) for cid in cohortIds or []):
+            try:
+                data = index.fetch_definition(cohort_id)
+            except json.JSONDecodeError:
+                definitions.append(
+                    {"cohortId": cohort_id, "error": f"definition JSON invalid for cohortId {cohort_id}"}
+                )
+                continue
+            if data is None:
+                missing.append(cohort_id)
+                definitions.append(
+                    {"cohortId": cohort_id, "error": f"definition not found for cohortId {cohort_id}"}
+                )
+                continue
+            if projector is not None:
+                data = projector.project(data)
+                if data is None:
+                    definitions.append({"cohortId": cohort_id, "error": _BUDGET_EXHAUSTED})
+                    continue
+            elif truncate:
+                data = _truncate(data)
+            definitions.append({"cohortId": cohort_id, "definition": data})
+        payload = {
+            "definitions": definitions,
+            "count": len(definitions),
+            "missing": missing,
+        }
+        if projector is not None:
+            payload["projection"] = projector.info()
+        return with_meta(payload, "phenotype_fetch_definitions")
+
     return None
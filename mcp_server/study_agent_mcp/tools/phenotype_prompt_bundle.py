@@ -1,63 +1,23 @@
 from __future__ import annotations
 
-import json
-import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from ._common import with_meta
+from ._prompts import load_prompt_bundle
 
+_TASKS = ("phenotype_recommendations", "phenotype_improvements", "cohort_critique_general_design")
 
-_CACHE: Dict[str, Dict[str, Any]] = {}
 
-
-def _prompt_dir() -> str:
-    base = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "prompts", "phenotype"))
-    return base
-
-
-def _load_text(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as handle:
-        return handle.read().strip()
-
-
-def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as handle:
-        return json.load(handle)
-
-
-def _load_bundle(task: str) -> Dict[str, Any]:
-    cached = _CACHE.get(task)
-    if cached is not None:
-        return cached
-    if task not in ("phenotype_recommendations", "phenotype_improvements", "cohort_critique_general_design"):
+def _load_bundle(task: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+    if task not in _TASKS:
         return {"error": f"unsupported task {task}"}
-    base = _prompt_dir()
-    if task == "cohort_critique_general_design":
-        overview = _load_text(os.path.join(os.path.dirname(base), "lint", "overview_lint.md"))
-        spec = _load_text(os.path.join(os.path.dirname(base), "lint", "spec_cohort_critique.md"))
-        schema = _load_json(os.path.join(os.path.dirname(base), "lint", "output_schema_cohort_critique_general_design.json"))
-    else:
-        overview = _load_text(os.path.join(base, "overview_phenotype.md"))
-    if task == "phenotype_improvements":
-        spec = _load_text(os.path.join(base, "spec_phenotype_improvements.md"))
-        schema = _load_json(os.path.join(base, "output_schema_phenotype_improvements.json"))
-    elif task == "phenotype_recommendations":
-        spec = _load_text(os.path.join(base, "spec_phenotype_recommendations.md"))
-        schema = _load_json(os.path.join(base, "output_schema_phenotype_recommendations.json"))
-    payload = {
-        "task": task,
-        "overview": overview,
-        "spec": spec,
-        "output_schema": schema,
-    }
-    _CACHE[task] = payload
-    return payload
+    return load_prompt_bundle(task, if_none_match=if_none_match)
 
 
 def register(mcp: object) -> None:
     @mcp.tool(name="phenotype_prompt_bundle")
-    def phenotype_prompt_bundle_tool(task: str) -> Dict[str, Any]:
-        payload = _load_bundle(task)
+    def phenotype_prompt_bundle_tool(task: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        payload = _load_bundle(task, if_none_match=if_none_match)
         return with_meta(payload, "phenotype_prompt_bundle")
 
     return None
@@ -1,12 +1,204 @@
 from __future__ import annotations
 
+import json
 import os
 import subprocess
 import sys
-from typing import Any, Dict, Optional
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
 
 from ._common import with_meta
 
+_PROGRESS_PREFIX = "PROGRESS "
+_TAIL_LINES = 200
+_MAX_FINISHED_JOBS = 20
+
+_LOCK = threading.Lock()
+_JOBS: Dict[str, "ReindexJob"] = {}
+_ACTIVE_BY_DIR: Dict[str, str] = {}
+
+
+@dataclass
+class ReindexJob:
+    job_id: str
+    output_dir: str
+    cmd: List[str]
+    status: str = "queued"
+    stage: str = "queued"
+    percent: float = 0.0
+    batches_done: int = 0
+    batches_total: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    returncode: Optional[int] = None
+    error: Optional[str] = None
+    manifest: Optional[Dict[str, Any]] = None
+    stdout_tail: Deque[str] = field(default_factory=lambda: deque(maxlen=_TAIL_LINES))
+    stderr_tail: Deque[str] = field(default_factory=lambda: deque(maxlen=_TAIL_LINES))
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at
+        eta = None
+        if self.status == "running" and 0.0 < self.percent < 100.0:
+            eta = round(elapsed * (100.0 - self.percent) / self.percent, 1)
+        elif self.status in ("ok", "error"):
+            eta = 0.0
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "percent": self.percent,
+            "embedding_batches": {"done": self.batches_done, "total": self.batches_total},
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta,
+            "output_dir": self.output_dir,
+            "returncode": self.returncode,
+            "error": self.error,
+            "manifest": self.manifest,
+            "stdout_tail": "\n".join(self.stdout_tail)[-4000:],
+            "stderr_tail": "\n".join(self.stderr_tail)[-4000:],
+        }
+
+
+def _script_path() -> str:
+    return os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "build_phenotype_index.py")
+    )
+
+
+def _apply_progress(job: ReindexJob, line: str) -> None:
+    try:
+        event = json.loads(line[len(_PROGRESS_PREFIX) :])
+    except json.JSONDecodeError:
+        return
+    if not isinstance(event, dict):
+        return
+    try:
+        stage = str(event.get("stage") or job.stage)
+        percent = float(event.get("percent") or job.percent)
+        batches_done = int(event.get("batches_done", job.batches_done))
+        batches_total = int(event.get("batches_total", job.batches_total))
+    except (TypeError, ValueError):
+        return
+    with _LOCK:
+        job.stage = stage
+        job.percent = percent
+        job.batches_done = batches_done
+        job.batches_total = batches_total
+
+
+def _read_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(output_dir, "meta.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _drain(stream: Any, sink: Deque[str]) -> None:
+    for line in stream:
+        sink.append(line.rstrip("\n"))
+
+
+def _run_job(job: ReindexJob) -> None:
+    try:
+        proc = subprocess.Popen(
+            job.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            bufsize=1,
+        )
+    except OSError as exc:
+        _finish(job, returncode=None, error=str(exc))
+        return
+    returncode: Optional[int] = None
+    error: Optional[str] = "build_failed"
+    try:
+        with _LOCK:
+            job.status = "running"
+        stderr_thread = threading.Thread(target=_drain, args=(proc.stderr, job.stderr_tail), daemon=True)
+        stderr_thread.start()
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            if line.startswith(_PROGRESS_PREFIX):
+                _apply_progress(job, line)
+            else:
+                job.stdout_tail.append(line)
+        returncode = proc.wait()
+        stderr_thread.join(timeout=5)
+        error = None if returncode == 0 else "build_failed"
+    except Exception as exc:
+        # A build nobody is watching must not keep writing into output_dir once a new
+        # reindex of it is allowed to start.
+        error = f"reindex_monitor_failed: {exc}"
+        proc.kill()
+        returncode = proc.wait()
+    finally:
+        # Always release output_dir, or later reindexes of it are refused forever.
+        _finish(job, returncode=returncode, error=error)
+
+
+def _finish(job: ReindexJob, returncode: Optional[int], error: Optional[str]) -> None:
+    manifest = _read_manifest(job.output_dir) if error is None else None
+    with _LOCK:
+        job.returncode = returncode
+        job.error = error
+        job.manifest = manifest
+        job.status = "ok" if error is None else "error"
+        if error is None:
+            job.stage = "done"
+            job.percent = 100.0
+        job.finished_at = time.time()
+        if _ACTIVE_BY_DIR.get(job.output_dir) == job.job_id:
+            del _ACTIVE_BY_DIR[job.output_dir]
+        _prune_finished()
+
+
+def _prune_finished() -> None:
+    finished = [job for job in _JOBS.values() if job.finished_at is not None]
+    finished.sort(key=lambda job: job.finished_at or 0.0)
+    for job in finished[:-_MAX_FINISHED_JOBS]:
+        _JOBS.pop(job.job_id, None)
+
+
+def start_reindex_job(output_dir: str, cmd: List[str]) -> Dict[str, Any]:
+    key = os.path.abspath(output_dir)
+    with _LOCK:
+        active_id = _ACTIVE_BY_DIR.get(key)
+        if active_id is not None:
+            return {
+                "error": "reindex_in_progress",
+                "job_id": active_id,
+                "output_dir": key,
+            }
+        job = ReindexJob(job_id=uuid.uuid4().hex, output_dir=key, cmd=cmd)
+        _JOBS[job.job_id] = job
+        _ACTIVE_BY_DIR[key] = job.job_id
+    thread = threading.Thread(target=_run_job, args=(job,), name=f"reindex-{job.job_id[:8]}", daemon=True)
+    thread.start()
+    return {"status": "started", "job_id": job.job_id, "output_dir": key}
+
+
+def reindex_job_status(job_id: Optional[str] = None) -> Dict[str, Any]:
+    with _LOCK:
+        if job_id:
+            job = _JOBS.get(job_id)
+            if job is None:
+                return {"error": f"unknown job_id {job_id}"}
+            return job.snapshot()
+        return {"jobs": [job.snapshot() for job in _JOBS.values()]}
+
 
 def register(mcp: object) -> None:
     @mcp.tool(name="phenotype_reindex")
@@ -22,18 +214,16 @@ def register(mcp: object) -> None:
             payload = {"error": "phenotype_reindex is disabled. Set PHENOTYPE_REINDEX_ALLOW=1 to enable."}
             return with_meta(payload, "phenotype_reindex")
 
-        script_path = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "build_phenotype_index.py")
-        )
         cmd = [
             sys.executable,
-            script_path,
+            _script_path(),
             "--metadata-csv",
             metadata_csv,
             "--output-dir",
             output_dir,
             "--batch-size",
             str(batch_size),
+            "--progress",
         ]
         if definitions_dir:
             cmd.extend(["--definitions-dir", definitions_dir])
@@ -42,13 +232,12 @@ def register(mcp: object) -> None:
         if require_dense:
             cmd.append("--require-dense")
 
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        payload = {
-            "status": "ok" if result.returncode == 0 else "error",
-            "returncode": result.returncode,
-            "stdout": result.stdout[-4000:],
-            "stderr": result.stderr[-4000:],
-        }
+        payload = start_reindex_job(output_dir, cmd)
         return with_meta(payload, "phenotype_reindex")
 
+    @mcp.tool(name="phenotype_reindex_status")
+    def phenotype_reindex_status_tool(job_id: Optional[str] = None) -> Dict[str, Any]:
+        payload = reindex_job_status(job_id)
+        return with_meta(payload, "phenotype_reindex_status")
+
     return None
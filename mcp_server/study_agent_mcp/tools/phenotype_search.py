@@ -1,18 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from study_agent_mcp.retrieval import get_default_index, index_status
 
 from ._common import with_meta
 from ._log import log_debug
+from ._projection import Projector, item_fields
 
 
 def register(mcp: object) -> None:
+    # Both search tools are coroutines: the query embedding is awaited on the server's
+    # event loop (index.search_async / search_many_async) instead of holding a pool thread.
     @mcp.tool(name="phenotype_search")
-    def phenotype_search_tool(
+    async def phenotype_search_tool(
         query: str,
         top_k: int = 20,
         offset: int = 0,
@@ -20,6 +24,8 @@ def register(mcp: object) -> None:
         sparse_k: int = 100,
         dense_weight: Optional[float] = None,
         sparse_weight: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+        max_bytes: Optional[int] = None,
     ) -> Dict[str, Any]:
         default_dense_weight = float(os.getenv("PHENOTYPE_DENSE_WEIGHT", "0.9"))
         default_sparse_weight = float(os.getenv("PHENOTYPE_SPARSE_WEIGHT", "0.1"))
@@ -38,7 +44,7 @@ def register(mcp: object) -> None:
         )
         try:
             t0 = time.time()
-            index = get_default_index()
+            index = await asyncio.to_thread(get_default_index)
             log_debug(
                 "phenotype_search index_loaded",
                 seconds=round(time.time() - t0, 3),
@@ -57,7 +63,7 @@ def register(mcp: object) -> None:
             )
         try:
             t1 = time.time()
-            results = index.search(
+            results = await index.search_async(
                 query=query,
                 top_k=top_k,
                 offset=offset,
@@ -79,6 +85,11 @@ def register(mcp: object) -> None:
                 },
                 "phenotype_search",
             )
+        projection = None
+        if fields or max_bytes is not None:
+            projector = Projector(fields=item_fields(fields), max_bytes=max_bytes)
+            results = projector.project(results) or []
+            projection = projector.info()
         payload = {
             "query": query,
             "results": results,
@@ -88,6 +99,78 @@ def register(mcp: object) -> None:
                 "sparse": sparse_weight,
             },
         }
+        if projection is not None:
+            payload["projection"] = projection
         return with_meta(payload, "phenotype_search")
 
+    @mcp.tool(name="phenotype_search_many")
+    async def phenotype_search_many_tool(
+        queries: List[str],
+        top_k: int = 20,
+        offset: int = 0,
+        dense_k: int = 100,
+        sparse_k: int = 100,
+        dense_weight: Optional[float] = None,
+        sparse_weight: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        # Several phenotype_search queries in one call: the queries are embedded in one
+        # batch and ranked against the same loaded index. max_bytes applies per query.
+        if dense_weight is None:
+            dense_weight = float(os.getenv("PHENOTYPE_DENSE_WEIGHT", "0.9"))
+        if sparse_weight is None:
+            sparse_weight = float(os.getenv("PHENOTYPE_SPARSE_WEIGHT", "0.1"))
+        queries = [str(query or "") for query in queries or []]
+        log_debug("phenotype_search_many start", queries=len(queries), top_k=top_k)
+        try:
+            index = await asyncio.to_thread(get_default_index)
+        except Exception as exc:
+            return with_meta(
+                {
+                    "error": "phenotype_index_unavailable",
+                    "details": str(exc),
+                    "index_status": index_status(),
+                },
+                "phenotype_search_many",
+            )
+        try:
+            t0 = time.time()
+            batches = await index.search_many_async(
+                queries=queries,
+                top_k=top_k,
+                offset=offset,
+                dense_k=dense_k,
+                sparse_k=sparse_k,
+                dense_weight=dense_weight,
+                sparse_weight=sparse_weight,
+            )
+            log_debug("phenotype_search_many done", seconds=round(time.time() - t0, 3))
+        except Exception as exc:
+            return with_meta(
+                {
+                    "error": "phenotype_search_failed",
+                    "details": str(exc),
+                },
+                "phenotype_search_many",
+            )
+        searches = []
+        for query, results in zip(queries, batches):
+            search: Dict[str, Any] = {"query": query}
+            if fields or max_bytes is not None:
+                projector = Projector(fields=item_fields(fields), max_bytes=max_bytes)
+                results = projector.project(results) or []
+                search["projection"] = projector.info()
+            search["results"] = results
+            search["count"] = len(results)
+            searches.append(search)
+        payload = {
+            "searches": searches,
+            "weights": {
+                "dense": dense_weight,
+                "sparse": sparse_weight,
+            },
+        }
+        return with_meta(payload, "phenotype_search_many")
+
     return None
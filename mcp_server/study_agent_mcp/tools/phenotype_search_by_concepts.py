@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List
+
+from study_agent_mcp.retrieval import get_default_index, index_status
+
+from ._common import with_meta
+from ._log import log_debug
+
+
+def register(mcp: object) -> None:
+    @mcp.tool(name="phenotype_search_by_concepts")
+    def phenotype_search_by_concepts_tool(
+        conceptIds: List[int],
+        top_k: int = 20,
+        offset: int = 0,
+        include_excluded: bool = False,
+    ) -> Dict[str, Any]:
+        log_debug(
+            "phenotype_search_by_concepts start",
+            concept_count=len(conceptIds or []),
+            top_k=top_k,
+            include_excluded=include_excluded,
+        )
+        try:
+            index = get_default_index()
+        except Exception as exc:
+            return with_meta(
+                {
+                    "error": "phenotype_index_unavailable",
+                    "details": str(exc),
+                    "index_status": index_status(),
+                },
+                "phenotype_search_by_concepts",
+            )
+        if getattr(index, "_concepts", None) is None:
+            return with_meta(
+                {
+                    "error": "concept_index_unavailable",
+                    "details": "Rebuild the phenotype index with --definitions-dir to create concept_index.pkl.",
+                },
+                "phenotype_search_by_concepts",
+            )
+        try:
+            t0 = time.time()
+            results = index.search_by_concepts(
+                concept_ids=[int(cid) for cid in conceptIds or []],
+                top_k=top_k,
+                offset=offset,
+                include_excluded=include_excluded,
+            )
+            log_debug(
+                "phenotype_search_by_concepts done",
+                seconds=round(time.time() - t0, 3),
+                result_count=len(results),
+            )
+        except Exception as exc:
+            return with_meta(
+                {
+                    "error": "phenotype_search_by_concepts_failed",
+                    "details": str(exc),
+                },
+                "phenotype_search_by_concepts",
+            )
+        payload = {
+            "conceptIds": [int(cid) for cid in conceptIds or []],
+            "results": results,
+            "count": len(results),
+        }
+        return with_meta(payload, "phenotype_search_by_concepts")
+
+    return None
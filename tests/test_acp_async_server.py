@@ -0,0 +1,187 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+import study_agent_acp.agent as agent_module
+from study_agent_acp import server as acp_server
+from study_agent_acp.agent import StudyAgent
+from study_agent_acp.async_server import AsyncACPServer, FlowLimiter, _parse_flow_limits
+from study_agent_mcp.tools import phenotype_intent_split
+
+
+class PromptMCPClient:
+    def __init__(self) -> None:
+        self.tools = {}
+        phenotype_intent_split.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        return self.tools[name](**arguments)
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = threading.Event()
+
+    def fake_llm(prompt, on_event=None):
+        gate.wait(5)
+        return {"plan": "p", "target_statement": "t", "outcome_statement": "o"}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    return gate
+
+
+def _start(limiter):
+    class Handler(acp_server.ACPRequestHandler):
+        agent = StudyAgent(mcp_client=PromptMCPClient())
+        mcp_client = None
+        debug = False
+        timeout = 2.0
+
+    server = AsyncACPServer(("127.0.0.1", 0), Handler, limiter=limiter, retry_after=3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def _stop(server, thread):
+    while server._loop is None:
+        time.sleep(0.01)
+    server.shutdown()
+    thread.join(5)
+    server.server_close()
+
+
+def _post_intent(port, results=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("POST", "/flows/phenotype_intent_split", body=json.dumps({"study_intent": "t and o"}), headers=headers or {})
+    response = conn.getresponse()
+    outcome = (response.status, dict(response.getheaders()), response.read())
+    conn.close()
+    if results is not None:
+        results.append(outcome)
+    return outcome
+
+
+def _wait_for(predicate):
+    for _ in range(500):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.acp
+def test_async_server_serves_the_same_routes(gate):
+    gate.set()
+    server, thread = _start(FlowLimiter())
+    try:
+        port = server.server_address[1]
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", "/health")
+        assert json.loads(conn.getresponse().read()) == {"status": "ok"}
+        sock = conn.sock
+        body = json.dumps({"study_intent": "t and o"})
+        conn.request("POST", "/flows/phenotype_intent_split", body=body, headers={"Expect": "100-continue"})
+        assert json.loads(conn.getresponse().read())["intent_split"]["target_statement"] == "t"
+        conn.request("POST", "/flows/phenotype_intent_split", body=body, headers={"Accept": "application/x-ndjson"})
+        events = [json.loads(line) for line in conn.getresponse().read().splitlines() if line.strip()]
+        assert events[-1]["type"] == "result" and events[-1]["status_code"] == 200
+        conn.request("GET", "/nope")
+        assert conn.getresponse().read() and conn.sock is sock
+        conn.close()
+    finally:
+        _stop(server, thread)
+
+
+@pytest.mark.acp
+def test_async_server_queues_then_rejects_when_saturated(gate):
+    limiter = FlowLimiter(max_inflight=4, per_flow=1, max_queue=1)
+    server, thread = _start(limiter)
+    port = server.server_address[1]
+    results = []
+    workers = [threading.Thread(target=_post_intent, args=(port, results)) for _ in range(2)]
+    try:
+        workers[0].start()
+        _wait_for(lambda: limiter.running == 1)
+        workers[1].start()
+        _wait_for(lambda: limiter.waiting == 1)
+
+        status, headers, body = _post_intent(port)
+        assert (status, headers["Retry-After"], json.loads(body)["error"]) == (429, "3", "server_busy")
+        # Health probes are not flow requests and still get through.
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", "/health")
+        assert conn.getresponse().status == 200
+        conn.close()
+
+        gate.set()
+        for worker in workers:
+            worker.join(10)
+        assert [result[0] for result in results] == [200, 200]
+        _wait_for(lambda: limiter.running == 0)
+        assert limiter.rejected == 1
+    finally:
+        gate.set()
+        _stop(server, thread)
+
+
+@pytest.mark.acp
+def test_flow_limiter_applies_global_and_per_flow_limits():
+    async def scenario():
+        limiter = FlowLimiter(max_inflight=2, per_flow=2, flow_limits=_parse_flow_limits("batch=1"), max_queue=1)
+        assert await limiter.acquire("batch")
+        waiter = asyncio.ensure_future(limiter.acquire("batch"))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        assert await limiter.acquire("other")
+        # Both global slots are taken and the queue is full.
+        assert await limiter.acquire("other") is False
+        await limiter.release("other")
+        await asyncio.sleep(0)
+        # A global slot is free again, but "batch" is still at its own limit.
+        assert limiter.waiting == 1 and not waiter.done()
+        await limiter.release("batch")
+        assert await waiter is True
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["running_by_flow"] == {"batch": 1}
+
+
+@pytest.mark.acp
+def test_flow_limiter_admits_waiters_in_arrival_order():
+    async def scenario():
+        limiter = FlowLimiter(max_inflight=1, per_flow=1, max_queue=4)
+        assert await limiter.acquire("x")
+        first = asyncio.ensure_future(limiter.acquire("x"))
+        second = asyncio.ensure_future(limiter.acquire("x"))
+        await asyncio.sleep(0)
+        await limiter.release("x")
+        # The freed slot already belongs to the oldest waiter; a new arrival queues.
+        late = asyncio.ensure_future(limiter.acquire("x"))
+        await asyncio.sleep(0)
+        assert first.done() and not second.done() and not late.done()
+        await limiter.release("x")
+        await asyncio.sleep(0)
+        assert second.done() and not late.done()
+        late.cancel()
+        await asyncio.sleep(0)
+        await limiter.release("x")
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["running"] == 0 and stats["waiting"] == 0
@@ -0,0 +1,209 @@
+import threading
+import time
+
+import pytest
+
+from study_agent_acp.flow_engine import FlowAbort, FlowEngine, FlowSpec, Step, cache_key_json
+from study_agent_acp.jobs import job_cancelled
+from study_agent_acp.llm_cache import llm_cache_bypass
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def call_tool(self, name, arguments):
+        with self.lock:
+            self.calls.append(name)
+        time.sleep(self.delay)
+        if arguments.get("fail"):
+            return {"status": "error", "tool": name}
+        return {"status": "ok", "tool": name, "full_result": {"echo": arguments}}
+
+    def call_llm(self, prompt):
+        time.sleep(self.delay)
+        return {"answer": prompt}
+
+
+def _engine(recorder, **kwargs):
+    return FlowEngine(call_tool=recorder.call_tool, prompt_bundle=recorder.call_tool, call_llm=recorder.call_llm, **kwargs)
+
+
+def _spec(**step_overrides):
+    return FlowSpec(
+        name="demo",
+        params=("query", "fail"),
+        steps=[
+            Step(
+                "search",
+                "tool",
+                inputs=("query", "fail"),
+                tool="search",
+                arguments=lambda values: {"query": values["query"], "fail": values["fail"]},
+                error="search_failed",
+                **step_overrides,
+            ),
+            Step("bundle", "bundle", tool="bundle", error="bundle_failed"),
+            Step(
+                "prompt",
+                "prompt",
+                inputs=("search", "bundle"),
+                run=lambda values: values["search"]["full_result"]["echo"]["query"] + "!",
+            ),
+            Step("llm", "llm", inputs=("prompt",)),
+        ],
+        output=lambda values: {"status": "ok", "answer": values["llm"]["answer"]},
+    )
+
+
+@pytest.mark.acp
+def test_engine_runs_ready_steps_together_and_records_timings():
+    recorder = Recorder(delay=0.2)
+    started = time.perf_counter()
+    result = _engine(recorder).run(_spec(), {"query": "q"})
+    elapsed = time.perf_counter() - started
+    assert result["answer"] == "q!"
+    # search and bundle overlap: two rounds of 0.2 s (tools, then LLM), not three.
+    assert elapsed < 0.55
+    assert set(result["timings"]) == {"search", "bundle", "prompt", "llm"}
+    assert result["timings"]["search"] >= 0.2
+
+    started = time.perf_counter()
+    assert _engine(recorder, workers=0).run(_spec(), {"query": "q"})["answer"] == "q!"
+    assert time.perf_counter() - started >= 0.6
+
+
+@pytest.mark.acp
+def test_engine_stops_at_the_first_failing_step():
+    recorder = Recorder()
+    result = _engine(recorder).run(_spec(), {"query": "q", "fail": True})
+    assert result["status"] == "error" and result["error"] == "search_failed"
+    assert result["details"]["tool"] == "search"
+    assert "llm" not in result["timings"]
+
+    spec = _spec()
+    spec.steps[2].run = lambda values: (_ for _ in ()).throw(FlowAbort({"status": "error", "error": "custom"}))
+    assert _engine(recorder).run(spec, {"query": "q"})["error"] == "custom"
+
+
+@pytest.mark.acp
+def test_engine_enforces_step_timeouts():
+    recorder = Recorder(delay=1.0)
+    started = time.perf_counter()
+    result = _engine(recorder, timeouts={"tool": 0.2}).run(_spec(), {"query": "q"})
+    assert result["error"] == "search_timeout" and result["timeout_seconds"] == 0.2
+    assert time.perf_counter() - started < 0.6
+    # A per-step timeout overrides the per-kind default.
+    result = _engine(recorder, timeouts={"tool": 5}).run(_spec(timeout=0.1), {"query": "q"})
+    assert result["error"] == "search_timeout"
+
+
+class CancellableTool(Recorder):
+    # Waits the way the MCP clients do: polling job_cancelled() until the call finishes.
+    def __init__(self, delay):
+        super().__init__(delay)
+        self.cancelled_after = []
+
+    def call_tool(self, name, arguments):
+        started = time.perf_counter()
+        while time.perf_counter() - started < self.delay:
+            if job_cancelled():
+                self.cancelled_after.append(time.perf_counter() - started)
+                raise RuntimeError("cancelled")
+            time.sleep(0.01)
+        return {"status": "ok", "tool": name, "full_result": {"echo": arguments}}
+
+
+@pytest.mark.acp
+@pytest.mark.parametrize("workers", [8, 0])
+def test_step_timeout_cancels_the_steps_tool_calls(workers):
+    tool = CancellableTool(delay=2.0)
+    started = time.perf_counter()
+    result = _engine(tool, workers=workers, timeouts={"tool": 0.2}).run(_spec(), {"query": "q"})
+    assert result["error"] in ("search_timeout", "bundle_timeout")
+    assert time.perf_counter() - started < 1.0
+    # With a pool both tool steps run and are cancelled; inline, the first one times out.
+    deadline = time.perf_counter() + 1.0
+    while len(tool.cancelled_after) < (2 if workers else 1) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert tool.cancelled_after and all(seconds < 0.6 for seconds in tool.cancelled_after)
+
+
+@pytest.mark.acp
+def test_engine_caches_steps_with_a_cache_key():
+    recorder = Recorder()
+    engine = _engine(recorder, cache_ttl=60)
+    spec = _spec(cache_key=cache_key_json("query"))
+    engine.run(spec, {"query": "q"})
+    engine.run(spec, {"query": "q"})
+    assert recorder.calls.count("search") == 1
+    engine.run(spec, {"query": "other"})
+    with llm_cache_bypass():
+        engine.run(spec, {"query": "q"})
+    assert recorder.calls.count("search") == 3
+    assert recorder.calls.count("bundle") == 4
+
+
+@pytest.mark.acp
+def test_nested_flows_on_a_single_worker_do_not_stall():
+    recorder = Recorder(delay=0.05)
+    engine = _engine(recorder, workers=1)
+    inner = _spec()
+    outer = FlowSpec(
+        name="outer",
+        params=("queries",),
+        steps=[
+            Step("a", "core", inputs=("queries",), run=lambda values: engine.run(inner, {"query": values["queries"][0]})),
+            Step("b", "core", inputs=("queries",), run=lambda values: engine.run(inner, {"query": values["queries"][1]})),
+        ],
+        output=lambda values: {"status": "ok", "answers": [values["a"]["answer"], values["b"]["answer"]]},
+    )
+    result = engine.run(outer, {"queries": ["x", "y"]})
+    assert result["answers"] == ["x!", "y!"]
+
+
+@pytest.mark.acp
+def test_independent_chains_overlap():
+    # Chain a's prompt is quick and chain b's is slow; b's llm step must still start
+    # while a's llm step is running rather than after it.
+    recorder = Recorder(delay=0.4)
+    engine = _engine(recorder, workers=8)
+
+    def slow_prompt(text, delay):
+        def run(values):
+            time.sleep(delay)
+            return text
+
+        return run
+
+    spec = FlowSpec(
+        name="chains",
+        params=(),
+        steps=[
+            Step("prompt_a", "prompt", run=slow_prompt("a", 0.01)),
+            Step("prompt_b", "prompt", run=slow_prompt("b", 0.2)),
+            Step("llm_a", "llm", inputs=("prompt_a",)),
+            Step("llm_b", "llm", inputs=("prompt_b",)),
+        ],
+        output=lambda values: {"status": "ok"},
+        branches={"a": ("prompt_a", "llm_a"), "b": ("prompt_b", "llm_b")},
+    )
+    for _ in range(3):
+        result = engine.run(spec, {})
+        a, b = result["branch_timings"]["a"], result["branch_timings"]["b"]
+        assert b["finished"] - a["finished"] < 0.35
+        assert max(a["finished"], b["finished"]) < 0.75
+    engine.close()
+
+
+@pytest.mark.acp
+def test_flow_spec_rejects_undeclared_inputs():
+    with pytest.raises(ValueError):
+        FlowSpec(
+            name="broken",
+            params=("query",),
+            steps=[Step("prompt", "prompt", inputs=("search",), run=lambda values: "")],
+            output=lambda values: {},
+        )
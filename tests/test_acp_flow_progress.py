@@ -0,0 +1,153 @@
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from study_agent_acp import server as acp_server
+from study_agent_acp.agent import StudyAgent
+from study_agent_acp.flow_engine import FlowEngine, FlowSpec, Step
+from study_agent_acp.progress import partial_sink, progress_scope, report_stage
+from study_agent_mcp.tools import phenotype_intent_split
+
+_ANSWER = {"plan": "p", "target_statement": "t", "outcome_statement": "o", "rationale": "r"}
+
+
+class PromptMCPClient:
+    def __init__(self) -> None:
+        self.tools = {}
+        phenotype_intent_split.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        return self.tools[name](**arguments)
+
+
+@pytest.fixture
+def acp_url(llm_gateway):
+    llm_gateway.reply = lambda request: _ANSWER
+
+    class Handler(acp_server.ACPRequestHandler):
+        agent = StudyAgent(mcp_client=PromptMCPClient())
+        mcp_client = None
+        debug = False
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(url, accept=None):
+    headers = {"Content-Type": "application/json"}
+    if accept:
+        headers["Accept"] = accept
+    body = json.dumps({"study_intent": "t and o"}).encode("utf-8")
+    request = urllib.request.Request(f"{url}/flows/phenotype_intent_split", data=body, headers=headers, method="POST")
+    return urllib.request.urlopen(request, timeout=10)
+
+
+@pytest.mark.acp
+def test_flow_streams_ndjson_progress(acp_url, llm_gateway):
+    llm_gateway.stream_chunk = 7
+    with _post(acp_url, "application/x-ndjson") as response:
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response if line.strip()]
+    stages = [event["stage"] for event in events if event["type"] == "stage"]
+    assert stages.index("prompt_bundle_fetched") < stages.index("llm_started") < stages.index("llm_done")
+    assert stages[-1] == "validation_done"
+    partial_fields = [event["field"] for event in events if event["type"] == "partial" and event["kind"] == "field"]
+    assert partial_fields == list(_ANSWER)
+    assert all("elapsed_seconds" in event for event in events)
+    assert events[-1]["type"] == "result"
+    assert events[-1]["status_code"] == 200
+    assert events[-1]["result"]["intent_split"]["target_statement"] == "t"
+
+
+@pytest.mark.acp
+def test_flow_streams_sse_with_heartbeats(acp_url, llm_gateway, monkeypatch):
+    monkeypatch.setenv("ACP_STREAM_HEARTBEAT", "0.02")
+    llm_gateway.delay = 0.15
+    with _post(acp_url, "text/event-stream") as response:
+        assert response.headers["Content-Type"] == "text/event-stream"
+        text = response.read().decode("utf-8")
+    messages = [block for block in text.split("\n\n") if block]
+    assert ": heartbeat" in messages
+    named = [block for block in messages if block.startswith("event: ")]
+    assert named[-1].startswith("event: result\ndata: ")
+    final = json.loads(named[-1].split("data: ", 1)[1])
+    assert final["status_code"] == 200
+
+
+@pytest.mark.acp
+def test_flow_without_stream_accept_returns_json(acp_url):
+    with _post(acp_url, "application/json") as response:
+        assert response.headers["Content-Type"] == "application/json"
+        payload = json.loads(response.read())
+    assert payload["intent_split"]["outcome_statement"] == "o"
+
+
+@pytest.mark.acp
+def test_progress_reporting_is_inert_without_scope_and_tolerates_bad_sinks():
+    report_stage("ignored")
+
+    def broken(event):
+        raise RuntimeError("gone")
+
+    with progress_scope(broken):
+        report_stage("still_runs")
+
+
+@pytest.mark.acp
+@pytest.mark.parametrize("workers", [8, 0])
+def test_progress_events_name_the_step_and_branch(workers):
+    def call_llm(prompt):
+        report_stage("llm_started")
+        partial_sink()({"type": "field", "field": "statement", "value": prompt})
+        return {"statement": prompt}
+
+    engine = FlowEngine(call_tool=None, prompt_bundle=None, call_llm=call_llm, workers=workers)
+    spec = FlowSpec(
+        name="branches",
+        params=(),
+        steps=[
+            Step("prompt_target", "prompt", run=lambda values: "target"),
+            Step("prompt_outcome", "prompt", run=lambda values: "outcome"),
+            Step("llm_target", "llm", inputs=("prompt_target",)),
+            Step("llm_outcome", "llm", inputs=("prompt_outcome",)),
+        ],
+        output=lambda values: {"status": "ok"},
+        branches={"target": ("prompt_target", "llm_target"), "outcome": ("prompt_outcome", "llm_outcome")},
+    )
+    events = []
+    lock = threading.Lock()
+
+    def sink(event):
+        with lock:
+            events.append(event)
+
+    with progress_scope(sink):
+        report_stage("flow_started")
+        assert engine.run(spec, {})["status"] == "ok"
+    engine.close()
+    assert "step" not in events[0] and "branch" not in events[0]
+    llm_events = events[1:]
+    assert len(llm_events) == 4
+    for event in llm_events:
+        assert event["step"] == f"llm_{event['branch']}"
+        if event["type"] == "partial":
+            assert event["value"] == event["branch"]
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import study_agent_acp.agent as agent_module
+from study_agent_acp import server as acp_server
+from study_agent_acp.agent import StudyAgent
+from study_agent_acp.jobs import JobManager
+from study_agent_mcp.tools import keeper_validation, phenotype_intent_split
+
+
+class ToolsMCPClient:
+    def __init__(self) -> None:
+        self.tools = {}
+        phenotype_intent_split.register(self)
+        keeper_validation.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        return self.tools[name](**arguments)
+
+
+@pytest.fixture
+def release(monkeypatch):
+    gate = threading.Event()
+
+    def fake_llm(prompt, on_event=None):
+        gate.wait(5)
+        if "expect-no" in prompt:
+            return {"label": "no", "rationale": "no"}
+        if "Patient" in prompt or "PATIENT" in prompt:
+            return {"label": "yes", "rationale": "yes"}
+        return {"plan": "p", "target_statement": "t", "outcome_statement": "o"}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    return gate
+
+
+def _start(jobs):
+    class Handler(acp_server.ACPRequestHandler):
+        agent = StudyAgent(mcp_client=ToolsMCPClient())
+        mcp_client = None
+        debug = False
+
+    Handler.jobs = jobs
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _request(url, method="GET", payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), json.loads(exc.read())
+
+
+def _wait(url, job_id):
+    for _ in range(200):
+        status, _, job = _request(f"{url}/jobs/{job_id}")
+        assert status == 200
+        if job["status"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.acp
+def test_job_runs_flow_and_keeps_result(release):
+    server, url = _start(JobManager(max_workers=2))
+    try:
+        status, headers, job = _request(
+            f"{url}/jobs", "POST", {"flow": "phenotype_intent_split", "body": {"study_intent": "t and o"}}
+        )
+        assert status == 202
+        assert headers["Location"] == job["status_url"] == f"/jobs/{job['job_id']}"
+        assert job["status"] in ("queued", "running")
+        release.set()
+        job = _wait(url, job["job_id"])
+        assert job["status"] == "done" and job["status_code"] == 200
+        assert job["result"]["intent_split"]["target_statement"] == "t"
+        assert job["stage"] == "validation_done"
+        assert job["run_seconds"] >= 0 and job["queue_seconds"] >= 0
+
+        _, _, listing = _request(f"{url}/jobs")
+        assert [entry["job_id"] for entry in listing["jobs"]] == [job["job_id"]]
+        assert "result" not in listing["jobs"][0]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.acp
+def test_job_rejects_bad_requests_and_full_queue(release):
+    server, url = _start(JobManager(max_workers=1, max_queue=1))
+    try:
+        assert _request(f"{url}/jobs", "POST", {"flow": "nope"})[0] == 400
+        status, _, payload = _request(f"{url}/jobs", "POST", {"flow": "phenotype_validation_review", "body": {}})
+        assert (status, payload["error"]) == (400, "keeper_row must be a JSON object")
+
+        submit = {"flow": "phenotype_intent_split", "body": {"study_intent": "t and o"}}
+        running = _request(f"{url}/jobs", "POST", submit)[2]
+        queued = _request(f"{url}/jobs", "POST", submit)[2]
+        status, headers, payload = _request(f"{url}/jobs", "POST", submit)
+        assert (status, payload["error"], headers["Retry-After"]) == (429, "job_queue_full", "5")
+
+        status, _, cancelled = _request(f"{url}/jobs/{queued['job_id']}", "DELETE")
+        assert (status, cancelled["status"]) == (200, "cancelled")
+        release.set()
+        assert _wait(url, running["job_id"])["status"] == "done"
+        assert _request(f"{url}/jobs/{queued['job_id']}")[2]["status"] == "cancelled"
+        assert _request(f"{url}/jobs/missing")[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.acp
+def test_job_collects_batch_rows(release):
+    release.set()
+    server, url = _start(JobManager())
+    rows = [{"age": 40, "gender": "Male", "presentation": f"case {idx} expect-{'no' if idx else 'yes'}"} for idx in range(3)]
+    try:
+        body = {"disease_name": "GI bleed", "keeper_rows": rows, "max_workers": 2}
+        _, _, job = _request(f"{url}/jobs", "POST", {"flow": "phenotype_validation_review_batch", "body": body})
+        job = _wait(url, job["job_id"])
+        assert job["status"] == "done"
+        assert len(job["result"]["rows"]) == 3
+        assert job["result"]["summary"]["counts"]["no"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.acp
+def test_finished_jobs_expire_after_ttl():
+    jobs = JobManager(max_workers=1, ttl_seconds=0)
+    job = jobs.submit("phenotype_intent_split", lambda: {"status": "ok"})
+    job.future.result(timeout=5)
+    assert job.status == "done"
+    time.sleep(0.01)
+    assert jobs.get(job.job_id) is None
+    jobs.shutdown()
@@ -0,0 +1,123 @@
+import http.client
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import study_agent_acp.agent as agent_module
+from study_agent_acp import server as acp_server
+from study_agent_acp.agent import StudyAgent
+from study_agent_mcp.tools import phenotype_intent_split
+
+
+class PromptMCPClient:
+    def __init__(self) -> None:
+        self.tools = {}
+        phenotype_intent_split.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        return self.tools[name](**arguments)
+
+
+@pytest.fixture
+def acp(monkeypatch):
+    def fake_llm(prompt, on_event=None):
+        return {"plan": "p", "target_statement": "t", "outcome_statement": "o"}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+
+    class Handler(acp_server.ACPRequestHandler):
+        agent = StudyAgent(mcp_client=PromptMCPClient())
+        mcp_client = None
+        debug = False
+        timeout = 2.0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    try:
+        yield Handler, server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _intent(conn, headers=None):
+    body = json.dumps({"study_intent": "t and o"})
+    conn.request("POST", "/flows/phenotype_intent_split", body=body, headers=headers or {})
+    return conn.getresponse()
+
+
+@pytest.mark.acp
+def test_requests_share_one_keep_alive_connection(acp):
+    _, port = acp
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/health")
+    response = conn.getresponse()
+    assert response.version == 11
+    assert json.loads(response.read()) == {"status": "ok"}
+    sock = conn.sock
+
+    assert json.loads(_intent(conn).read())["intent_split"]["target_statement"] == "t"
+    # A streamed response is chunked, so the connection survives it too.
+    response = _intent(conn, {"Accept": "application/x-ndjson"})
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    events = [json.loads(line) for line in response.read().splitlines() if line.strip()]
+    assert events[-1]["type"] == "result"
+    conn.request("GET", "/health")
+    assert conn.getresponse().read()
+    assert conn.sock is sock
+    conn.close()
+
+
+@pytest.mark.acp
+def test_pipelined_and_chunked_requests(acp):
+    _, port = acp
+    body = json.dumps({"study_intent": "t and o"}).encode("utf-8")
+    chunked = b"%x\r\n%s\r\n%x\r\n%s\r\n0\r\n\r\n" % (5, body[:5], len(body) - 5, body[5:])
+    raw = (
+        b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n"
+        b"POST /flows/phenotype_intent_split HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n" + chunked
+        + b"GET /health HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+    )
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(raw)
+        received = b""
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            received += data
+    assert received.count(b"HTTP/1.1 200 OK") == 3
+    assert b'"target_statement": "t"' in received
+
+
+@pytest.mark.acp
+def test_unread_body_and_idle_connections_are_closed(acp):
+    handler, port = acp
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("POST", "/nope", body=b'{"x": 1}')
+    response = conn.getresponse()
+    assert response.status == 404
+    response.read()
+    assert response.will_close
+
+    handler.timeout = 0.1
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n")
+        received = b""
+        while not received.endswith(b'{"status": "ok"}'):
+            received += sock.recv(65536)
+        # The server drops the connection once it has been idle past its timeout.
+        assert sock.recv(65536) == b""
@@ -0,0 +1,88 @@
+import pytest
+
+from study_agent_acp import llm_client
+from study_agent_acp.llm_cache import LLMResponseCache, cache_key, llm_cache_bypass
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path, llm_gateway):
+    calls = []
+
+    def reply(request):
+        calls.append(request)
+        return {"label": "yes", "rationale": f"call {len(calls)}"}
+
+    llm_gateway.reply = reply
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    llm_client.reload_llm_config()
+    return calls
+
+
+@pytest.mark.acp
+def test_call_llm_serves_repeat_prompts_from_cache(fake_api):
+    first = llm_client.call_llm("review this case")
+    second = llm_client.call_llm("review this case")
+    assert first == second == {"label": "yes", "rationale": "call 1"}
+    assert len(fake_api) == 1
+
+    llm_client.call_llm("a different case")
+    assert len(fake_api) == 2
+
+
+@pytest.mark.acp
+def test_call_llm_cache_bypass_and_model_key(fake_api, monkeypatch):
+    llm_client.call_llm("review this case")
+    assert llm_client.call_llm("review this case", use_cache=False)["rationale"] == "call 2"
+    with llm_cache_bypass():
+        assert llm_client.call_llm("review this case")["rationale"] == "call 3"
+    # A bypassed call still refreshes the stored answer.
+    assert llm_client.call_llm("review this case")["rationale"] == "call 3"
+
+    monkeypatch.setenv("LLM_MODEL", "other-model")
+    llm_client.reload_llm_config()
+    assert llm_client.call_llm("review this case")["rationale"] == "call 4"
+    assert len(fake_api) == 4
+
+
+@pytest.mark.acp
+def test_phi_guarded_prompts_are_not_cached_unless_opted_in(fake_api, monkeypatch, tmp_path):
+    with llm_client.phi_guarded():
+        llm_client.call_llm("review this patient")
+        llm_client.call_llm("review this patient")
+    assert len(fake_api) == 2
+    assert LLMResponseCache(str(tmp_path / "llm_cache.sqlite")).stats()["entries"] == 0
+
+    monkeypatch.setenv("LLM_CACHE_PHI", "1")
+    llm_client.reload_llm_config()
+    with llm_client.phi_guarded():
+        llm_client.call_llm("review this patient")
+        assert llm_client.call_llm("review this patient")["rationale"] == "call 3"
+    assert len(fake_api) == 3
+
+
+@pytest.mark.acp
+def test_call_llm_without_cache_path_always_calls(fake_api, monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_PATH")
+    llm_client.reload_llm_config()
+    llm_client.call_llm("review this case")
+    llm_client.call_llm("review this case")
+    assert len(fake_api) == 2
+
+
+@pytest.mark.acp
+def test_llm_cache_ttl_and_size_eviction(tmp_path):
+    expired = LLMResponseCache(str(tmp_path / "ttl.sqlite"), ttl_seconds=0)
+    expired.put("a", {"label": "yes"})
+    assert expired.get("a") is None
+
+    cache = LLMResponseCache(str(tmp_path / "lru.sqlite"), max_bytes=100)
+    value = {"rationale": "x" * 30}
+    cache.put("a", value)
+    cache.put("b", value)
+    assert cache.get("a") == value
+    cache.put("c", value)
+    # "b" was least recently used once "a" was read back.
+    assert cache.get("b") is None
+    assert cache.get("a") == value and cache.get("c") == value
+    assert cache.stats()["bytes"] <= 100
+    assert cache_key("m", "chat", "p") != cache_key("m", "responses", "p")
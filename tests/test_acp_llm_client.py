@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+import study_agent_acp.agent as agent_module
+from study_agent_acp import llm_client
+from study_agent_acp.agent import StudyAgent
+from study_agent_acp.llm_client import LLMClient, LLMConfig
+from study_agent_mcp.tools import phenotype_intent_split
+
+
+class PromptMCPClient:
+    def __init__(self) -> None:
+        self.tools = {}
+        phenotype_intent_split.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        return self.tools[name](**arguments)
+
+
+@pytest.mark.acp
+def test_llm_client_reuses_one_connection(llm_gateway):
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test"))
+    for idx in range(5):
+        assert client.call(f"prompt {idx}") == {"ok": True}
+    assert len(llm_gateway.requests) == 5
+    assert llm_gateway.connections == 1
+    assert client.connections_opened() == 1
+    client.close()
+
+
+@pytest.mark.acp
+def test_llm_client_caps_concurrency_per_host(llm_gateway):
+    llm_gateway.delay = 0.05
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test", max_connections=2))
+    threads = [threading.Thread(target=client.call, args=(f"prompt {idx}",)) for idx in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(llm_gateway.requests) == 6
+    assert llm_gateway.peak == 2
+    assert client.connections_opened() == 2
+    client.close()
+
+
+@pytest.mark.acp
+def test_llm_client_retries_stale_keep_alive_connection(llm_gateway):
+    llm_gateway.drop_idle = True
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test"))
+    assert client.call("first") == {"ok": True}
+    assert client.call("second") == {"ok": True}
+    assert len(llm_gateway.requests) == 2
+    assert client.connections_opened() == 2
+    client.close()
+
+
+@pytest.mark.acp
+def test_llm_config_is_read_once_until_reload(llm_gateway, monkeypatch):
+    client = llm_client.get_llm_client()
+    assert client.config.api_url == llm_gateway.url
+    monkeypatch.setenv("LLM_MODEL", "other-model")
+    llm_client.call_llm("prompt")
+    assert llm_gateway.requests[-1]["model"] == "agentstudyassistant"
+    llm_client.reload_llm_config()
+    llm_client.call_llm("prompt")
+    assert llm_gateway.requests[-1]["model"] == "other-model"
+
+
+@pytest.mark.acp
+def test_study_agent_flows_use_injected_llm_client(llm_gateway, monkeypatch):
+    def unexpected(prompt):
+        raise AssertionError("module-level call_llm should not be used")
+
+    monkeypatch.setattr(agent_module, "call_llm", unexpected)
+    llm_gateway.reply = lambda request: {"plan": "p", "target_statement": "t", "outcome_statement": "o"}
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test"))
+    agent = StudyAgent(mcp_client=PromptMCPClient(), llm_client=client)
+    result = agent.run_phenotype_intent_split_flow(study_intent="t and o")
+    assert result["intent_split"]["target_statement"] == "t"
+    assert len(llm_gateway.requests) == 1
+    client.close()
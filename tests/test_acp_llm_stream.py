@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from study_agent_acp.json_stream import IncrementalJSONParser, replay_events
+from study_agent_acp.llm_client import LLMClient, LLMConfig
+
+_ANSWER = {
+    "plan": "Pick {cohorts} with \"care\"",
+    "phenotype_recommendations": [
+        {"cohortId": 12, "cohortName": "GI bleed [narrow]", "justification": "a, b"},
+        {"cohortId": 34, "cohortName": "GI bleed broad", "justification": "c}"},
+    ],
+    "scores": [0.5, 1, True, None, "x"],
+    "count": 2,
+    "mode": None,
+}
+
+
+def _feed(text, size):
+    events = []
+    parser = IncrementalJSONParser(events.append)
+    for idx in range(0, len(text), size):
+        parser.feed(text[idx : idx + size])
+    return parser, events
+
+
+@pytest.mark.acp
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_incremental_parser_reports_items_and_fields(size):
+    text = "Sure! Here it is:\n" + json.dumps(_ANSWER, indent=1) + "\nLet me know {if} you need more."
+    parser, events = _feed(text, size)
+    assert parser.done
+    assert parser.result() == _ANSWER
+    items = [(event["field"], event["index"], event["value"]) for event in events if event["type"] == "item"]
+    assert items[:2] == [
+        ("phenotype_recommendations", 0, _ANSWER["phenotype_recommendations"][0]),
+        ("phenotype_recommendations", 1, _ANSWER["phenotype_recommendations"][1]),
+    ]
+    assert [value for field, _, value in items if field == "scores"] == _ANSWER["scores"]
+    fields = {event["field"]: event["value"] for event in events if event["type"] == "field"}
+    assert fields == _ANSWER
+    replayed = []
+    replay_events(_ANSWER, replayed.append)
+    assert replayed == events
+
+
+@pytest.mark.acp
+def test_incremental_parser_emits_items_before_object_closes():
+    events = []
+    parser = IncrementalJSONParser(events.append)
+    parser.feed('{"phenotype_recommendations": [{"cohortId": 1}, {"cohort')
+    assert not parser.done
+    assert events == [{"type": "item", "field": "phenotype_recommendations", "index": 0, "value": {"cohortId": 1}}]
+    parser.feed('Id": 2}]}')
+    assert parser.done and parser.result() == {"phenotype_recommendations": [{"cohortId": 1}, {"cohortId": 2}]}
+
+
+@pytest.mark.acp
+def test_llm_client_streams_and_stops_at_closing_brace(llm_gateway):
+    llm_gateway.reply = lambda request: _ANSWER
+    llm_gateway.stream_chunk = 8
+    llm_gateway.stream_trailer = " and some trailing chatter " * 20
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test"))
+    events = []
+    result = client.call("recommend", on_event=events.append)
+    assert result == _ANSWER
+    assert llm_gateway.requests[0]["stream"] is True
+    assert [event["index"] for event in events if event.get("field") == "phenotype_recommendations" and event["type"] == "item"] == [0, 1]
+    # The stream was abandoned once the object closed, so its connection is not reused.
+    client.call("recommend again", stream=False)
+    assert llm_gateway.connections == 2
+    client.close()
+
+
+@pytest.mark.acp
+def test_llm_client_replays_events_when_gateway_ignores_stream(llm_gateway):
+    llm_gateway.reply = lambda request: _ANSWER
+    client = LLMClient(LLMConfig(api_url=llm_gateway.url, api_key="test"))
+    events = []
+    assert client.call("recommend", on_event=events.append) == _ANSWER
+    assert {event["field"] for event in events if event["type"] == "field"} == set(_ANSWER)
+    client.close()
@@ -0,0 +1,132 @@
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+import study_agent_acp.mcp_client as mcp_client_module
+from study_agent_acp.jobs import JobManager
+from study_agent_acp.mcp_client import MCPCallCancelled, StdioMCPClient, StdioMCPClientConfig
+
+SLOW_SERVER = textwrap.dedent(
+    """
+    from typing import Any, Dict
+
+    import anyio
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("slow")
+
+    @mcp.tool(name="slow")
+    async def slow(seconds: float = 0.1, tag: str = "") -> Dict[str, Any]:
+        await anyio.sleep(seconds)
+        return {"tag": tag}
+
+    if __name__ == "__main__":
+        mcp.run()
+    """
+)
+
+
+@pytest.fixture(scope="module")
+def mcp_client(tmp_path_factory):
+    script = tmp_path_factory.mktemp("mcp") / "slow_server.py"
+    script.write_text(SLOW_SERVER, encoding="utf-8")
+    client = StdioMCPClient(StdioMCPClientConfig(command=sys.executable, args=[str(script)], call_timeout=0.5))
+    client.call_tool("slow", {"seconds": 0})
+    yield client
+    client.close()
+
+
+def _tag(result):
+    return result.get("result", result)["tag"]
+
+
+def _throughput(client, callers, calls_each=3, seconds=0.1):
+    results = []
+
+    def worker(idx):
+        for call in range(calls_each):
+            tag = f"{idx}-{call}"
+            results.append(_tag(client.call_tool("slow", {"seconds": seconds, "tag": tag})) == tag)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    assert results == [True] * callers * calls_each
+    return callers * calls_each / elapsed
+
+
+@pytest.mark.acp
+def test_concurrent_calls_share_one_session_and_scale(mcp_client):
+    single = _throughput(mcp_client, 1)
+    eight = _throughput(mcp_client, 8)
+    # Eight callers overlap their waits on one session instead of queueing behind each other.
+    assert eight > 4 * single
+
+
+@pytest.mark.acp
+def test_call_timeout_leaves_session_usable(mcp_client):
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        mcp_client.call_tool("slow", {"seconds": 5})
+    assert time.perf_counter() - started < 2
+    assert _tag(mcp_client.call_tool("slow", {"seconds": 0, "tag": "after"})) == "after"
+
+
+@pytest.mark.acp
+def test_cancelled_job_abandons_its_mcp_call(mcp_client):
+    jobs = JobManager(max_workers=1)
+    outcome = {}
+
+    def run():
+        try:
+            mcp_client.call_tool("slow", {"seconds": 0.45})
+        except MCPCallCancelled as exc:
+            outcome["cancelled"] = str(exc)
+        return {"status": "ok"}
+
+    job = jobs.submit("slow", run)
+    time.sleep(0.1)
+    jobs.cancel(job.job_id)
+    job.future.result(timeout=5)
+    assert "cancelled" in outcome
+    assert _tag(mcp_client.call_tool("slow", {"seconds": 0, "tag": "next"})) == "next"
+    jobs.shutdown()
+
+
+@pytest.mark.acp
+def test_timed_out_call_is_cancelled_by_its_own_request_id(mcp_client, monkeypatch):
+    sent = {}
+    cancelled = []
+    send = mcp_client_module._RequestIdTap.send
+
+    async def recording_send(self, message):
+        root = message.message.root
+        if getattr(root, "method", None) == "tools/call":
+            sent[root.id] = root.params["arguments"]["tag"]
+        await send(self, message)
+
+    async def recording_cancel(session, request_id, reason):
+        cancelled.append((request_id, reason))
+
+    monkeypatch.setattr(mcp_client_module._RequestIdTap, "send", recording_send)
+    monkeypatch.setattr(mcp_client_module, "_send_cancelled", recording_cancel)
+
+    def fast():
+        for idx in range(5):
+            mcp_client.call_tool("slow", {"seconds": 0.05, "tag": f"fast-{idx}"})
+
+    thread = threading.Thread(target=fast)
+    thread.start()
+    with pytest.raises(TimeoutError):
+        mcp_client.call_tool("slow", {"seconds": 5, "tag": "slow"})
+    thread.join()
+    assert len(cancelled) == 1
+    request_id, reason = cancelled[0]
+    assert (sent[request_id], reason) == ("slow", "timeout")
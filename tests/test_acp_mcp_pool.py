@@ -0,0 +1,119 @@
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from study_agent_acp.mcp_client import StdioMCPClient, StdioMCPClientConfig
+
+PID_SERVER = textwrap.dedent(
+    """
+    import os
+    from typing import Any, Dict
+
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("pid")
+
+    @mcp.tool(name="pid")
+    def pid() -> Dict[str, Any]:
+        return {"pid": os.getpid()}
+
+    @mcp.tool(name="crash")
+    def crash() -> Dict[str, Any]:
+        os._exit(1)
+
+    if __name__ == "__main__":
+        mcp.run()
+    """
+)
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    monkeypatch.setenv("STUDY_AGENT_MCP_ONESHOT", "1")
+    script = tmp_path / "pid_server.py"
+    script.write_text(PID_SERVER, encoding="utf-8")
+    clients = []
+
+    def make(**kwargs):
+        client = StdioMCPClient(StdioMCPClientConfig(command=sys.executable, args=[str(script)], **kwargs))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _pid(client):
+    result = client.call_tool("pid", {})
+    return result.get("result", result)["pid"]
+
+
+def _wait_for(predicate):
+    for _ in range(1000):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.acp
+def test_oneshot_calls_reuse_warm_processes(make_client):
+    client = make_client(pool_size=2)
+    _wait_for(lambda: client._pool.stats()["idle"] == 2)
+    pids = []
+
+    def worker():
+        for _ in range(3):
+            pids.append(_pid(client))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(pids) == 12
+    assert len(set(pids)) <= 2
+    health = client.health_check()
+    assert health["ok"] and health["mode"] == "oneshot"
+    assert health["pool"]["started"] == 2
+
+
+@pytest.mark.acp
+def test_pooled_process_is_replaced_after_max_calls_and_on_failure(make_client):
+    client = make_client(pool_size=1, pool_max_calls=2)
+    pids = [_pid(client) for _ in range(4)]
+    assert pids[0] == pids[1] and pids[2] == pids[3] and pids[1] != pids[2]
+
+    with pytest.raises(Exception):
+        client.call_tool("crash", {})
+    assert _pid(client) not in pids
+    assert client._pool.stats()["recycled"] >= 3
+
+
+@pytest.mark.acp
+def test_pool_size_zero_spawns_a_process_per_call(make_client):
+    client = make_client(pool_size=0)
+    assert _pid(client) != _pid(client)
+    assert client._pool is None
+
+
+@pytest.mark.acp
+def test_pool_reports_a_command_that_cannot_start(monkeypatch):
+    monkeypatch.setenv("STUDY_AGENT_MCP_ONESHOT", "1")
+    client = StdioMCPClient(StdioMCPClientConfig(command="/nonexistent/cmd", args=[], pool_size=1))
+    try:
+        started = time.monotonic()
+        for _ in range(3):
+            with pytest.raises(OSError):
+                client.call_tool("pid", {})
+        assert time.monotonic() - started < 5
+        stats = client._pool.stats()
+        # Restarts back off instead of respawning in a tight loop.
+        assert stats["started"] <= 3
+        assert stats["startup_failures"] >= 1 and stats["last_error"]
+    finally:
+        client.close()
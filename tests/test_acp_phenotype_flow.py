@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 
 from study_agent_acp.agent import StudyAgent
@@ -53,3 +56,168 @@ def test_acp_flow_candidate_limit(monkeypatch):
     assert result["llm_used"] is True
     recs = result["recommendations"]["phenotype_recommendations"]
     assert len(recs) == 1
+
+
+class HashedBundleMCPClient(StubMCPClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.content_hash = "sha256:v1"
+
+    def call_tool(self, name, arguments):
+        if name != "phenotype_prompt_bundle":
+            return super().call_tool(name, arguments)
+        self.calls.append((name, arguments))
+        if arguments.get("if_none_match") == self.content_hash:
+            return {"task": arguments["task"], "not_modified": True, "content_hash": self.content_hash}
+        return {
+            "overview": "overview " + self.content_hash,
+            "spec": "spec",
+            "output_schema": {"type": "object"},
+            "content_hash": self.content_hash,
+        }
+
+
+@pytest.mark.acp
+def test_acp_flow_caches_prompt_bundle_by_hash(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt):
+        prompts.append(prompt)
+        return {"phenotype_recommendations": []}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    client = HashedBundleMCPClient()
+
+    def bundle_calls():
+        return [args for name, args in client.calls if name == "phenotype_prompt_bundle"]
+
+    agent = StudyAgent(mcp_client=client, prompt_cache_ttl=60)
+    agent.run_phenotype_recommendation_flow(study_intent="intent")
+    agent.run_phenotype_recommendation_flow(study_intent="intent")
+    assert len(bundle_calls()) == 1
+
+    agent = StudyAgent(mcp_client=client, prompt_cache_ttl=0)
+    agent.run_phenotype_recommendation_flow(study_intent="intent")
+    agent.run_phenotype_recommendation_flow(study_intent="intent")
+    assert bundle_calls()[-1]["if_none_match"] == "sha256:v1"
+    assert "overview sha256:v1" in prompts[-1]
+
+    client.content_hash = "sha256:v2"
+    agent.run_phenotype_recommendation_flow(study_intent="intent")
+    assert "overview sha256:v2" in prompts[-1]
+
+
+class SlowMCPClient(StubMCPClient):
+    def __init__(self, delay) -> None:
+        super().__init__()
+        self.delay = delay
+        self.threads = set()
+
+    def call_tool(self, name, arguments):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        if name == "keeper_sanitize_row":
+            return {"sanitized_row": dict(arguments["row"])}
+        if name == "keeper_prompt_bundle":
+            return {"overview": "o", "spec": "s", "output_schema": {}, "system_prompt": "sys"}
+        if name == "keeper_build_prompt":
+            return {"prompt": "case " + arguments["sanitized_row"]["id"]}
+        if name == "keeper_parse_response":
+            return {"label": arguments["llm_output"]["label"]}
+        return super().call_tool(name, arguments)
+
+
+@pytest.mark.acp
+def test_acp_flow_runs_independent_steps_concurrently(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt):
+        prompts.append(prompt)
+        return {"phenotype_recommendations": [], "label": "yes"}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+
+    def timed(agent, flow, **kwargs):
+        started = time.perf_counter()
+        result = getattr(agent, flow)(**kwargs)
+        return result, time.perf_counter() - started
+
+    client = SlowMCPClient(0.2)
+    result, elapsed = timed(StudyAgent(mcp_client=client), "run_phenotype_recommendation_flow", study_intent="intent")
+    # Search and prompt bundle overlap: one MCP round trip instead of two.
+    assert result["candidate_count"] == 2 and elapsed < 0.35
+    assert len(client.threads) == 2
+
+    keeper = {"keeper_row": {"id": "7"}, "disease_name": "asthma"}
+    result, elapsed = timed(StudyAgent(mcp_client=client), "run_phenotype_validation_review_flow", **keeper)
+    # sanitize -> build_prompt -> parse is the critical path; the bundle runs alongside.
+    assert result["full_result"]["label"] == "yes" and "case 7" in prompts[-1]
+    assert elapsed < 0.75
+
+    result, elapsed = timed(
+        StudyAgent(mcp_client=client, step_workers=0), "run_phenotype_validation_review_flow", **keeper
+    )
+    assert result["full_result"]["label"] == "yes" and elapsed >= 0.8
+
+
+class FanOutMCPClient(StubMCPClient):
+    def call_tool(self, name, arguments):
+        if name == "phenotype_intent_split":
+            self.calls.append((name, arguments))
+            return {"overview": "split overview", "spec": "spec", "output_schema": {"type": "object"}}
+        if name == "phenotype_search_many":
+            self.calls.append((name, arguments))
+            return {
+                "searches": [
+                    {"query": query, "results": [{"cohortId": 10 + idx, "name": query}]}
+                    for idx, query in enumerate(arguments["queries"])
+                ]
+            }
+        return super().call_tool(name, arguments)
+
+
+@pytest.mark.acp
+def test_intent_recommendation_flow_fans_out_target_and_outcome(monkeypatch):
+    def fake_llm(prompt):
+        if "split overview" in prompt:
+            return {"target_statement": "adults with diabetes", "outcome_statement": "heart failure"}
+        time.sleep(0.3)
+        cohort_id = 10 if "adults with diabetes" in prompt else 11
+        return {"phenotype_recommendations": [{"cohortId": cohort_id, "cohortName": "x", "justification": "ok"}]}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    client = FanOutMCPClient()
+    started = time.perf_counter()
+    result = StudyAgent(mcp_client=client).run_phenotype_intent_recommendation_flow(study_intent="t and o")
+    elapsed = time.perf_counter() - started
+
+    assert result["status"] == "ok"
+    assert result["intent_split"]["target_statement"] == "adults with diabetes"
+    assert result["target"]["statement"] == "adults with diabetes"
+    assert result["target"]["recommendations"]["phenotype_recommendations"][0]["cohortId"] == 10
+    assert result["outcome"]["recommendations"]["phenotype_recommendations"][0]["cohortId"] == 11
+    # One batched search for both statements, and the two recommendation LLM calls overlap.
+    searches = [args for name, args in client.calls if name.startswith("phenotype_search")]
+    assert searches == [{"queries": ["adults with diabetes", "heart failure"], "top_k": 20}]
+    assert elapsed < 0.55
+    branches = result["branch_timings"]
+    assert branches["target"]["started"] < branches["outcome"]["finished"]
+    assert branches["outcome"]["started"] < branches["target"]["finished"]
+    assert branches["search"]["started"] >= branches["intent_split"]["finished"]
+
+
+@pytest.mark.acp
+def test_intent_recommendation_flow_skips_a_missing_statement(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt):
+        prompts.append(prompt)
+        if "split overview" in prompt:
+            return {"target_statement": "adults with diabetes", "outcome_statement": ""}
+        return {"phenotype_recommendations": []}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    result = StudyAgent(mcp_client=FanOutMCPClient()).run_phenotype_intent_recommendation_flow(study_intent="t")
+    assert result["status"] == "ok"
+    assert len(prompts) == 2
+    assert result["outcome"]["statement"] == "" and result["outcome"]["llm_used"] is False
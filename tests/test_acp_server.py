@@ -271,3 +271,12 @@ def test_flow_phenotype_intent_split_prompt_bundle_error(monkeypatch):
     )
     assert result["status"] == "error"
     assert result["error"] == "phenotype_intent_split_prompt_failed"
+
+
+@pytest.mark.acp
+def test_services_are_the_flow_routes():
+    flow_routes = [path for path in acp_server._POST_ROUTES if path.startswith("/flows/")]
+    assert [svc["endpoint"] for svc in acp_server.SERVICES] == flow_routes
+    assert "/flows/phenotype_intent_recommendation" in flow_routes
+    for method in acp_server._POST_ROUTES.values():
+        assert callable(getattr(acp_server.ACPRequestHandler, method))
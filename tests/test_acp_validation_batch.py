@@ -0,0 +1,207 @@
+import csv
+import json
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import study_agent_acp.agent as agent_module
+from study_agent_acp import server as acp_server
+from study_agent_acp.agent import StudyAgent
+from study_agent_mcp.tools import keeper_validation
+
+
+class KeeperMCPClient:
+    # Routes keeper tool calls to the real MCP tool implementations.
+    def __init__(self) -> None:
+        self.tools = {}
+        self.calls = []
+        keeper_validation.register(self)
+
+    def tool(self, name):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+    def list_tools(self):
+        return []
+
+    def call_tool(self, name, arguments):
+        self.calls.append(name)
+        return self.tools[name](**arguments)
+
+
+def _rows(count):
+    labels = ["yes", "yes", "no", "unknown"]
+    return [
+        {"age": 40 + idx, "gender": "Male", "presentation": f"case {idx} expect-{labels[idx % 4]}"}
+        for idx in range(count)
+    ]
+
+
+def _fake_llm(state):
+    lock = threading.Lock()
+
+    def fake_llm(prompt):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.01)
+        with lock:
+            state["active"] -= 1
+        for label in ("yes", "no", "unknown"):
+            if f"expect-{label}" in prompt:
+                return {"label": label, "rationale": label}
+        return None
+
+    return fake_llm
+
+
+@pytest.mark.acp
+def test_batch_review_streams_rows_and_ppv(monkeypatch):
+    state = {"active": 0, "peak": 0}
+    monkeypatch.setattr(agent_module, "call_llm", _fake_llm(state))
+    client = KeeperMCPClient()
+    agent = StudyAgent(mcp_client=client)
+
+    rows = _rows(10) + [{"age": 50, "gender": "Male", "presentation": "no answer"}]
+    events = list(
+        agent.run_phenotype_validation_review_batch_flow(
+            keeper_rows=iter(rows),
+            disease_name="GI bleed",
+            max_workers=3,
+            chunk_size=4,
+        )
+    )
+    row_events = [event for event in events if event["type"] == "row"]
+    summary = events[-1]
+    assert summary["type"] == "summary"
+    assert sorted(event["index"] for event in row_events) == list(range(11))
+    assert [event["error"] for event in row_events if event["status"] != "ok"] == ["llm_unavailable"]
+    assert summary["counts"] == {"yes": 6, "no": 2, "unknown": 2, "error": 1}
+    assert summary["ppv"]["estimate"] == pytest.approx(6 / 8, abs=1e-4)
+    assert summary["ppv"]["lower_bound"] == pytest.approx(6 / 10)
+    assert summary["ppv"]["upper_bound"] == pytest.approx(8 / 10)
+    low, high = summary["ppv"]["ci95"]
+    assert low < 6 / 8 < high
+    assert 1 < state["peak"] <= 3
+    assert client.calls.count("keeper_sanitize_rows") == 3
+    assert "keeper_build_prompt" not in client.calls
+
+
+@pytest.mark.acp
+def test_batch_review_endpoint_streams_ndjson(monkeypatch, tmp_path):
+    monkeypatch.setattr(agent_module, "call_llm", _fake_llm({"active": 0, "peak": 0}))
+    path = tmp_path / "keeper.csv"
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=["age", "gender", "presentation"])
+        writer.writeheader()
+        writer.writerows(_rows(6))
+
+    class Handler(acp_server.ACPRequestHandler):
+        agent = StudyAgent(mcp_client=KeeperMCPClient())
+        mcp_client = None
+        debug = False
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        body = json.dumps({"disease_name": "GI bleed", "keeper_rows_path": str(path), "max_workers": 2}).encode("utf-8")
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_address[1]}/flows/phenotype_validation_review_batch",
+            data=body,
+            method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert response.headers["Content-Type"] == "application/x-ndjson"
+            events = [json.loads(line) for line in response if line.strip()]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [event["type"] for event in events].count("row") == 6
+    assert events[-1]["type"] == "summary"
+    assert events[-1]["counts"] == {"yes": 4, "no": 1, "unknown": 1, "error": 0}
+
+
+@pytest.mark.acp
+def test_batch_review_packs_cases_and_retries_invalid(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt):
+        prompts.append(prompt)
+        if "PATIENT SUMMARIES:" not in prompt:
+            return _fake_llm({"active": 0, "peak": 0})(prompt)
+        reviews = []
+        for block in prompt.split("CASE ")[1:]:
+            case_id, _, text = block.partition(":")
+            for label in ("yes", "no", "unknown"):
+                if f"expect-{label}" in text and f"case {case_id} " in text:
+                    # Case 5 comes back with an invalid label and must be retried alone.
+                    reviews.append({"case_id": case_id, "label": "maybe" if case_id == "5" else label, "rationale": label})
+        return {"reviews": reviews}
+
+    monkeypatch.setattr(agent_module, "call_llm", fake_llm)
+    agent = StudyAgent(mcp_client=KeeperMCPClient())
+    events = list(
+        agent.run_phenotype_validation_review_batch_flow(
+            keeper_rows=_rows(8),
+            disease_name="GI bleed",
+            max_workers=2,
+            chunk_size=8,
+            pack_size=4,
+        )
+    )
+    summary = events[-1]
+    assert summary["counts"] == {"yes": 4, "no": 2, "unknown": 2, "error": 0}
+    packed = [prompt for prompt in prompts if "PATIENT SUMMARIES:" in prompt]
+    assert len(packed) == 2
+    assert all("label and rationale only" not in prompt for prompt in packed)
+    assert all("one review (case_id, label and rationale) per case" in prompt for prompt in packed)
+    assert all("label and rationale only" in prompt for prompt in prompts if prompt not in packed)
+    assert len(prompts) == 3
+    retried = {event["index"] for event in events if event["type"] == "row" and not event.get("packed")}
+    assert retried == {5}
+
+
+@pytest.mark.acp
+def test_batch_review_reports_every_row_of_an_oversized_chunk(monkeypatch):
+    monkeypatch.setattr(agent_module, "call_llm", lambda prompt: {"label": "yes", "rationale": "yes"})
+    client = KeeperMCPClient()
+    agent = StudyAgent(mcp_client=client)
+    events = list(
+        agent.run_phenotype_validation_review_batch_flow(
+            keeper_rows=iter(_rows(1500)),
+            disease_name="GI bleed",
+            max_workers=8,
+            chunk_size=1500,
+        )
+    )
+    row_events = [event for event in events if event["type"] == "row"]
+    assert sorted(event["index"] for event in row_events) == list(range(1500))
+    assert client.calls.count("keeper_sanitize_rows") == 2
+    assert events[-1]["rows"] == 1500
+    assert events[-1]["counts"]["yes"] == 1500
+
+    # Rows a sanitize call leaves out still get a row event, as errors.
+    sanitize = client.tools["keeper_sanitize_rows"]
+
+    def truncating(**arguments):
+        payload = sanitize(**arguments)
+        payload["results"] = payload["results"][:3]
+        return payload
+
+    client.tools["keeper_sanitize_rows"] = truncating
+    events = list(
+        agent.run_phenotype_validation_review_batch_flow(keeper_rows=_rows(5), disease_name="GI bleed", chunk_size=5)
+    )
+    missing = [event for event in events if event["type"] == "row" and event["status"] == "error"]
+    assert sorted(event["index"] for event in missing) == [3, 4]
+    assert {event["error"] for event in missing} == {"keeper_row_not_returned"}
+    assert events[-1]["rows"] == 5
+    assert events[-1]["counts"] == {"yes": 3, "no": 0, "unknown": 0, "error": 2}
@@ -0,0 +1,93 @@
+import pytest
+
+from study_agent_core.phi import PhiScanner, phi_detected, redact_phi
+
+
+@pytest.mark.core
+def test_scan_reports_categories_and_spans() -> None:
+    text = "Seen 2020-01-01, call +1 617 555 0199 or mail a.b@example.org (day -3)"
+    matches = PhiScanner().scan(text)
+    assert [match.category for match in matches] == ["date", "phone", "email", "day"]
+    assert [text[match.start : match.end] for match in matches] == [
+        "2020-01-01",
+        "+1 617 555 0199",
+        "a.b@example.org",
+        "(day -3)",
+    ]
+
+
+@pytest.mark.core
+def test_redact_counts_each_category() -> None:
+    redacted, counts = redact_phi("zip 02139, ip 10.0.0.1, https://ehr.example/x, (555) 123-4567, 01/02/2019")
+    assert redacted == "zip [REDACTED_ZIP], ip [REDACTED_IP], [REDACTED_URL] [REDACTED_PHONE], [REDACTED_DATE]"
+    assert counts == {"zip": 1, "ip": 1, "url": 1, "phone": 1, "date": 1}
+
+
+@pytest.mark.core
+def test_detect_ignores_zip_and_relative_days() -> None:
+    assert phi_detected("Aspirin 81 MG (day -2) code 12345") is False
+    assert phi_detected("contact jane@example.org") is True
+    assert phi_detected("") is False
+
+
+@pytest.mark.core
+def test_scanner_category_subset() -> None:
+    scanner = PhiScanner(["email"])
+    assert scanner.contains("2020-01-01") is False
+    assert scanner.contains("x@y.io") is True
+    with pytest.raises(ValueError):
+        PhiScanner(["ssn"])
+
+
+@pytest.mark.acp
+def test_call_llm_redacts_phi_before_sending(llm_gateway) -> None:
+    from study_agent_acp import llm_client
+
+    with llm_client.phi_guarded():
+        result = llm_client.call_llm("patient email jane@example.org, schema https://json-schema.org/x")
+    assert result == {"ok": True}
+    content = llm_gateway.requests[0]["messages"][0]["content"]
+    assert "jane@example.org" not in content
+    assert "[REDACTED_EMAIL]" in content
+    assert "https://json-schema.org/x" in content
+
+
+@pytest.mark.acp
+def test_call_llm_block_mode_refuses_phi(monkeypatch, llm_gateway) -> None:
+    from study_agent_acp import llm_client
+
+    monkeypatch.setenv("LLM_PHI_GUARD", "block")
+    llm_client.reload_llm_config()
+    with llm_client.phi_guarded():
+        assert llm_client.call_llm("call 617-555-0199") is None
+        assert llm_gateway.requests == []
+        assert llm_client.call_llm("no identifiers here") == {"ok": True}
+
+
+@pytest.mark.acp
+def test_call_llm_sends_cohort_prompts_unchanged(llm_gateway) -> None:
+    from study_agent_acp import llm_client
+    from study_agent_acp.llm_client import build_lint_prompt
+
+    cohort = {
+        "ConceptSets": [
+            {
+                "id": 0,
+                "name": "Type 2 diabetes",
+                "expression": {"items": [{"concept": {"CONCEPT_ID": 2000000123, "CONCEPT_CODE": "1.2.3.4"}}]},
+            }
+        ],
+        "PrimaryCriteria": {"ObservationWindow": {"PriorDays": 365, "PostDays": 0}},
+    }
+    prompt = build_lint_prompt(
+        overview="Review the cohort.",
+        spec="Flag issues.",
+        output_schema={"type": "object"},
+        task="cohort_critique_general_design",
+        payload={"cohort": cohort},
+    )
+    assert "2000000123" in prompt
+    assert llm_client.call_llm(prompt) == {"ok": True}
+    assert llm_gateway.requests[0]["messages"][0]["content"] == prompt
+    # Concept ids are not phone numbers even when the guard does run.
+    assert "2000000123" in llm_client._phi_guard(prompt, False)
@@ -32,3 +32,132 @@ def test_keeper_sanitize_removes_dates():
     fn = mcp.tools["keeper_sanitize_row"]
     payload = fn({"age": 44, "gender": "Male", "presentation": "Dx on 2020-01-01"})
     assert "sanitized_row" in payload
+
+
+def _rows_tool():
+    mcp = DummyMCP()
+    keeper_validation.register(mcp)
+    return mcp.tools["keeper_sanitize_rows"]
+
+
+@pytest.mark.mcp
+def test_keeper_sanitize_rows_matches_single_row_tool():
+    mcp = DummyMCP()
+    keeper_validation.register(mcp)
+    rows = [
+        {"age": 44, "gender": "Male", "presentation": "Dx on 2020-01-01 (day 0)", "personId": 7},
+        {"age": 61, "gender": "Female", "symptoms": "call 617-555-0199", "measurements": "zip 02139"},
+        "not a row",
+    ]
+    payload = mcp.tools["keeper_sanitize_rows"](rows=rows)
+    results = payload["results"]
+    assert [result["status"] for result in results] == ["ok", "ok", "error"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    for row, result in zip(rows[:2], results):
+        single = mcp.tools["keeper_sanitize_row"](row)
+        assert result["sanitized_row"] == single["sanitized_row"]
+        assert result["redaction_report"] == single["redaction_report"]
+    report = payload["report"]
+    assert report["rows"] == 3
+    assert report["ok"] == 2
+    assert report["errors"] == 1
+    assert report["phi_keys_present"] == 1
+    assert report["redactions"] == {"date": 1, "day": 1, "phone": 1, "zip": 1}
+    assert payload["next_cursor"] is None
+
+
+@pytest.mark.mcp
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl"])
+def test_keeper_sanitize_rows_streams_path_with_cursor(tmp_path, monkeypatch, suffix):
+    import csv
+    import json
+
+    rows = [
+        {"age": str(20 + idx), "gender": "Male", "presentation": f"visit note {idx}\nline two, 2021-03-0{idx % 9 + 1}"}
+        for idx in range(7)
+    ]
+    path = tmp_path / f"keeper{suffix}"
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        if suffix == ".csv":
+            writer = csv.DictWriter(handle, fieldnames=["age", "gender", "presentation"])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                handle.write(json.dumps(row) + "\n")
+
+    monkeypatch.setenv("KEEPER_ROWS_DIR", str(tmp_path))
+    tool = _rows_tool()
+    seen = []
+    cursor = None
+    while True:
+        payload = tool(path=str(path), cursor=cursor, limit=3)
+        assert "error" not in payload
+        seen.extend(payload["results"])
+        cursor = payload["next_cursor"]
+        if cursor is None:
+            break
+    assert [result["index"] for result in seen] == list(range(7))
+    assert [result["sanitized_row"]["age_bucket"] for result in seen] == ["20-24"] * 5 + ["25-29"] * 2
+    assert all("[REDACTED_DATE]" in result["sanitized_row"]["presentation"] for result in seen)
+
+
+@pytest.mark.mcp
+def test_keeper_sanitize_rows_rejects_ambiguous_input(tmp_path, monkeypatch):
+    monkeypatch.setenv("KEEPER_ROWS_DIR", str(tmp_path))
+    tool = _rows_tool()
+    assert tool()["error"] == "provide exactly one of rows or path"
+    assert "error" in tool(path=str(tmp_path / "missing.csv"))
+
+
+@pytest.mark.mcp
+def test_keeper_sanitize_rows_only_reads_files_under_keeper_rows_dir(tmp_path, monkeypatch):
+    import json
+
+    allowed = tmp_path / "extracts"
+    allowed.mkdir()
+    outside = tmp_path / "secret.jsonl"
+    outside.write_text(json.dumps({"age": 40, "presentation": "private"}) + "\n", encoding="utf-8")
+    (allowed / "link.jsonl").symlink_to(outside)
+    tool = _rows_tool()
+
+    monkeypatch.delenv("KEEPER_ROWS_DIR", raising=False)
+    assert "disabled" in tool(path=str(outside))["error"]
+    monkeypatch.setenv("KEEPER_ROWS_DIR", str(allowed))
+    assert tool(path=str(outside))["error"] == "path must be inside KEEPER_ROWS_DIR"
+    assert tool(path=str(allowed / ".." / "secret.jsonl"))["error"] == "path must be inside KEEPER_ROWS_DIR"
+    assert tool(path=str(allowed / "link.jsonl"))["error"] == "path must be inside KEEPER_ROWS_DIR"
+
+    rows = [{"age": 30 + idx, "presentation": "note"} for idx in range(3)]
+    (allowed / "small.json").write_text(json.dumps(rows), encoding="utf-8")
+    payload = tool(path=str(allowed / "small.json"), limit=3)
+    assert len(payload["results"]) == 3 and payload["next_cursor"] is None
+    # .json arrays are parsed whole, so they are not paged.
+    assert ".json files cannot be paged" in tool(path=str(allowed / "small.json"), limit=2)["error"]
+
+
+@pytest.mark.mcp
+def test_keeper_packed_prompt_and_split_response():
+    mcp = DummyMCP()
+    keeper_validation.register(mcp)
+    rows = [mcp.tools["keeper_sanitize_row"]({"age": 40 + idx, "gender": "Female"})["sanitized_row"] for idx in range(3)]
+    packed = mcp.tools["keeper_build_prompt"]("GI bleed", sanitized_rows=rows, case_ids=["a", "b", "c"])
+    assert packed["case_ids"] == ["a", "b", "c"]
+    assert packed["prompt"].index("CASE a:") < packed["prompt"].index("CASE b:") < packed["prompt"].index("CASE c:")
+    items = packed["output_schema"]["properties"]["reviews"]["items"]
+    assert items["required"][0] == "case_id"
+
+    parsed = mcp.tools["keeper_parse_response"](
+        {
+            "reviews": [
+                {"case_id": "a", "label": "yes", "rationale": "bleed"},
+                {"case_id": "b", "label": "probably", "rationale": ""},
+            ]
+        },
+        case_ids=["a", "b", "c"],
+    )
+    assert parsed["results"] == [{"case_id": "a", "label": "yes", "rationale": "bleed"}]
+    assert parsed["failed_case_ids"] == ["b", "c"]
+
+    duplicate = mcp.tools["keeper_build_prompt"]("GI bleed", sanitized_rows=rows, case_ids=["a", "a", "b"])
+    assert "error" in duplicate
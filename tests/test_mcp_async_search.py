@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from study_agent_mcp.retrieval.index import AsyncEmbeddingClient, PhenotypeIndex
+
+
+def _write_sparse_index(tmp_path):
+    catalog = [
+        {"cohortId": 1, "name": "Type 2 diabetes"},
+        {"cohortId": 2, "name": "Heart failure"},
+    ]
+    with open(tmp_path / "catalog.jsonl", "w", encoding="utf-8") as handle:
+        for row in catalog:
+            handle.write(json.dumps(row) + "\n")
+    sparse = {
+        "postings": {"diabetes": [(0, 1)], "heart": [(1, 1)], "failure": [(1, 1)]},
+        "idf": {"diabetes": 1.0, "heart": 1.0, "failure": 1.0},
+        "doc_lengths": [3, 2],
+        "avgdl": 2.5,
+    }
+    import pickle
+
+    with open(tmp_path / "sparse_index.pkl", "wb") as handle:
+        pickle.dump(sparse, handle)
+
+
+@pytest.mark.mcp
+def test_async_embedding_client_limits_concurrency() -> None:
+    state = {"active": 0, "peak": 0, "batches": []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        state["batches"].append(body["input"])
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        assert request.headers["Authorization"] == "Bearer secret"
+        return httpx.Response(200, json={"data": [{"embedding": [float(len(t))]} for t in body["input"]]})
+
+    client = AsyncEmbeddingClient(
+        url="http://embed.test/v1/embeddings",
+        model="m",
+        api_key="secret",
+        max_concurrency=2,
+        transport=httpx.MockTransport(handler),
+    )
+
+    async def run():
+        try:
+            return await asyncio.gather(*(client.embed_texts(["x" * n]) for n in range(1, 7)))
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    assert [row[0][0] for row in results] == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert state["peak"] == 2
+    assert len(state["batches"]) == 6
+
+
+@pytest.mark.mcp
+def test_async_embedding_client_wraps_http_errors() -> None:
+    client = AsyncEmbeddingClient(
+        url="http://embed.test/v1/embeddings",
+        model="m",
+        transport=httpx.MockTransport(lambda request: httpx.Response(503)),
+    )
+
+    async def run():
+        try:
+            await client.embed_texts(["x"])
+        finally:
+            await client.aclose()
+
+    with pytest.raises(RuntimeError, match="Embedding request failed"):
+        asyncio.run(run())
+
+
+@pytest.mark.mcp
+def test_search_many_async_batches_embeddings(tmp_path, monkeypatch) -> None:
+    _write_sparse_index(tmp_path)
+    calls = []
+
+    class FakeAsyncClient:
+        async def embed_texts(self, texts):
+            calls.append(list(texts))
+            return [[float(idx)] for idx, _ in enumerate(texts)]
+
+    index = PhenotypeIndex(index_dir=str(tmp_path), async_embedding_client=FakeAsyncClient()).load()
+    index._dense = object()
+    monkeypatch.setattr(index, "_dense_search_vector", lambda vector, k: {int(vector[0]): 1.0})
+
+    results = asyncio.run(index.search_many_async(["diabetes", "", "heart failure"], top_k=5))
+    assert calls == [["diabetes", "heart failure"]]
+    assert results[1] == []
+    assert [row["cohortId"] for row in results[0]] == [1]
+    assert results[0][0]["score_dense"] == 1.0
+    assert [row["cohortId"] for row in results[2]] == [2]
+    assert results[2][0]["score_dense"] == 1.0
+    assert results[2][0]["score_sparse"] > 0
+
+
+@pytest.mark.mcp
+def test_search_async_matches_sync_without_dense(tmp_path) -> None:
+    _write_sparse_index(tmp_path)
+    index = PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False).load()
+    expected = index.search("heart failure", top_k=5)
+    assert asyncio.run(index.search_async("heart failure", top_k=5)) == expected
+    assert index.search_many(["heart failure", "diabetes"], top_k=5)[0] == expected
+
+
+@pytest.mark.mcp
+def test_search_many_skips_embedding_when_every_query_is_empty(tmp_path) -> None:
+    _write_sparse_index(tmp_path)
+
+    class FailingClient:
+        def embed_texts(self, texts):
+            raise AssertionError("no embedding request expected")
+
+    index = PhenotypeIndex(index_dir=str(tmp_path), embedding_client=FailingClient()).load()
+    index._dense = object()
+    assert index.search_many(["", ""], top_k=5) == [[], []]
+    assert asyncio.run(index.search_many_async(["", ""], top_k=5)) == [[], []]
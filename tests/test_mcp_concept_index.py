@@ -0,0 +1,91 @@
+import importlib.util
+import json
+import os
+import pickle
+
+import pytest
+
+from study_agent_mcp.retrieval.index import PhenotypeIndex
+
+_BUILDER_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "mcp_server", "scripts", "build_phenotype_index.py"
+)
+
+
+def _load_builder():
+    spec = importlib.util.spec_from_file_location("build_phenotype_index", _BUILDER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _definition(items):
+    return {
+        "ConceptSets": [
+            {
+                "id": 0,
+                "name": "cs",
+                "expression": {
+                    "items": [
+                        {
+                            "concept": {"CONCEPT_ID": cid},
+                            "isExcluded": excluded,
+                            "includeDescendants": descendants,
+                        }
+                        for cid, excluded, descendants in items
+                    ]
+                },
+            }
+        ]
+    }
+
+
+def _write_index(tmp_path, catalog, definitions):
+    builder = _load_builder()
+    with open(tmp_path / "catalog.jsonl", "w", encoding="utf-8") as handle:
+        for row in catalog:
+            handle.write(json.dumps(row) + "\n")
+    concept_index = builder._build_concept_index(catalog, definitions)
+    with open(tmp_path / "concept_index.pkl", "wb") as handle:
+        pickle.dump(concept_index, handle)
+    return PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False).load()
+
+
+@pytest.mark.mcp
+def test_concept_flags_merge_across_concept_sets() -> None:
+    builder = _load_builder()
+    definition = _definition([(201826, False, True), (4000, True, False)])
+    definition["ConceptSets"].append(_definition([(201826, True, False)])["ConceptSets"][0])
+    flags = builder._concept_flags(definition)
+    assert flags[201826] == 1 | 2 | 4
+    assert flags[4000] == 2
+
+
+@pytest.mark.mcp
+def test_search_by_concepts_ranks_weighted_overlap(tmp_path) -> None:
+    catalog = [
+        {"cohortId": 10, "name": "T2DM broad"},
+        {"cohortId": 11, "name": "T2DM narrow"},
+        {"cohortId": 12, "name": "Excludes diabetes"},
+        {"cohortId": 13, "name": "No definition"},
+    ]
+    definitions = {
+        10: _definition([(201826, False, True), (1, False, False), (2, False, False)]),
+        11: _definition([(201826, False, True), (443238, False, True)]),
+        12: _definition([(201826, True, True)]),
+    }
+    index = _write_index(tmp_path, catalog, definitions)
+
+    results = index.search_by_concepts([201826, 443238], top_k=10)
+    assert [row["cohortId"] for row in results] == [11, 10]
+    assert results[0]["matched_count"] == 2
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[0]["matched_concepts"][0] == {
+        "conceptId": 201826,
+        "includeDescendants": True,
+        "isExcluded": False,
+    }
+
+    with_excluded = index.search_by_concepts([201826], top_k=10, include_excluded=True)
+    assert [row["cohortId"] for row in with_excluded] == [12, 11, 10]
+    assert with_excluded[0]["matched_concepts"][0]["isExcluded"] is True
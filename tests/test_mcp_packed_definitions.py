@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from study_agent_mcp.retrieval import PackedDefinitionStore, PhenotypeIndex, get_default_index, write_packed_definitions
+from study_agent_mcp.retrieval import index as index_module
+from study_agent_mcp.tools import phenotype_fetch_definition
+
+
+class DummyMCP:
+    def __init__(self) -> None:
+        self.tools = {}
+
+    def tool(self, name: str):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+
+@pytest.mark.mcp
+@pytest.mark.parametrize("compress", [False, True])
+def test_packed_store_round_trip(tmp_path, compress) -> None:
+    definitions = {
+        7: {"ConceptSets": [], "name": "seven"},
+        3: {"ConceptSets": [{"id": 0}], "name": "three"},
+    }
+    info = write_packed_definitions(str(tmp_path), definitions, compress=compress)
+    assert info["count"] == 2
+
+    store = PackedDefinitionStore(str(tmp_path))
+    try:
+        assert len(store) == 2
+        assert 3 in store and 99 not in store
+        assert store.get(3) == definitions[3]
+        assert store.get(7) == definitions[7]
+        assert store.get(99) is None
+    finally:
+        store.close()
+
+
+@pytest.mark.mcp
+def test_rewriting_the_pack_leaves_an_open_store_readable(tmp_path) -> None:
+    write_packed_definitions(str(tmp_path), {1: {"name": "old" * 100}, 2: {"name": "two"}})
+    store = PackedDefinitionStore(str(tmp_path))
+    try:
+        assert store.get(1) == {"name": "old" * 100}
+        assert store.refresh() is False
+        write_packed_definitions(str(tmp_path), {1: {"name": "new"}, 3: {"name": "three"}})
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["definitions.offsets", "definitions.pack"]
+        # The open store keeps serving the build it mapped until it is refreshed.
+        assert store.get(1) == {"name": "old" * 100}
+        assert store.get(2) == {"name": "two"}
+        assert store.refresh() is True
+        assert store.get(1) == {"name": "new"}
+        assert store.get(3) == {"name": "three"}
+        assert 2 not in store
+    finally:
+        store.close()
+
+
+@pytest.mark.mcp
+def test_fetch_definition_prefers_packed_store(tmp_path, monkeypatch) -> None:
+    (tmp_path / "catalog.jsonl").write_text("", encoding="utf-8")
+    (tmp_path / "definitions").mkdir()
+    (tmp_path / "definitions" / "5.json").write_text(json.dumps({"source": "file"}), encoding="utf-8")
+    (tmp_path / "definitions" / "6.json").write_text(json.dumps({"source": "file"}), encoding="utf-8")
+    write_packed_definitions(str(tmp_path), {5: {"source": "pack"}}, compress=True)
+    index = PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False).load()
+
+    assert index.fetch_definition(5) == {"source": "pack"}
+    assert index.fetch_definition(6) == {"source": "file"}
+    assert index.fetch_definition(8) is None
+
+    monkeypatch.setattr(phenotype_fetch_definition, "get_default_index", lambda: index)
+    mcp = DummyMCP()
+    phenotype_fetch_definition.register(mcp)
+    fn = mcp.tools["phenotype_fetch_definition"]
+    assert fn(cohortId=5)["definition"] == {"source": "pack"}
+    assert "error" in fn(cohortId=8)
+
+
+@pytest.mark.mcp
+def test_fetch_definition_cache_is_byte_bounded_and_per_generation(tmp_path) -> None:
+    (tmp_path / "catalog.jsonl").write_text("", encoding="utf-8")
+    (tmp_path / "meta.json").write_text(json.dumps({"built_at": "gen-1"}), encoding="utf-8")
+    write_packed_definitions(str(tmp_path), {1: {"pad": "x" * 40}, 2: {"pad": "y" * 40}})
+    index = PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False)
+    index.definition_cache.max_bytes = 60
+    index.load()
+
+    first = index.fetch_definition(1)
+    assert index.fetch_definition(1) is first
+    index.fetch_definition(2)
+    stats = index.definition_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] <= 60
+    assert stats["generation"] == "gen-1"
+
+    (tmp_path / "meta.json").write_text(json.dumps({"built_at": "gen-2"}), encoding="utf-8")
+    index.load()
+    assert index.definition_cache.stats()["entries"] == 0
+    assert index.fetch_definition(2) == {"pad": "y" * 40}
+
+
+@pytest.mark.mcp
+def test_default_index_reloads_after_a_reindex(tmp_path, monkeypatch) -> None:
+    (tmp_path / "catalog.jsonl").write_text("", encoding="utf-8")
+    (tmp_path / "meta.json").write_text(json.dumps({"built_at": "gen-1"}), encoding="utf-8")
+    write_packed_definitions(str(tmp_path), {1: {"name": "old"}})
+    monkeypatch.setenv("PHENOTYPE_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(index_module, "_DEFAULT_INDEX", None)
+    loads = []
+    original_load = PhenotypeIndex.load
+
+    def slow_load(self):
+        loads.append(self)
+        time.sleep(0.05)
+        return original_load(self)
+
+    monkeypatch.setattr(PhenotypeIndex, "load", slow_load)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(get_default_index())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1 and len(set(map(id, seen))) == 1
+    index = seen[0]
+    assert index.fetch_definition(1) == {"name": "old"}
+    assert get_default_index() is index
+
+    # A rebuild rewrites the pack and then meta.json.
+    write_packed_definitions(str(tmp_path), {1: {"name": "new"}})
+    meta = tmp_path / "meta.json"
+    meta.write_text(json.dumps({"built_at": "gen-2"}), encoding="utf-8")
+    os.utime(meta, ns=(time.time_ns(), time.time_ns() + 10**9))
+    reloaded = get_default_index()
+    assert reloaded is not index
+    assert reloaded.generation == "gen-2"
+    assert reloaded.fetch_definition(1) == {"name": "new"}
+    assert reloaded.embedding_client is index.embedding_client
+    assert index.fetch_definition(1) == {"name": "old"}
+    assert len(loads) == 2
+
+
+@pytest.mark.mcp
+def test_fetch_definitions_batch(tmp_path, monkeypatch) -> None:
+    (tmp_path / "catalog.jsonl").write_text("", encoding="utf-8")
+    write_packed_definitions(str(tmp_path), {1: {"name": "one"}, 2: {"name": "two"}})
+    index = PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False).load()
+    monkeypatch.setattr(phenotype_fetch_definition, "get_default_index", lambda: index)
+    mcp = DummyMCP()
+    phenotype_fetch_definition.register(mcp)
+    fn = mcp.tools["phenotype_fetch_definitions"]
+
+    payload = fn(cohortIds=[2, 1, 2, 9], truncate=False)
+    assert [row["cohortId"] for row in payload["definitions"]] == [2, 1, 9]
+    assert payload["definitions"][0]["definition"] == {"name": "two"}
+    assert payload["missing"] == [9]
+    assert "error" in payload["definitions"][2]
+
+
+@pytest.mark.mcp
+def test_fetch_tools_report_an_exhausted_budget_the_same_way(tmp_path, monkeypatch) -> None:
+    (tmp_path / "catalog.jsonl").write_text("", encoding="utf-8")
+    write_packed_definitions(str(tmp_path), {1: {"name": "one"}})
+    index = PhenotypeIndex(index_dir=str(tmp_path), allow_dense=False).load()
+    monkeypatch.setattr(phenotype_fetch_definition, "get_default_index", lambda: index)
+    mcp = DummyMCP()
+    phenotype_fetch_definition.register(mcp)
+
+    single = mcp.tools["phenotype_fetch_definition"](cohortId=1, max_bytes=1)
+    batch = mcp.tools["phenotype_fetch_definitions"](cohortIds=[1], max_bytes=1)
+    assert single["error"] == batch["definitions"][0]["error"] == "max_bytes budget exhausted"
+    assert "definition" not in single
+    assert single["projection"]["truncated"] is True
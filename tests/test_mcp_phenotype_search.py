@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from study_agent_mcp.tools import phenotype_search
@@ -7,10 +9,14 @@ class StubIndex:
     def __init__(self) -> None:
         self.args = None
 
-    def search(self, **kwargs):
+    async def search_async(self, **kwargs):
         self.args = kwargs
         return []
 
+    async def search_many_async(self, **kwargs):
+        self.args = kwargs
+        return [[{"cohortId": idx, "name": query}] if query else [] for idx, query in enumerate(kwargs["queries"])]
+
 
 class DummyMCP:
     def __init__(self) -> None:
@@ -35,13 +41,31 @@ def test_phenotype_search_uses_env_weights(monkeypatch) -> None:
     phenotype_search.register(mcp)
     fn = mcp.tools["phenotype_search"]
 
-    payload = fn(
-        query="test",
-        top_k=5,
-        dense_k=10,
-        sparse_k=10,
+    payload = asyncio.run(
+        fn(
+            query="test",
+            top_k=5,
+            dense_k=10,
+            sparse_k=10,
+        )
     )
     assert payload["weights"]["dense"] == 0.9
     assert payload["weights"]["sparse"] == 0.1
     assert stub.args["dense_weight"] == 0.9
     assert stub.args["sparse_weight"] == 0.1
+
+
+@pytest.mark.mcp
+def test_phenotype_search_many_returns_one_search_per_query(monkeypatch) -> None:
+    stub = StubIndex()
+    monkeypatch.setattr(phenotype_search, "get_default_index", lambda: stub)
+
+    mcp = DummyMCP()
+    phenotype_search.register(mcp)
+    payload = asyncio.run(
+        mcp.tools["phenotype_search_many"](queries=["target", "", "outcome"], top_k=3, fields=["/cohortId"])
+    )
+    assert stub.args["queries"] == ["target", "", "outcome"] and stub.args["top_k"] == 3
+    assert [search["query"] for search in payload["searches"]] == ["target", "", "outcome"]
+    assert [search["count"] for search in payload["searches"]] == [1, 0, 1]
+    assert payload["searches"][2]["results"] == [{"cohortId": 2}]
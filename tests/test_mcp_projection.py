@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from study_agent_mcp.tools import phenotype_search
+from study_agent_mcp.tools._projection import Projector, item_fields
+
+
+class DummyMCP:
+    def __init__(self) -> None:
+        self.tools = {}
+
+    def tool(self, name: str):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+
+def project(obj, **kwargs):
+    projector = Projector(**kwargs)
+    return projector.project(obj), projector.info()
+
+
+DEFINITION = {
+    "ConceptSets": [
+        {"id": 0, "name": "GI bleed", "expression": {"items": [{"concept": {"CONCEPT_ID": 1}}]}},
+        {"id": 1, "name": "Ulcer", "expression": {"items": []}},
+    ],
+    "PrimaryCriteria": {"ObservationWindow": {"PriorDays": 365}},
+    "InclusionRules": [],
+}
+
+
+@pytest.mark.mcp
+def test_project_include_and_exclude_pointers() -> None:
+    value, info = project(DEFINITION, fields=["/ConceptSets/*/name", "/PrimaryCriteria"])
+    assert value == {
+        "ConceptSets": [{"name": "GI bleed"}, {"name": "Ulcer"}],
+        "PrimaryCriteria": {"ObservationWindow": {"PriorDays": 365}},
+    }
+    assert info["truncated"] is False
+
+    value, _ = project(DEFINITION, fields=["-/ConceptSets/*/expression", "-/InclusionRules"])
+    assert value["ConceptSets"][0] == {"id": 0, "name": "GI bleed"}
+    assert "InclusionRules" not in value
+
+
+@pytest.mark.mcp
+def test_project_max_bytes_is_never_exceeded() -> None:
+    value, info = project(DEFINITION, max_bytes=60)
+    assert info["truncated"] is True
+    assert info["bytes"] <= 60
+    assert len(json.dumps(value, separators=(",", ":"))) <= 60
+    full, full_info = project(DEFINITION)
+    assert full == DEFINITION
+    assert full_info["bytes"] == len(json.dumps(DEFINITION, separators=(",", ":")))
+
+
+@pytest.mark.mcp
+def test_item_fields_rewrites_pointers() -> None:
+    assert item_fields(["cohortId", "-/tags"]) == ["/*/cohortId", "-/*/tags"]
+
+
+@pytest.mark.mcp
+def test_phenotype_search_applies_fields(monkeypatch) -> None:
+    class StubIndex:
+        async def search_async(self, **kwargs):
+            return [
+                {"cohortId": idx, "name": f"c{idx}", "tags": ["x"] * 10, "signals": [], "score": 1.0}
+                for idx in range(5)
+            ]
+
+    monkeypatch.setattr(phenotype_search, "get_default_index", lambda: StubIndex())
+    mcp = DummyMCP()
+    phenotype_search.register(mcp)
+    fn = mcp.tools["phenotype_search"]
+
+    payload = asyncio.run(fn(query="bleed", fields=["/cohortId", "/name"]))
+    assert payload["results"][0] == {"cohortId": 0, "name": "c0"}
+    assert payload["count"] == 5
+
+    payload = asyncio.run(fn(query="bleed", fields=["-/tags", "-/signals"], max_bytes=80))
+    assert payload["projection"]["truncated"] is True
+    assert 0 < payload["count"] < 5
+    assert "tags" not in payload["results"][0]
@@ -74,3 +74,69 @@ def test_keeper_prompt_bundle_schema() -> None:
     fn = mcp.tools["keeper_prompt_bundle"]
     payload = fn("Gastrointestinal bleeding")
     assert payload["output_schema"]["title"] == "phenotype_validation_review_output"
+
+
+@pytest.mark.mcp
+def test_prompt_bundles_carry_content_hash() -> None:
+    from study_agent_mcp.tools import phenotype_intent_split
+
+    mcp = DummyMCP()
+    phenotype_prompt_bundle.register(mcp)
+    phenotype_intent_split.register(mcp)
+    first = mcp.tools["phenotype_prompt_bundle"]("phenotype_recommendations")
+    second = mcp.tools["phenotype_prompt_bundle"]("phenotype_recommendations")
+    other = mcp.tools["phenotype_intent_split"]()
+    assert first["content_hash"].startswith("sha256:")
+    assert first["content_hash"] == second["content_hash"]
+    assert first["content_hash"] != other["content_hash"]
+
+
+@pytest.mark.mcp
+def test_prompt_registry_reloads_changed_files(tmp_path) -> None:
+    import os
+
+    from study_agent_mcp.tools._prompts import PromptRegistry
+
+    (tmp_path / "overview.md").write_text("overview v1\n", encoding="utf-8")
+    (tmp_path / "spec.md").write_text("spec\n", encoding="utf-8")
+    (tmp_path / "schema.json").write_text('{"title": "demo"}', encoding="utf-8")
+    registry = PromptRegistry(
+        prompt_dir=str(tmp_path),
+        bundles={"demo": ("overview.md", "spec.md", "schema.json")},
+    )
+    before = registry.get("demo")
+    assert before["overview"] == "overview v1"
+    before["_meta"] = {"tool": "demo"}
+    before["output_schema"]["title"] = "edited"
+    assert "_meta" not in registry.get("demo")
+    assert registry.get("demo")["output_schema"] == {"title": "demo"}
+
+    path = tmp_path / "overview.md"
+    path.write_text("overview v2 with more text\n", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    after = registry.get("demo")
+    assert after["overview"] == "overview v2 with more text"
+    assert after["content_hash"] != before["content_hash"]
+    assert registry.get("missing") == {"error": "unsupported task missing"}
+
+
+@pytest.mark.mcp
+def test_prompt_bundle_if_none_match_returns_not_modified() -> None:
+    from study_agent_mcp.tools import keeper_validation
+
+    mcp = DummyMCP()
+    phenotype_prompt_bundle.register(mcp)
+    keeper_validation.register(mcp)
+    full = mcp.tools["phenotype_prompt_bundle"]("phenotype_improvements")
+    short = mcp.tools["phenotype_prompt_bundle"]("phenotype_improvements", if_none_match=full["content_hash"])
+    assert short["not_modified"] is True
+    assert short["content_hash"] == full["content_hash"]
+    assert "overview" not in short
+    stale = mcp.tools["phenotype_prompt_bundle"]("phenotype_improvements", if_none_match="sha256:old")
+    assert "overview" in stale
+
+    keeper = mcp.tools["keeper_prompt_bundle"]("GI bleed")
+    keeper_short = mcp.tools["keeper_prompt_bundle"]("GI bleed", if_none_match=keeper["content_hash"])
+    assert keeper_short["not_modified"] is True
+    assert "system_prompt" not in keeper_short
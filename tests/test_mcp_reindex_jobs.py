@@ -0,0 +1,96 @@
+import sys
+import time
+
+import pytest
+
+from study_agent_mcp.tools import phenotype_reindex
+
+
+class DummyMCP:
+    def __init__(self) -> None:
+        self.tools = {}
+
+    def tool(self, name: str):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+
+_FAKE_BUILD = """
+import json, os, sys, time
+out = sys.argv[1]
+os.makedirs(out, exist_ok=True)
+print("building", flush=True)
+print("PROGRESS " + json.dumps({"stage": "dense", "percent": 50.0, "batches_done": 1, "batches_total": 2}), flush=True)
+time.sleep(0.5)
+with open(os.path.join(out, "meta.json"), "w") as handle:
+    json.dump({"catalog_count": 3}, handle)
+print("PROGRESS " + json.dumps({"stage": "done", "percent": 100.0}), flush=True)
+"""
+
+
+def _wait(job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = phenotype_reindex.reindex_job_status(job_id)
+        if status["status"] in ("ok", "error"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError("reindex job did not finish")
+
+
+@pytest.mark.mcp
+def test_reindex_job_reports_progress_and_manifest(tmp_path) -> None:
+    out = str(tmp_path / "index")
+    started = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", _FAKE_BUILD, out])
+    assert started["status"] == "started"
+
+    duplicate = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", _FAKE_BUILD, out])
+    assert duplicate["error"] == "reindex_in_progress"
+    assert duplicate["job_id"] == started["job_id"]
+
+    status = _wait(started["job_id"])
+    assert status["status"] == "ok"
+    assert status["percent"] == 100.0
+    assert status["embedding_batches"] == {"done": 1, "total": 2}
+    assert status["manifest"] == {"catalog_count": 3}
+    assert "building" in status["stdout_tail"]
+    assert "PROGRESS" not in status["stdout_tail"]
+
+    again = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", "pass"])
+    assert again["status"] == "started"
+    _wait(again["job_id"])
+
+
+@pytest.mark.mcp
+def test_reindex_tool_disabled_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("PHENOTYPE_REINDEX_ALLOW", raising=False)
+    mcp = DummyMCP()
+    phenotype_reindex.register(mcp)
+    payload = mcp.tools["phenotype_reindex"](metadata_csv="x.csv", output_dir="out")
+    assert "disabled" in payload["error"]
+    assert "error" in mcp.tools["phenotype_reindex_status"](job_id="missing")
+
+
+@pytest.mark.mcp
+def test_reindex_job_always_finishes_and_releases_output_dir(tmp_path, monkeypatch) -> None:
+    out = str(tmp_path / "index")
+    build = 'print("PROGRESS [1, 2]", flush=True); print("PROGRESS {\\"percent\\": \\"x\\"}", flush=True)'
+    started = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", build])
+    assert _wait(started["job_id"])["status"] == "ok"
+
+    def broken(job, line):
+        raise RuntimeError("bad progress")
+
+    monkeypatch.setattr(phenotype_reindex, "_apply_progress", broken)
+    started = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", 'print("PROGRESS {}", flush=True)'])
+    status = _wait(started["job_id"])
+    assert status["status"] == "error"
+    assert "bad progress" in status["error"]
+    monkeypatch.undo()
+
+    again = phenotype_reindex.start_reindex_job(out, [sys.executable, "-c", "pass"])
+    assert again["status"] == "started"
+    _wait(again["job_id"])
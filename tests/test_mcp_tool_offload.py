@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from study_agent_mcp.tools._executor import OffloadingRegistrar
+
+
+def _slow_tool_registrar(config, thread_workers=8):
+    server = FastMCP("offload-test")
+    registrar = OffloadingRegistrar(server, config=config, thread_workers=thread_workers)
+    threads = set()
+
+    @registrar.tool(name="slow_io")
+    def slow_io(delay: float = 0.3) -> dict:
+        threads.add(threading.current_thread().name)
+        time.sleep(delay)
+        return {"ok": True}
+
+    return server, registrar, threads
+
+
+async def _concurrent_calls(server, count):
+    start = time.perf_counter()
+    await asyncio.gather(*[server.call_tool("slow_io", {"delay": 0.3}) for _ in range(count)])
+    return time.perf_counter() - start
+
+
+@pytest.mark.mcp
+def test_offloaded_tools_run_concurrently() -> None:
+    server, registrar, threads = _slow_tool_registrar({"slow_io": {"pool": "thread", "max_concurrency": 4}})
+    try:
+        elapsed = asyncio.run(_concurrent_calls(server, 4))
+    finally:
+        registrar.shutdown()
+    # Serialized execution would take ~1.2s.
+    assert elapsed < 0.9
+    assert all(name.startswith("mcp-tool") for name in threads)
+
+
+@pytest.mark.mcp
+def test_per_tool_concurrency_limit_is_enforced() -> None:
+    server, registrar, _ = _slow_tool_registrar({"slow_io": {"pool": "thread", "max_concurrency": 1}})
+    try:
+        elapsed = asyncio.run(_concurrent_calls(server, 3))
+    finally:
+        registrar.shutdown()
+    assert elapsed >= 0.85
+
+
+@pytest.mark.mcp
+def test_process_pool_tool_runs_registered_closure() -> None:
+    from study_agent_mcp.tools import keeper_validation
+
+    server = FastMCP("offload-process-test")
+    registrar = OffloadingRegistrar(server, process_workers=1)
+    assert registrar.settings_for("keeper_sanitize_row")["pool"] == "process"
+    keeper_validation.register(registrar)
+
+    async def call():
+        return await server.call_tool("keeper_sanitize_row", {"row": {"age": 44, "gender": "Male"}})
+
+    try:
+        result = asyncio.run(call())
+    finally:
+        registrar.shutdown()
+    assert "40-44" in str(result)
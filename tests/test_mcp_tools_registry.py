@@ -26,16 +26,21 @@ def test_register_all_tools() -> None:
         "phenotype_improvements",
         "phenotype_intent_split",
         "phenotype_search",
+        "phenotype_search_many",
+        "phenotype_search_by_concepts",
         "phenotype_fetch_summary",
         "phenotype_fetch_definition",
+        "phenotype_fetch_definitions",
         "phenotype_list_similar",
         "phenotype_reindex",
+        "phenotype_reindex_status",
         "phenotype_index_status",
         "phenotype_prompt_bundle",
         "phenotype_recommendation_advice",
         "lint_prompt_bundle",
         "keeper_prompt_bundle",
         "keeper_sanitize_row",
+        "keeper_sanitize_rows",
         "keeper_build_prompt",
         "keeper_parse_response",
     }